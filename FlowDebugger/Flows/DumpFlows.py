@@ -4,100 +4,522 @@ Created on Nov 20, 2014
 @author: Brady Johnson
 '''
 
+import itertools
+import mmap
+import os
 import subprocess
-import tempfile
-import paramiko
-from FlowDebugger.Flows.FlowEntries import FlowEntryContainer
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from Queue import Queue, Empty
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer, FlowEntryTargetContainer
+from FlowDebugger.Flows.FlowEntryDelta import FlowEntryDeltaRefresher
 from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from FlowDebugger.Flows.FlowEntryParallel import iter_flow_entries_parallel
+from FlowDebugger.Flows.SshConnectionPool import SshConnectionPool
 
 #
-# Internal method to execute a system command and return the return_code and stdout as a str
+# The dump-flows output is processed as a pipeline of generators, so memory is bounded
+# and each FlowEntry is available as soon as its line is received:
+#   command stdout chunks -> lines -> FlowEntry objects -> FlowEntryContainer
 #
-def _execute_command(arg_list_str):
-    return_code = 0
-    stdout_str = ''
+READ_BUF_SIZE = 1024 * 1024
 
-    with tempfile.TemporaryFile(mode='w+b') as f:
+#
+# With more than one parse process, the dumps with fewer lines than PARALLEL_MIN_LINES
+# are still parsed serially, since starting the processes would take longer than parsing.
+# The lines are sent to the processes in chunks of PARALLEL_CHUNK_LINES lines.
+#
+PARALLEL_MIN_LINES = 100000
+PARALLEL_CHUNK_LINES = 10000
+
+#
+# The dump-flows input files larger than this are memory mapped instead of read
+#
+MMAP_MIN_SIZE = 16 * 1024 * 1024
+GZIP_MAGIC = '\x1f\x8b'
+
+#
+# The SSH connections are reused between remote commands, call shutdown() to close them
+#
+_ssh_pool = SshConnectionPool()
+
+def shutdown():
+    _ssh_pool.shutdown()
+
+#
+# Internal generator that splits the chunks returned by read_chunk() into lines.
+# read_chunk() should return an empty string at the end of the output.
+#
+def _iter_lines(read_chunk):
+    pending = ''
+    chunk = read_chunk()
+    while chunk:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+        chunk = read_chunk()
+
+    if pending:
+        yield pending
+
+#
+# Internal class to iterate the stdout lines of a local system command
+# The return_code is set once all the lines have been iterated
+# cancel() can be called from another thread, it terminates the command
+#
+class _CommandLines(object):
+    def __init__(self, command_str):
+        self._command_str = command_str
+        self._process = None
+        self._cancelled = False
+        self.return_code = None
+
+    def cancel(self):
+        self._cancelled = True
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def __iter__(self):
         try:
-            return_code=subprocess.call(arg_list_str, stdout=f, shell=True)
+            process = subprocess.Popen(self._command_str, stdout=subprocess.PIPE, shell=True)
         except OSError as e:
-            print 'OS Error [%d] \"%s\", with command \"%s\"' % (e.errno, e.strerror, ' '.join(arg_list_str))
-            return (-1, stdout_str)
-        except:
-            print 'Unexpected error with command: \"%s\"' % (' '.join(arg_list_str))
-            return (-1, stdout_str)
+            print 'OS Error [%d] \"%s\", with command \"%s\"' % (e.errno, e.strerror, self._command_str)
+            self.return_code = -1
+            return
 
-        #print '\"%s\", rc=%d' % (' '.join(arg_list_str), return_code)
+        self._process = process
+        if self._cancelled:
+            process.terminate()
 
-        if return_code != 0:
-            print 'Non-zero return code [%d] for command: \"%s\"' % (return_code, ' '.join(arg_list_str))
-            return (return_code, stdout_str)
-
-        # Flush the tempfile and go to the beginning of it
-        f.flush()
-        f.seek(0, 0)
-
-        stdout_str = f.read()
-
-    return (return_code, stdout_str.split('\n'))
-
-def _ssh_connect(host, username, password, port=22):
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.load_system_host_keys()
-    client.connect(host, username=username, password=password, port=port)
-    return client
-
-def _execute_remote_command(host, user, pw, command, read_buf_size=256):
-    ssh_client = _ssh_connect(host, user, pw)
-    (__, ssh_stdout, ssh_stderr) = ssh_client.exec_command(command)
-    str_list = []
-    channel = ssh_stdout.channel
-    buf = channel.recv(read_buf_size)
-    while buf:
-        str_list.append(buf)
-        buf = channel.recv(read_buf_size)
-
-    # TODO need to handle the case that the user doesnt have sudo access to ovs-ofctl and they are asked to enter a password
-
-    stderr_str = ssh_stderr.read().strip()
-    if stderr_str:
-        print 'SSH command error:\n%s' % stderr_str
-
-    # Use the following lines for simple commands, but
-    # for longer running commands, use the channel
-    #ssh_stdout.flush()
-    #strout = ssh_stdout.read().strip()
-    #strerr = ssh_stderr.read().strip()
-    #print 'SSH command:\n%s\n%s\n%s\nrc=%d' % (command, strout, strerr, rc)
-
-    return (channel.recv_exit_status(), ''.join(str_list).split('\n'))
-
-# Given the input parameters, pass the dump-flows output to the Flows.FlowEntryFactory, 
-# and return the results in an instance of Flows.FlowEntries.FlowEntryContainer
-def dump_flows(of_version, switch, host='localhost', table='', extra_args='', user='', pw=''):
-    #
-    # Call ovs-ofctl, the resulting output is stored in flow_entry_strs
-    #
+        try:
+            # os.read() returns whatever is available, instead of waiting for READ_BUF_SIZE bytes
+            for line in _iter_lines(lambda: os.read(process.stdout.fileno(), READ_BUF_SIZE)):
+                yield line
+        finally:
+            # If the iteration was stopped early, dont wait for the command to finish
+            if process.poll() is None:
+                process.terminate()
+            process.stdout.close()
+            self.return_code = process.wait()
+
+        #print '\"%s\", rc=%d' % (self._command_str, self.return_code)
+
+        if self.return_code != 0 and not self._cancelled:
+            print 'Non-zero return code [%d] for command: \"%s\"' % (self.return_code, self._command_str)
+
+#
+# Internal class to iterate the stdout lines of a command executed via SSH
+# The SSH connection is taken from the _ssh_pool
+# The return_code is set once all the lines have been iterated
+# cancel() can be called from another thread, it closes the channel, which stops the
+# command, the SSH connection is kept in the pool
+#
+class _RemoteCommandLines(object):
+    def __init__(self, host, user, pw, command_str, port=22):
+        self._host = host
+        self._user = user
+        self._pw = pw
+        self._port = port
+        self._command_str = command_str
+        self._channel = None
+        self._cancelled = False
+        self.return_code = None
+
+    def cancel(self):
+        self._cancelled = True
+        channel = self._channel
+        if channel is not None:
+            # A recv() blocked in the iterating thread returns an empty string
+            channel.close()
+
+    def __iter__(self):
+        with _ssh_pool.connection(self._host, self._user, self._pw, self._port) as ssh_client:
+            (__, ssh_stdout, ssh_stderr) = ssh_client.exec_command(self._command_str)
+            channel = ssh_stdout.channel
+            self._channel = channel
+            if self._cancelled:
+                channel.close()
+
+            try:
+                for line in _iter_lines(lambda: channel.recv(READ_BUF_SIZE)):
+                    yield line
+            finally:
+                # If the iteration was stopped early, the channel wont be at EOF
+                if not channel.exit_status_ready():
+                    channel.close()
+
+        # TODO need to handle the case that the user doesnt have sudo access to ovs-ofctl and they are asked to enter a password
+
+        stderr_str = ssh_stderr.read().strip()
+        if stderr_str and not self._cancelled:
+            print 'SSH command error:\n%s' % stderr_str
+
+        self.return_code = channel.recv_exit_status()
+
+#
+# Internal generator that decompresses the gzip chunks returned by read_chunk(), including
+# files with several gzip members, as written by "cat a.gz b.gz"
+#
+def _iter_gunzip_chunks(read_chunk):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunk = read_chunk()
+    while chunk:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+        if decompressor.unused_data:
+            # The start of the next gzip member
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            chunk = read_chunk()
+    data = decompressor.flush()
+    if data:
+        yield data
+
+#
+# Internal class to iterate the lines of saved dump-flows output, from a file or from
+# stdin if the file_name is "-". Gzip input is detected by its magic bytes and decompressed
+# as its read. Large uncompressed files are memory mapped.
+# The return_code is set once all the lines have been iterated, its -1 if the file
+# cant be read, as with _CommandLines
+#
+class _FileLines(object):
+    def __init__(self, file_name):
+        self._file_name = file_name
+        self.return_code = None
+
+    def __iter__(self):
+        try:
+            if self._file_name == '-':
+                input_file = None
+                fileno = sys.stdin.fileno()
+            else:
+                input_file = open(self._file_name, 'rb')
+                fileno = input_file.fileno()
+        except (IOError, OSError) as e:
+            print 'IO Error [%d] \"%s\", reading file \"%s\"' % (e.errno, e.strerror, self._file_name)
+            self.return_code = -1
+            return
+
+        file_mmap = None
+        try:
+            first_chunk = os.read(fileno, READ_BUF_SIZE)
+            if first_chunk.startswith(GZIP_MAGIC):
+                chunks = itertools.chain([first_chunk], iter(lambda: os.read(fileno, READ_BUF_SIZE), ''))
+                compressed_chunks = _iter_gunzip_chunks(lambda: next(chunks, ''))
+                lines = _iter_lines(lambda: next(compressed_chunks, ''))
+            elif input_file is not None and os.fstat(fileno).st_size >= MMAP_MIN_SIZE:
+                # readline() on the mmap splits the lines in C, without copying the chunks
+                file_mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+                lines = iter(file_mmap.readline, '')
+            else:
+                chunks = itertools.chain([first_chunk], iter(lambda: os.read(fileno, READ_BUF_SIZE), ''))
+                lines = _iter_lines(lambda: next(chunks, ''))
+
+            for line in lines:
+                yield line
+            self.return_code = 0
+        except (IOError, OSError, zlib.error) as e:
+            print 'Error reading file \"%s\": %s' % (self._file_name, e)
+            self.return_code = -1
+        finally:
+            if file_mmap is not None:
+                file_mmap.close()
+            if input_file is not None:
+                input_file.close()
+
+#
+# The progress of a dump-flows refresh, shared between the thread dumping the flows and
+# another thread, like the GUI main thread. The counters are updated as the lines are
+# received and parsed, and cancel() stops the dump: the SSH channel is closed, or the local
+# command is terminated. A cancelled refresh fails, so the flow entries arent changed.
+#   callback - an optional callable, called as callback(progress) every CALLBACK_LINES
+#              lines received. Its called from the thread dumping the flows.
+# Usage:
+#    progress = DumpFlows.DumpFlowsProgress()
+#    delta = DumpFlows.refresh_flows(refresher, 'OpenFlow13', 'br-int', progress=progress)
+#    # from another thread
+#    print progress.lines_received, progress.flows_parsed
+#    progress.cancel()
+#
+class DumpFlowsProgress(object):
+    CALLBACK_LINES = 1000
+
+    def __init__(self, callback=None):
+        self.lines_received = 0
+        self.flows_parsed = 0
+        self.cancelled = False
+        self.callback = callback
+        self._flow_entry_strs = None  # the lines being dumped, set by _ProgressLines
+
+    def __str__(self):
+        return '%d lines received, %d flows parsed%s' % (self.lines_received, self.flows_parsed, ', cancelled' if self.cancelled else '')
+
+    def cancel(self):
+        self.cancelled = True
+        cancel = getattr(self._flow_entry_strs, 'cancel', None)
+        if cancel is not None:
+            cancel()
+
+#
+# Internal class to count the lines of flow_entry_strs in a DumpFlowsProgress, and stop
+# iterating them when its cancelled. The return_code is -1 if it was cancelled.
+#
+class _ProgressLines(object):
+    def __init__(self, flow_entry_strs, progress):
+        self._flow_entry_strs = flow_entry_strs
+        self._progress = progress
+        progress._flow_entry_strs = flow_entry_strs
+
+    def __iter__(self):
+        progress = self._progress
+        lines = iter(self._flow_entry_strs)
+        try:
+            for line in lines:
+                if progress.cancelled:
+                    return
+                progress.lines_received += 1
+                if progress.callback is not None and progress.lines_received % DumpFlowsProgress.CALLBACK_LINES == 0:
+                    progress.callback(progress)
+                yield line
+        finally:
+            # Stop the command now, instead of when the generator is garbage collected
+            close = getattr(lines, 'close', None)
+            if close is not None:
+                close()
+
+    def get_return_code(self):
+        if self._progress.cancelled:
+            return -1
+        return self._flow_entry_strs.return_code
+    return_code = property(fget=get_return_code)
+
+#
+# Return an iterable of the dump-flows output lines. Its return_code is
+# set once all the lines have been iterated
+#
+def _dump_flows_lines(of_version, switch, host, table, extra_args, user, pw):
     command_str = 'ovs-ofctl -O %s dump-flows %s %s %s' % (of_version, switch, 'table=%s'%(table) if len(table) > 0 else '', extra_args)
     print 'Executing command: %s' % command_str
     if host == 'localhost':
-        (rc, flow_entry_strs) = _execute_command([command_str])
+        return _CommandLines(command_str)
     else:
-        (rc, flow_entry_strs) = _execute_remote_command(host, user, pw, 'sudo %s'%command_str)
+        return _RemoteCommandLines(host, user, pw, 'sudo %s'%command_str)
 
-    flow_entries = FlowEntryContainer()
+#
+# Generator that parses each dump-flows output line as its received and yields the
+# resulting Flows.FlowEntries.FlowEntry objects
+#
+def iter_flow_entries(flow_entry_strs):
+    for line in flow_entry_strs:
+        line = line.strip()
+        if not FlowEntryFactory.is_flow_line(line):
+            continue
+
+        yield FlowEntryFactory.parse_entry(line)
 
-    if rc != 0:
-        return flow_entries
+#
+# Internal generator that splits the lines into lists of chunk_lines lines
+#
+def _iter_chunks(lines, chunk_lines):
+    while True:
+        chunk = list(itertools.islice(lines, chunk_lines))
+        if not chunk:
+            return
+        yield chunk
 
+#
+# Internal function to parse the flow_entry_strs lines into flow_entries,
+# returns the command return code. If its not 0, flow_entries keeps the FlowEntries
+# added before the failure, the callers reset the containers they created.
+#   processes - if greater than 1, and there are at least PARALLEL_MIN_LINES lines,
+#               the lines are parsed in this many processes, see Flows.FlowEntryParallel
+#
+def _fill_flow_entries(flow_entry_strs, flow_entries, entry_callback=None, processes=1):
     #
-    # Parse each input line and store the resulting FlowEntries objects
+    # Parse each input line as its received and store the resulting FlowEntries objects
     #
-    for line in flow_entry_strs:
-        if line.startswith('OFPST_FLOW') or len(line) == 0:
-            continue
+    if processes > 1:
+        # Read enough lines to know if its worth starting the processes
+        lines = iter(flow_entry_strs)
+        first_lines = list(itertools.islice(lines, PARALLEL_MIN_LINES))
+        if len(first_lines) < PARALLEL_MIN_LINES:
+            flow_entry_iter = iter_flow_entries(first_lines)
+        else:
+            flow_entry_iter = iter_flow_entries_parallel(_iter_chunks(itertools.chain(first_lines, lines), PARALLEL_CHUNK_LINES), processes)
+    else:
+        flow_entry_iter = iter_flow_entries(flow_entry_strs)
+
+    for flow_entry in flow_entry_iter:
+        flow_entries.add_flow_entry(flow_entry)
+        if entry_callback:
+            entry_callback(flow_entry)
+
+    return flow_entry_strs.return_code
+
+# Given the input parameters, pass the dump-flows output to the Flows.FlowEntryFactory,
+# and return the results in an instance of Flows.FlowEntries.FlowEntryContainer
+#   flow_entries   - an optional FlowEntryContainer to fill in, else a new one is created
+#   entry_callback - an optional callable, called with each FlowEntry as soon as its been
+#                    parsed and added to flow_entries, while the dump is still streaming
+#   processes      - the number of processes used to parse very large dumps, the default
+#                    of 1 parses in this process, see _fill_flow_entries()
+# If the command fails, the returned FlowEntryContainer will be empty, unless flow_entries
+# was passed in, then it keeps the FlowEntries already added and passed to entry_callback
+def dump_flows(of_version, switch, host='localhost', table='', extra_args='', user='', pw='', flow_entries=None, entry_callback=None, processes=1):
+    #
+    # Call ovs-ofctl, the resulting output lines are streamed from flow_entry_strs
+    #
+    flow_entry_strs = _dump_flows_lines(of_version, switch, host, table, extra_args, user, pw)
+
+    created = flow_entries is None
+    if created:
+        flow_entries = FlowEntryContainer()
+
+    if _fill_flow_entries(flow_entry_strs, flow_entries, entry_callback, processes) != 0 and created:
+        flow_entries.reset()
+
+    return flow_entries
+
+#
+# Dump the flows again, only parsing the flows that changed since the previous refresh,
+# and return a FlowEntryDelta.FlowEntryDelta, or None if the command fails
+#   refresher - the FlowEntryDelta.FlowEntryDeltaRefresher used for the previous refreshes
+#               of the same switch and table, its flow_entries are updated in place
+#   progress  - an optional DumpFlowsProgress, to follow or cancel the refresh from another thread
+# Usage:
+#    refresher = DumpFlows.FlowEntryDeltaRefresher()
+#    delta = DumpFlows.refresh_flows(refresher, 'OpenFlow13', 'br-int')
+#    flow_entries = refresher.flow_entries
+#
+def refresh_flows(refresher, of_version, switch, host='localhost', table='', extra_args='', user='', pw='', progress=None):
+    flow_entry_strs = _dump_flows_lines(of_version, switch, host, table, extra_args, user, pw)
+    if progress is not None:
+        flow_entry_strs = _ProgressLines(flow_entry_strs, progress)
+    return refresher.refresh(flow_entry_strs, progress)
+
+#
+# The same as dump_flows(), but the dump-flows output is read from a file saved earlier,
+# or from stdin if file_name is "-", the file may be gzip compressed.
+# Usage:
+#    $ ovs-ofctl -O OpenFlow13 dump-flows br-int | gzip > br-int.txt.gz
+#    flow_entries = DumpFlows.dump_flows_file('br-int.txt.gz')
+#
+def dump_flows_file(file_name, flow_entries=None, entry_callback=None, processes=1):
+    created = flow_entries is None
+    if created:
+        flow_entries = FlowEntryContainer()
 
-        flow_entries.add_flow_entry(FlowEntryFactory.parse_entry(line.strip()))
+    if _fill_flow_entries(_FileLines(file_name), flow_entries, entry_callback, processes) != 0 and created:
+        flow_entries.reset()
 
     return flow_entries
+
+#
+# The same as refresh_flows(), but the dump-flows output is read from a file,
+# see dump_flows_file()
+#
+def refresh_flows_file(refresher, file_name, progress=None):
+    flow_entry_strs = _FileLines(file_name)
+    if progress is not None:
+        flow_entry_strs = _ProgressLines(flow_entry_strs, progress)
+    return refresher.refresh(flow_entry_strs, progress)
+
+#
+# A switch to dump, used as the key in Flows.FlowEntries.FlowEntryTargetContainer
+# The table is optional, an empty string means all the tables.
+#
+class DumpFlowsTarget(namedtuple('DumpFlowsTarget', 'host switch table')):
+    __slots__ = ()
+
+    def __new__(cls, host, switch, table=''):
+        return super(DumpFlowsTarget, cls).__new__(cls, host, switch, str(table))
+
+    def __str__(self):
+        target_str = self.switch if self.host == 'localhost' else '%s/%s' % (self.host, self.switch)
+        if self.table:
+            return '%s:%s' % (target_str, self.table)
+        return target_str
+
+    #
+    # Create a DumpFlowsTarget from a string with the format: [host/]switch[:table]
+    # If the host isnt specified, then its localhost. The host has its own separator, so
+    # "br-int:3" is table 3 of the local br-int, and IPv6 hosts can be used.
+    #
+    @staticmethod
+    def parse(target_str):
+        (host, separator, switch_str) = target_str.rpartition('/')
+        if not separator:
+            host = 'localhost'
+        fields = switch_str.split(':')
+        if not host or not fields[0] or len(fields) > 2:
+            raise ValueError('Invalid dump-flows target "%s", expected [host/]switch[:table]' % target_str)
+        if len(fields) == 2 and not fields[1].isdigit():
+            raise ValueError('Invalid dump-flows target "%s", the table must be a number, expected [host/]switch[:table]' % target_str)
+        return DumpFlowsTarget(host, *fields)
+
+#
+# Internal function to dump one target, returns (flow_entries, elapsed, error)
+#
+def _dump_target(of_version, target, extra_args, user, pw):
+    start = time.time()
+    flow_entries = FlowEntryContainer()
+    error = None
+    try:
+        flow_entry_strs = _dump_flows_lines(of_version, target.switch, target.host, target.table, extra_args, user, pw)
+        return_code = _fill_flow_entries(flow_entry_strs, flow_entries)
+        if return_code != 0:
+            flow_entries.reset()
+            error = 'Non-zero return code [%d]' % return_code
+    except Exception as e:
+        flow_entries.reset()
+        error = str(e) or e.__class__.__name__
+
+    return (flow_entries, time.time() - start, error)
+
+#
+# Dump several targets concurrently, using at most max_workers threads, and return
+# the results in an instance of Flows.FlowEntries.FlowEntryTargetContainer, in the
+# same order as targets. The targets on the same host share one pooled SSH connection.
+#   targets         - a list of DumpFlowsTarget
+#   user, pw        - used for all the remote targets
+#   target_callback - an optional callable, called as target_callback(target, flow_entries, elapsed, error)
+#                     when each target has been dumped. Its called from the worker threads.
+# The errors dont stop the other targets from being dumped, theyre stored per target
+#
+def dump_flows_targets(of_version, targets, extra_args='', user='', pw='', max_workers=8, target_callback=None):
+    targets = list(targets)
+    results = [None] * len(targets)
+    pending = Queue()
+    for i in range(len(targets)):
+        pending.put(i)
+
+    def worker():
+        while True:
+            try:
+                i = pending.get_nowait()
+            except Empty:
+                return
+            target = targets[i]
+            results[i] = _dump_target(of_version, target, extra_args, user, pw)
+            if target_callback:
+                target_callback(target, *results[i])
+
+    threads = [threading.Thread(target=worker) for __ in range(max(1, min(max_workers, len(targets))))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    target_container = FlowEntryTargetContainer()
+    for (target, (flow_entries, elapsed, error)) in zip(targets, results):
+        target_container.add_target(target, flow_entries, elapsed, error)
+
+    return target_container
@@ -0,0 +1,234 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+from FlowDebugger.Flows.FlowEntryFields import parse_ipv4
+from FlowDebugger.Flows.FlowEntryMatches import FlowEntryMatchLayer3, FlowEntryMatchUnknown
+from FlowDebugger.Flows.FlowPrefixTrie import FlowPrefixTrie
+from FlowDebugger.Flows.PacketHeader import PacketHeader
+
+#
+# Tuple Space Search classifier for the FlowEntries of one OFS table, as done in OVS.
+#
+# The FlowEntry match objects are reduced to their normalized (field name, value, mask)
+# fields, see FlowEntryMatches.get_packed_fields(). A FlowEntry matches a packet if for
+# each of its fields, (packet value & mask) == value, so the masks are applied as in OVS:
+# nw_src=10.0.0.0/24 matches the packets from the whole subnet, and metadata=0x3e/0xfff
+# only compares the lower 12 bits of the packet metadata. The packet fields are the fields
+# of the input match objects, see PacketHeader.get_fields().
+#
+# The FlowEntries are grouped by their "shape": the set of (field name, mask) they match
+# on, like the OVS tuples. Within a group, the FlowEntries are stored in a dictionary keyed
+# by their values, so a lookup costs one dictionary probe per group instead of one
+# comparison per FlowEntry. The groups are searched in descending max-priority order,
+# stopping as soon as no remaining group can contain a higher priority FlowEntry than the
+# one already found.
+#
+# Only the masked packet values that are also the value of one of the FlowEntries can
+# change the lookup result, see FlowTableClassifier.get_projection(). Packets with the same
+# projection onto a table always match the same FlowEntry in it, see FlowTracer.trace_batch().
+#
+# Routing-style tables have many FlowEntries matching on nw_dst or nw_src prefixes of
+# different lengths. The prefixes of these fields, see FlowEntryMatchLayer3.PREFIX_FIELDS,
+# are stored in a FlowPrefixTrie per field. When a field has many prefix lengths, the
+# projection of a packet walks the trie, so it only checks the prefix lengths used under
+# the packet address, instead of masking it with every prefix length in the table. With
+# few prefix lengths, masking is faster than walking the trie. The tries also answer which
+# FlowEntries cover a prefix, see FlowTableClassifier.get_covering_entries().
+#
+
+#
+# All the FlowEntries in a table that match on the same fields and masks
+#
+class _FlowShapeGroup(object):
+    def __init__(self, shape):
+        self.shape = shape            # sorted tuple of (field name, mask)
+        self.max_priority = None
+        self.entries = {}             # dictionary {tuple of the shape values : FlowEntry}
+
+    def add_flow_entry(self, values, flow_entry):
+        current_entry = self.entries.get(values)
+        # Keep the highest priority entry, the first one added wins a priority tie
+        if current_entry is None or flow_entry.priority_ > current_entry.priority_:
+            self.entries[values] = flow_entry
+        if self.max_priority is None or flow_entry.priority_ > self.max_priority:
+            self.max_priority = flow_entry.priority_
+
+    #
+    # Return the FlowEntry in this group matched by the packet, or None
+    # masked_values is a dictionary {(field name, mask) : masked packet value}
+    #
+    def lookup(self, masked_values):
+        values = []
+        for field_mask in self.shape:
+            value = masked_values.get(field_mask)
+            if value is None:
+                return None
+            values.append(value)
+        return self.entries.get(tuple(values))
+
+
+class FlowTableClassifier(object):
+    # The minimum number of prefix lengths of a field for get_projection() to walk its trie
+    PREFIX_TRIE_MIN_LENS = 16
+
+    # flow_entries is an iterable of the FlowEntry objects of one table
+    def __init__(self, flow_entries=()):
+        self._groups_byShape = {}
+        self._groups = []
+        self._masks_byField = {}       # dictionary {field name : [masks]}
+        self._values_byFieldMask = {}  # dictionary {(field name, mask) : set of the FlowEntry values}
+        self._prefix_tries = {}        # dictionary {prefix field name : FlowPrefixTrie}
+        # The masks_byField and prefix tries used by get_projection(), see _update_projection()
+        self._projection_masks_byField = {}
+        self._projection_tries = {}
+        self._projection_updated = True
+        self._sorted = True
+        for flow_entry in flow_entries:
+            self.add_flow_entry(flow_entry)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add_flow_entry(self, flow_entry):
+        fields = {}  # dictionary {(field name, mask) : value}
+        for match_obj in flow_entry.match_object_list_:
+            if isinstance(match_obj, FlowEntryMatchUnknown):
+                # Unparseable matches cant be compared, so this FlowEntry can never match
+                return
+            for (name, value, mask) in match_obj.get_packed_fields():
+                if fields.setdefault((name, mask), value) != value:
+                    # Contradictory values, like "tcp,nw_proto=17", this FlowEntry can never match
+                    return
+
+        shape = tuple(sorted(fields))
+        group = self._groups_byShape.get(shape)
+        if group is None:
+            group = _FlowShapeGroup(shape)
+            self._groups_byShape[shape] = group
+            self._groups.append(group)
+        group.add_flow_entry(tuple([fields[field_mask] for field_mask in shape]), flow_entry)
+        self._sorted = False
+        self._projection_updated = False
+
+        for (field_mask, value) in fields.iteritems():
+            self._add_prefix(field_mask, value, flow_entry)
+            values = self._values_byFieldMask.get(field_mask)
+            if values is None:
+                values = set()
+                self._values_byFieldMask[field_mask] = values
+                self._masks_byField.setdefault(field_mask[0], []).append(field_mask[1])
+            values.add(value)
+
+    #
+    # Internal method to add a FlowEntry field to the trie of a prefix field, if its a prefix
+    # field and the mask is a prefix, unlike nw_dst=10.0.0.1/255.0.255.0
+    #
+    def _add_prefix(self, field_mask, value, flow_entry):
+        (name, mask) = field_mask
+        bits = FlowEntryMatchLayer3.PREFIX_FIELDS.get(name)
+        if bits is None:
+            return
+        trie = self._prefix_tries.get(name)
+        if trie is None:
+            trie = FlowPrefixTrie(bits)
+            if trie.get_prefix_len(mask) is None:
+                return
+            self._prefix_tries[name] = trie
+        trie.add_prefix(value, mask, flow_entry)
+
+    #
+    # Internal method to choose how get_projection() checks each field: the prefix tries
+    # of the fields with at least PREFIX_TRIE_MIN_LENS prefix lengths are walked, and
+    # only their other masks are in _projection_masks_byField
+    #
+    def _update_projection(self):
+        self._projection_masks_byField = dict(self._masks_byField)
+        self._projection_tries = {}
+        for (name, trie) in self._prefix_tries.iteritems():
+            if len(trie.prefix_lens) >= FlowTableClassifier.PREFIX_TRIE_MIN_LENS:
+                self._projection_tries[name] = trie
+                self._projection_masks_byField[name] = [mask for mask in self._masks_byField[name] if trie.get_prefix_len(mask) is None]
+        self._projection_updated = True
+
+    # Return the FlowPrefixTrie of a prefix field, or None if no FlowEntry matches on its prefixes
+    def get_prefix_trie(self, name):
+        return self._prefix_tries.get(name)
+
+    #
+    # Return a list of the FlowEntries whose prefix of the field covers the prefix string,
+    # like "10.1.2.0/24" or "10.1.2.3", ordered by descending priority. Only the field is
+    # compared, the FlowEntries may match on other fields too. Raises ValueError if the
+    # field isnt a prefix field, or the prefix cant be parsed.
+    #
+    def get_covering_entries(self, name, prefix):
+        if name not in FlowEntryMatchLayer3.PREFIX_FIELDS:
+            raise ValueError('%s isnt a prefix field, use one of: %s' % (name, ', '.join(sorted(FlowEntryMatchLayer3.PREFIX_FIELDS))))
+        (value, mask) = parse_ipv4(prefix)
+        trie = self._prefix_tries.get(name) or FlowPrefixTrie(FlowEntryMatchLayer3.PREFIX_FIELDS[name])
+        prefix_len = trie.get_prefix_len(mask)
+        if prefix_len is None:
+            raise ValueError('Invalid %s prefix: %s' % (name, prefix))
+        return trie.get_covering_entries(value, prefix_len)
+
+    #
+    # Return the projection of a packet onto this table: the frozenset of
+    # ((field name, mask), masked packet value) for the masks the table FlowEntries use,
+    # when the masked value is also the value of one of them. packet_fields is a
+    # dictionary {field name : value}, see PacketHeader.get_fields(). The other packet
+    # values cant change the lookup result, so lookup_projection() of the projection
+    # returns the same FlowEntry as lookup().
+    #
+    def get_projection(self, packet_fields):
+        if not self._projection_updated:
+            self._update_projection()
+
+        projection = []
+        for (name, value) in packet_fields.iteritems():
+            masks = self._projection_masks_byField.get(name)
+            if not masks:
+                continue
+            if not isinstance(value, (int, long)):
+                # The values that couldnt be normalized only match the same value with a None mask
+                if value in self._values_byFieldMask.get((name, None), ()):
+                    projection.append(((name, None), value))
+                continue
+            for mask in masks:
+                if mask is not None and value & mask in self._values_byFieldMask[(name, mask)]:
+                    projection.append(((name, mask), value & mask))
+        for (name, trie) in self._projection_tries.iteritems():
+            value = packet_fields.get(name)
+            if isinstance(value, (int, long)):
+                for (__, mask, masked_value, __) in trie.get_matches(value):
+                    projection.append(((name, mask), masked_value))
+        return frozenset(projection)
+
+    #
+    # Return the highest priority FlowEntry matched by input_match_object_list,
+    # or None if no FlowEntry matches
+    #
+    def lookup(self, input_match_object_list):
+        return self.lookup_projection(self.get_projection(PacketHeader(input_match_object_list).fields))
+
+    #
+    # Return the highest priority FlowEntry matched by a projection returned by
+    # get_projection(), or None if no FlowEntry matches
+    #
+    def lookup_projection(self, projection):
+        if not self._sorted:
+            self._groups.sort(key=lambda group: group.max_priority, reverse=True)
+            self._sorted = True
+
+        masked_values = dict(projection)
+        best_entry = None
+        for group in self._groups:
+            if best_entry is not None and group.max_priority <= best_entry.priority_:
+                # The groups are sorted by max_priority, no better match can be found
+                break
+            flow_entry = group.lookup(masked_values)
+            if flow_entry is not None and (best_entry is None or flow_entry.priority_ > best_entry.priority_):
+                best_entry = flow_entry
+
+        return best_entry
@@ -4,12 +4,23 @@ Created on Nov 20, 2014
 @author: Brady Johnson
 '''
 
+import getpass
 import optparse
+import time
 import FlowDebugger.Flows.DumpFlows as DumpFlows
 from FlowDebugger.Flows.FlowEntries import FlowEntryFormatter
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from FlowDebugger.Flows.FlowMonitor import FlowMonitor, FlowRateMonitor
+from FlowDebugger.Flows.FlowReachability import FlowReachability
+from FlowDebugger.Flows.FlowShadowing import FlowShadowing, FlowShadowingResult
+from FlowDebugger.Flows.FlowSnapshot import FlowSnapshot
+from FlowDebugger.Flows.HeaderSpace import HeaderSpace
 from FlowDebugger.Gui.FlowDebuggerGui import FlowDebuggerGui
 
 class FlowDebuggerMain(object):
+    # The maximum number of covering entries displayed for a --shadowed entry
+    MAX_COVERING_ENTRIES = 10
+
     def __init__(self):
         #
         # Command Line Options
@@ -30,6 +41,10 @@ class FlowDebuggerMain(object):
         self._parser.add_option('--matched-only',
                                 action='store_true',
                                 help='Only display flow entries that have matched')
+        self._parser.add_option('--top',
+                                type='int',
+                                default=0,
+                                help='Only display the TOP flow entries with the most bytes, or the highest rates with --monitor (Default: 10), stdout only')
         self._parser.add_option('-p', '--priority',
                                 action='store_true',
                                 help='Iterate the flow entries for a table based on priority, as opposed to alphabetically, Default: alphabetically')
@@ -39,6 +54,214 @@ class FlowDebuggerMain(object):
                                 choices=['OpenFlow11', 'OpenFlow13'],
                                 dest='open_flow_version',
                                 help='Specify the OpenFlow version [OpenFlow11, OpenFlow13], Default: OpenFlow13')
+        self._parser.add_option('-t', '--target',
+                                action='append',
+                                default=[],
+                                dest='targets',
+                                metavar='[HOST/]SWITCH[:TABLE]',
+                                help='Dump several switches concurrently, this option may be repeated, stdout only')
+        self._parser.add_option('-u', '--user',
+                                default='',
+                                help='The SSH user for remote targets, the password will be requested')
+        self._parser.add_option('-w', '--workers',
+                                type='int',
+                                default=8,
+                                help='The maximum number of targets dumped concurrently, Default: 8')
+        self._parser.add_option('--monitor',
+                                type='float',
+                                default=0.0,
+                                metavar='INTERVAL',
+                                help='Poll the switch every INTERVAL seconds and display the TOP flows with the highest rates, stdout only')
+        self._parser.add_option('--count',
+                                type='int',
+                                default=0,
+                                help='The number of times to poll the switch with --monitor, Default: 0, until interrupted')
+        self._parser.add_option('--by',
+                                default='bytes',
+                                type='choice',
+                                choices=FlowRateMonitor.BY_VALUES,
+                                help='Rank the --monitor flows by [bytes, packets] per second, Default: bytes')
+        self._parser.add_option('-j', '--jobs',
+                                type='int',
+                                default=1,
+                                help='The number of processes used to parse very large dumps, Default: 1, stdout only')
+        self._parser.add_option('-f', '--input-file',
+                                metavar='FILE',
+                                help='Read the flow entries from saved dump-flows output in FILE, which may be gzip compressed, instead of dumping the switch. Use - for stdin')
+        self._parser.add_option('--snapshot',
+                                metavar='FILE',
+                                help='Display the flow entries saved in a snapshot FILE, instead of dumping the switch')
+        self._parser.add_option('--save-snapshot',
+                                metavar='FILE',
+                                help='Save the dumped flow entries to a snapshot FILE, stdout only')
+        self._parser.add_option('--covering',
+                                metavar='FIELD=PREFIX',
+                                help='Only display the flow entries whose FIELD prefix covers PREFIX, for example nw_dst=10.1.2.0/24, stdout only')
+        self._parser.add_option('--reach',
+                                metavar='MATCHES',
+                                help='Display where the packets matching MATCHES go through the tables, for example in_port=2,tcp, "*" for all the packets, stdout only')
+        self._parser.add_option('--shadowed',
+                                action='store_true',
+                                help='Only display the flow entries that can never be hit, since higher priority entries cover them, or that are redundant with lower priority entries with the same actions, flagged in the GUI')
+        self._parser.add_option('--cache-stats',
+                                action='store_true',
+                                help='Display the hit rates of the flow entry parse caches, stdout only')
+
+    #
+    # Output the flow entries in a FlowEntryContainer to stdout
+    #
+    def _print_flow_entries(self, flow_entries, options):
+        flow_entry_formatter = FlowEntryFormatter(options.verbose, options.multiline)
+        if options.top:
+            print "\nTop %d Flow entries by bytes" % (options.top)
+            for entry in flow_entries.get_top_entries(options.top):
+                print flow_entry_formatter.print_flow_entry(entry)
+            return
+
+        table_totals = flow_entries.get_table_totals()
+        for table in flow_entries.iter_tables():
+            (num_entries, n_packets, n_bytes) = table_totals[table]
+            if options.verbose:
+                print "\nTable[%d] %d entries, n_packets=%d, n_bytes=%d"%(table, num_entries, n_packets, n_bytes)
+            else:
+                print "\nTable[%d] %d entries"%(table, num_entries)
+            for entry in flow_entries.get_table_view(table, by_priority=options.priority, matched_only=options.matched_only):
+                print flow_entry_formatter.print_flow_entry(entry)
+
+    #
+    # Output the flow entries of each table that cover the --covering FIELD=PREFIX to stdout
+    #
+    def _print_covering_entries(self, flow_entries, options):
+        (name, __, prefix) = options.covering.partition('=')
+        flow_entry_formatter = FlowEntryFormatter(options.verbose, options.multiline)
+        for table in flow_entries.iter_tables():
+            try:
+                covering_entries = flow_entries.get_covering_entries(table, name, prefix)
+            except ValueError as e:
+                print "INVALID Arguments, --covering %s" % e
+                return
+            print "\nTable[%d] %d entries covering %s" % (table, len(covering_entries), options.covering)
+            for entry in covering_entries:
+                print flow_entry_formatter.print_flow_entry(entry)
+
+    #
+    # Output where the --reach MATCHES packets end up, starting in table 0, to stdout
+    #
+    def _print_reachability(self, flow_entries, options):
+        if options.reach.strip() == '*':
+            input_space = HeaderSpace.all_packets()
+        else:
+            try:
+                input_space = HeaderSpace.from_match_objects(FlowEntryFactory.parse_match_list(options.reach))
+            except ValueError as e:
+                print "INVALID Arguments, --reach %s" % e
+                return
+        reachability = FlowReachability(flow_entries)
+        results = reachability.analyze(input_space)
+        print "\n%d outcomes for %s" % (len(results), options.reach)
+        for result in results:
+            print result
+        unsupported_entries = reachability.get_unsupported_entries()
+        if unsupported_entries:
+            print "\nIgnored %d entries that match on values that cant be compared:" % len(unsupported_entries)
+            flow_entry_formatter = FlowEntryFormatter(options.verbose, options.multiline)
+            for entry in unsupported_entries:
+                print flow_entry_formatter.print_flow_entry(entry)
+
+    #
+    # Output the --shadowed flow entries of each table to stdout, with the entries covering them
+    #
+    def _print_shadowed_entries(self, flow_entries, options):
+        flow_entry_formatter = FlowEntryFormatter(options.verbose, options.multiline)
+        shadowing = FlowShadowing(flow_entries)
+        for table in flow_entries.iter_tables():
+            results = shadowing.analyze_table(table)
+            num_shadowed = len([result for result in results if result.kind == FlowShadowingResult.SHADOWED])
+            num_undetermined = len([result for result in results if result.kind == FlowShadowingResult.UNDETERMINED])
+            print "\nTable[%d] %d shadowed, %d redundant, %d undetermined entries" % (
+                    table, num_shadowed, len(results) - num_shadowed - num_undetermined, num_undetermined)
+            for result in results:
+                print "%s %s" % (result.kind.upper(), flow_entry_formatter.print_flow_entry(result.flow_entry))
+                for covering_entry in result.covering_entries[:FlowDebuggerMain.MAX_COVERING_ENTRIES]:
+                    print "    by %s" % flow_entry_formatter.print_flow_entry(covering_entry)
+                if len(result.covering_entries) > FlowDebuggerMain.MAX_COVERING_ENTRIES:
+                    print "    and %d more entries" % (len(result.covering_entries) - FlowDebuggerMain.MAX_COVERING_ENTRIES)
+        unsupported_entries = shadowing.get_unsupported_entries()
+        if unsupported_entries:
+            print "\nIgnored %d entries that match on values that cant be compared" % len(unsupported_entries)
+
+    #
+    # Dump the --target switches concurrently, and output the results per target to stdout
+    #
+    def _main_targets(self, options):
+        try:
+            targets = [DumpFlows.DumpFlowsTarget.parse(target_str) for target_str in options.targets]
+        except ValueError as e:
+            print "INVALID Arguments, %s" % e
+            return
+
+        user = options.user or getpass.getuser()
+        pw = ''
+        if [target for target in targets if target.host != 'localhost']:
+            pw = getpass.getpass('SSH password for %s: ' % user)
+
+        target_container = DumpFlows.dump_flows_targets(options.open_flow_version, targets,
+                                                        user=user,
+                                                        pw=pw,
+                                                        max_workers=options.workers)
+        DumpFlows.shutdown()
+
+        print 'Dumped %d targets, %d Flow entries' % (len(target_container), target_container.num_flow_entries())
+        for target in target_container:
+            error = target_container.get_error(target)
+            elapsed = target_container.get_elapsed(target)
+            if error:
+                print '\n==== Target %s FAILED in %.3f seconds: %s' % (target, elapsed, error)
+                continue
+            flow_entries = target_container.get_flow_entries(target)
+            print '\n==== Target %s, %d Flow entries in %.3f seconds' % (target, len(flow_entries), elapsed)
+            self._print_flow_entries(flow_entries, options)
+
+    #
+    # Poll the switch and output the flows with the highest rates to stdout, until interrupted
+    #
+    def _main_monitor(self, switch, table, options):
+        flow_monitor = FlowMonitor(options.open_flow_version, switch, table=table, top_n=options.top or 10, by=options.by)
+        flow_entry_formatter = FlowEntryFormatter(options.verbose, options.multiline)
+        num_polls = 0
+        try:
+            while not options.count or num_polls < options.count:
+                if num_polls:
+                    time.sleep(options.monitor)
+                num_polls += 1
+                if flow_monitor.poll() is None:
+                    continue
+
+                rate_monitor = flow_monitor.rate_monitor
+                if rate_monitor.num_samples < 2:
+                    print 'Monitoring %d Flow entries every %.1f seconds' % (len(flow_monitor.flow_entries), options.monitor)
+                    continue
+
+                print '\n==== %s Top %d Flow entries by %s/sec' % (time.strftime('%H:%M:%S'), rate_monitor.top_n, options.by)
+                for (entry, packets_per_sec, bytes_per_sec) in rate_monitor.get_top_flows():
+                    print '%12.1f pkts/s %14.1f bytes/s  %s' % (packets_per_sec, bytes_per_sec, flow_entry_formatter.print_flow_entry(entry))
+        except KeyboardInterrupt:
+            pass
+
+    def _print_cache_stats(self):
+        print '\nParse caches:'
+        for (name, cache) in sorted(FlowEntryFactory.get_caches().iteritems()):
+            print '  %-6s %s' % (name, cache)
+
+    #
+    # Return the Flows.FlowSnapshot.FlowSnapshotContainer for a snapshot file, or None if it cant be loaded
+    #
+    def _load_snapshot(self, file_name):
+        try:
+            return FlowSnapshot.load(file_name)
+        except (IOError, ValueError) as e:
+            print "INVALID snapshot, %s" % e
+            return None
 
     def main(self):
         (options, args) = self._parser.parse_args()
@@ -59,39 +282,68 @@ class FlowDebuggerMain(object):
         #
         # Output the results, either using a GUI or to stdout
         #
-        if options.stdout:
-            #
-            # Output to stdout
-            #
+        if options.targets:
+            self._main_targets(options)
+            if options.cache_stats:
+                self._print_cache_stats()
+        elif options.monitor > 0:
             if len(args) < 1:
                 print "INVALID Arguments, must at least specify the switch"
                 return
+            self._main_monitor(switch, table, options)
+            if options.cache_stats:
+                self._print_cache_stats()
+        elif options.stdout:
+            #
+            # Output to stdout
+            #
+            if options.snapshot:
+                flow_entries = self._load_snapshot(options.snapshot)
+                if flow_entries is None:
+                    return
+            elif options.input_file:
+                flow_entries = DumpFlows.dump_flows_file(options.input_file, processes=options.jobs)
+            else:
+                if len(args) < 1:
+                    print "INVALID Arguments, must at least specify the switch"
+                    return
 
-            # Returns an instance of FlowEntries.FlowEntryContainer
-            flow_entries = DumpFlows.dump_flows(switch=switch, table=table, of_version=options.open_flow_version)
+                # Returns an instance of FlowEntries.FlowEntryContainer
+                flow_entries = DumpFlows.dump_flows(switch=switch, table=table, of_version=options.open_flow_version, processes=options.jobs)
             print 'Displaying %d Flow entries' % (len(flow_entries))
-
-            flow_entry_formatter = FlowEntryFormatter(options.verbose, options.multiline)
-            for table in flow_entries.iter_tables():
-                print "\nTable[%d] %d entries"%(table, flow_entries.num_table_entries(table))
-                if options.priority:
-                    for (__, entry_list) in flow_entries.iter_table_priority_entries(table):
-                        for entry in entry_list:
-                            if options.matched_only and entry.n_packets_ == 0:
-                                continue
-                            print flow_entry_formatter.print_flow_entry(entry)
-                else:
-                    for entry in flow_entries.iter_table_entries(table):
-                        if options.matched_only and entry.n_packets_ == 0:
-                            continue
-                        print flow_entry_formatter.print_flow_entry(entry)
+            if options.covering:
+                self._print_covering_entries(flow_entries, options)
+            elif options.reach:
+                self._print_reachability(flow_entries, options)
+            elif options.shadowed:
+                self._print_shadowed_entries(flow_entries, options)
+            else:
+                self._print_flow_entries(flow_entries, options)
+            if options.save_snapshot:
+                FlowSnapshot.save(flow_entries, options.save_snapshot)
+                print '\nSaved %d Flow entries to %s' % (len(flow_entries), options.save_snapshot)
+            if options.cache_stats:
+                self._print_cache_stats()
         else:
             #
             # GUI
             #
+            flow_entries = None
+            input_file = options.input_file or ''
+            if options.snapshot:
+                flow_entries = self._load_snapshot(options.snapshot)
+                if flow_entries is None:
+                    return
+            elif input_file == '-':
+                # stdin can only be read once, so it cant be refreshed
+                flow_entries = DumpFlows.dump_flows_file(input_file)
+                input_file = ''
             gui = FlowDebuggerGui(switch, table,
                                   options.open_flow_version,
                                   check_pkts=options.verbose,
                                   check_matched=options.matched_only,
-                                  sort_by_priority=options.priority)
+                                  sort_by_priority=options.priority,
+                                  check_shadowed=options.shadowed,
+                                  flow_entries=flow_entries,
+                                  input_file=input_file)
             gui.run()
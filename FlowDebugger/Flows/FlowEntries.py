@@ -4,7 +4,30 @@ Created on Nov 3, 2014
 @author: Brady Johnson
 '''
 
+import bisect
+import heapq
+from FlowDebugger.Flows.FlowClassifier import FlowTableClassifier
+from FlowDebugger.Flows.FlowEntryCache import LruCache
+
+# numpy is optional, its only needed for the FlowEntryColumns
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#
+# A FlowEntry is created for each line of "ovs-ofctl dump-flows" output, so there may be
+# hundreds of thousands of them. To keep them small, __slots__ are used instead of a
+# per-object __dict__, the match and action strings and objects are stored in tuples,
+# and the raw match and actions strings are rebuilt from the string tuples when needed.
+# Measured with bench/bench_memory.py on a 100k flow synthetic dump, a FlowEntry with
+# its strings and match/action objects uses about 1300 bytes, down from about 8000.
+#
 class FlowEntry(object):
+    # The priority of the flows output without one, OFP_DEFAULT_PRIORITY
+    DEFAULT_PRIORITY = 32768
+    __slots__ = ('cookie_', 'duration_', 'table_', 'n_packets_', 'n_bytes_', 'send_flow_rem_', 'priority_',
+                 'match_str_list_', 'match_object_list_', 'action_str_list_', 'action_object_list_', 'extra_fields_')
 
     def __init__(self):
         '''
@@ -17,12 +40,29 @@ class FlowEntry(object):
         self.n_bytes_ = 0
         self.send_flow_rem_ = False
         self.priority_ = 0
-        self.raw_match_ = ''
-        self.raw_actions_ = ''
-        self.match_str_list_ = []
-        self.match_object_list_ = []
-        self.action_str_list_ = []
-        self.action_object_list_ = []
+        self.match_str_list_ = ()
+        self.match_object_list_ = ()
+        self.action_str_list_ = ()
+        self.action_object_list_ = ()
+        # The other "ovs-ofctl dump-flows" header fields and flags, like idle_age,
+        # stored as (key, value) tuples, the value is None for the flags
+        self.extra_fields_ = ()
+
+    #
+    # The match string as output by "ovs-ofctl dump-flows", including the priority. Its rebuilt
+    # from priority_, which is omitted if its the DEFAULT_PRIORITY, as ovs-ofctl does, so a line
+    # written with an explicit "priority=32768" isnt reproduced exactly.
+    #
+    @property
+    def raw_match_(self):
+        if self.priority_ == FlowEntry.DEFAULT_PRIORITY:
+            return ','.join(self.match_str_list_)
+        return ','.join(('priority=%d' % self.priority_,) + self.match_str_list_)
+
+    # The actions string as output by "ovs-ofctl dump-flows", without the "actions=" prefix
+    @property
+    def raw_actions_(self):
+        return ','.join(self.action_str_list_)
 
     def __str__(self):
         return 'Match(%d)[%s] Actions(%d)[%s]' % (len(self.match_str_list_), self.raw_match_, len(self.action_str_list_), self.raw_actions_)
@@ -38,7 +78,7 @@ class FlowEntry(object):
         elif self.priority_ > rhs.priority_:
             return True
 
-        return self.raw_match_ < rhs.raw_match_
+        return self.match_str_list_ < rhs.match_str_list_
 
     def __eq__(self, rhs):
         if self.table_ != rhs.table_:
@@ -47,23 +87,149 @@ class FlowEntry(object):
         if self.priority_ != rhs.priority_:
             return False
 
-        return self.raw_match_ == rhs.raw_match_
+        return self.match_str_list_ == rhs.match_str_list_
+
+    def __ne__(self, rhs):
+        return not self.__eq__(rhs)
 
     def __hash__(self):
-        if len(self.raw_match_) == 0:
-            return ((self.table_ << 16) & (self.priority_))
-        return self.raw_match_.__hash__()
+        return hash((self.table_, self.priority_, self.match_str_list_))
+
+
+#
+# Columnar copy of the FlowEntry counters and sort keys, stored in typed numpy arrays.
+# Row i of each column corresponds to FlowEntryContainer.flow_entries[i], so filters,
+# sorts and aggregates are vectorized numpy operations that return index arrays into
+# the container entry store, see FlowEntryContainer.select().
+# Only available if numpy is installed, see FlowEntryContainer.get_columns().
+#
+class FlowEntryColumns(object):
+    _COLUMN_TYPES = [('table',     'int32'),
+                     ('priority',  'int32'),
+                     ('n_packets', 'uint64'),
+                     ('n_bytes',   'uint64'),
+                     ('duration',  'float64'),
+                     ('cookie',    'uint64')]
+    _MIN_CAPACITY = 1024
+
+    def __init__(self, flow_entries=()):
+        self._size = 0
+        self._arrays = dict((name, numpy.zeros(self._MIN_CAPACITY, dtype=dtype)) for (name, dtype) in self._COLUMN_TYPES)
+        for flow_entry in flow_entries:
+            self.append(flow_entry)
+
+    def __len__(self):
+        return self._size
+
+    # Each column is a read-only view of the valid rows
+    def _get_column(self, name): return self._arrays[name][:self._size]
+    table     = property(fget=lambda self: self._get_column('table'))
+    priority  = property(fget=lambda self: self._get_column('priority'))
+    n_packets = property(fget=lambda self: self._get_column('n_packets'))
+    n_bytes   = property(fget=lambda self: self._get_column('n_bytes'))
+    duration  = property(fget=lambda self: self._get_column('duration'))
+    cookie    = property(fget=lambda self: self._get_column('cookie'))
+
+    def append(self, flow_entry):
+        if self._size == len(self._arrays['table']):
+            # Double the capacity, so appending is amortized O(1)
+            for (name, array) in self._arrays.items():
+                self._arrays[name] = numpy.resize(array, 2 * len(array))
+
+        row = self._size
+        self._arrays['table'][row]     = flow_entry.table_
+        self._arrays['priority'][row]  = flow_entry.priority_
+        self._arrays['n_packets'][row] = flow_entry.n_packets_
+        self._arrays['n_bytes'][row]   = flow_entry.n_bytes_
+        self._arrays['duration'][row]  = float(str(flow_entry.duration_).rstrip('s') or 0)
+        self._arrays['cookie'][row]    = int(flow_entry.cookie_, 16) if flow_entry.cookie_ else 0
+        self._size += 1
+
+    #
+    # Return an index array of the rows, optionally filtered by table and/or
+    # only those that have matched, meaning n_packets > 0
+    #
+    def filter_indices(self, table=None, matched_only=False):
+        mask = numpy.ones(self._size, dtype=bool)
+        if table is not None:
+            mask &= (self.table == table)
+        if matched_only:
+            mask &= (self.n_packets > 0)
+        return numpy.flatnonzero(mask)
+
+    #
+    # Return the index array indices sorted by the column named "by".
+    # The sort is stable, so rows with equal values keep their container order
+    #
+    def sort_indices(self, indices, by='priority', descending=False):
+        values = self._get_column(by)[indices]
+        if descending:
+            # Negating unsigned values would wrap, so use the rank of the values instead
+            values = -numpy.unique(values, return_inverse=True)[1]
+        return indices[numpy.argsort(values, kind='mergesort')]
+
+    #
+    # Return an index array of the n rows with the largest values in the column named "by",
+    # largest first. Only the n selected rows are sorted.
+    #
+    def top_n_indices(self, n, by='n_bytes', indices=None):
+        if indices is None:
+            indices = numpy.arange(self._size)
+        if n < len(indices):
+            values = self._get_column(by)[indices]
+            indices = indices[numpy.argpartition(values, len(indices) - n)[len(indices) - n:]]
+        return self.sort_indices(indices, by, descending=True)
+
+    #
+    # Return a dictionary {table : (num entries, total n_packets, total n_bytes)}
+    #
+    def table_totals(self):
+        (tables, inverse) = numpy.unique(self.table, return_inverse=True)
+        num_entries = numpy.bincount(inverse, minlength=len(tables))
+        n_packets = numpy.zeros(len(tables), dtype='uint64')
+        n_bytes = numpy.zeros(len(tables), dtype='uint64')
+        numpy.add.at(n_packets, inverse, self.n_packets)
+        numpy.add.at(n_bytes, inverse, self.n_bytes)
+        return dict((int(tables[i]), (int(num_entries[i]), int(n_packets[i]), int(n_bytes[i]))) for i in range(len(tables)))
 
 
 class FlowEntryContainer(object):
+    # The max number of table lookup results cached, see lookup_projection()
+    LOOKUP_CACHE_SIZE = 10000
+
     def __init__(self):
         self.flow_entries = []
         self.flow_entries_byTable = {}
         self.flow_entries_byTablePriority = {}
+        self._table_classifiers = {}
+        self._lookup_cache = LruCache(FlowEntryContainer.LOOKUP_CACHE_SIZE)
+        self._columns = None
+        # Sorted views, see _get_sorted_all()
+        self._sorted_all = None
+        self._sorted_byTable = {}
+        self._sorted_tables = []
+        self._sorted_priorities = {}
 
     def __len__(self):
         return len(self.flow_entries)
 
+    #
+    # The sorted views used by the iter_*() functions are built the first time theyre
+    # needed, and then maintained with bisect insertion by add_flow_entry(), so they
+    # arent re-sorted on every call. Dont add entries while iterating a view.
+    #
+    def _get_sorted_all(self):
+        if self._sorted_all is None:
+            self._sorted_all = sorted(self.flow_entries)
+        return self._sorted_all
+
+    def _get_sorted_table(self, table):
+        sorted_table = self._sorted_byTable.get(table)
+        if sorted_table is None:
+            sorted_table = sorted(self.flow_entries_byTable[table])
+            self._sorted_byTable[table] = sorted_table
+        return sorted_table
+
     #
     # Return an iterable to iterate all the flow entries. May not be ordered per table
     # Usage:
@@ -71,7 +237,7 @@ class FlowEntryContainer(object):
     #        print flow_entry
     #
     def iter_all(self):
-        return iter(sorted(self.flow_entries))
+        return iter(self._get_sorted_all())
 
     #
     # Return an iterable to iterate the entries for just one table
@@ -80,20 +246,25 @@ class FlowEntryContainer(object):
     #        print table_entry
     #
     def iter_table_entries(self, table):
-        return iter(sorted(self.flow_entries_byTable[table]))
+        return iter(self._get_sorted_table(table))
 
     #
-    # Return an iterable to iterate the entries for just one table, ordered by priority
+    # Return an iterable to iterate the entries for just one table, ordered by priority,
+    # from lowest to highest, or from highest to lowest if descending is True.
+    # The larger the priority value, the higher the priority.
     # Usage:
     #    for (prio, entry_list) in flow_entry_container.iter_table_priority_entries(table=3):
     #        for entry in entry_list:
     #            print 'Priority %d, Entry %s' % (prio, table_entry)
     #
-    # TODO The larger the priority value, the higher the priority, does this lists them from lowest to highest 
     # TODO it would be nice/cleaner to be able to iterate the priorities with one for loop instead of 2
     #
-    def iter_table_priority_entries(self, table):
-        return sorted(self.flow_entries_byTablePriority[table].iteritems())
+    def iter_table_priority_entries(self, table, descending=False):
+        flows_prio_table = self.flow_entries_byTablePriority[table]
+        priorities = self._sorted_priorities[table]
+        if descending:
+            priorities = reversed(priorities)
+        return [(priority, flows_prio_table[priority]) for priority in priorities]
 
     #
     # Return an iterable to iterate just the tables
@@ -102,35 +273,155 @@ class FlowEntryContainer(object):
     #        print table_num
     #
     def iter_tables(self):
-        return iter(sorted(self.flow_entries_byTable.iterkeys()))
+        return iter(self._sorted_tables)
 
     #
-    # Iterate all entries, ordered by table. Used together with next()
+    # Iterate all entries, ordered by table
     # Usage:
     #    for table_entry in flow_entry_container:
     #        print table_entry
     #
     def __iter__(self):
-        try:
-            self.table_iter = iter(sorted(self.flow_entries_byTable.iterkeys()))
-            self.flow_entry_iter = iter(sorted(self.flow_entries_byTable[self.table_iter.next()]))
-        except StopIteration:
-            pass
-
-        return self
-
-    # Used when iterating on the object, see __iter__() for more info.
-    def next(self):
-        try:
-            return self.flow_entry_iter.next()
-        except StopIteration:
-            self.flow_entry_iter = iter(sorted(self.flow_entries_byTable[self.table_iter.next()]))
-            return self.flow_entry_iter.next()
+        for table in self._sorted_tables:
+            for flow_entry in self._get_sorted_table(table):
+                yield flow_entry
 
     def num_table_entries(self, table):
         return len(self.flow_entries_byTable[table])
 
+    #
+    # Return the FlowClassifier.FlowTableClassifier for a table, used to lookup the
+    # FlowEntry matching a packet. Its built the first time its needed for each table.
+    # Usage:
+    #    flow_entry = flow_entry_container.get_table_classifier(table=3).lookup(input_match_object_list)
+    #
+    def get_table_classifier(self, table):
+        classifier = self._table_classifiers.get(table)
+        if classifier is None:
+            classifier = FlowTableClassifier(self.flow_entries_byTable.get(table, []))
+            self._table_classifiers[table] = classifier
+        return classifier
+
+    #
+    # Return a list of the FlowEntries of a table whose prefix of a prefix field, like
+    # nw_dst, covers the prefix string, ordered by descending priority.
+    # Raises ValueError for an invalid field or prefix, see FlowTableClassifier.get_covering_entries()
+    # Usage:
+    #    for flow_entry in flow_entry_container.get_covering_entries(0, 'nw_dst', '10.1.2.0/24'):
+    #        print flow_entry
+    #
+    def get_covering_entries(self, table, name, prefix):
+        return self.get_table_classifier(table).get_covering_entries(name, prefix)
+
+    #
+    # Return the FlowEntry of a table matched by a packet projection, as returned by
+    # FlowTableClassifier.get_projection(), or None if no FlowEntry matches.
+    # The results are cached in an LRU cache keyed by (table, projection), so the packets
+    # that only differ in fields the table doesnt match on share the cached result.
+    # The cache is shared by all the traces on this container, see FlowTracer, and its
+    # cleared when entries are added or removed.
+    # Usage:
+    #    classifier = flow_entry_container.get_table_classifier(table=3)
+    #    projection = classifier.get_projection(PacketHeader(input_match_object_list).fields)
+    #    flow_entry = flow_entry_container.lookup_projection(3, projection)
+    #
+    def lookup_projection(self, table, projection):
+        flow_entry = self._lookup_cache.get((table, projection), LruCache.MISSING)
+        if flow_entry is LruCache.MISSING:
+            flow_entry = self.get_table_classifier(table).lookup_projection(projection)
+            self._lookup_cache.put((table, projection), flow_entry)
+        return flow_entry
+
+    # Return the LruCache of lookup_projection(), to get its hit and miss counts
+    def get_lookup_cache(self):
+        return self._lookup_cache
+
+    #
+    # Return the FlowEntryColumns for this container, or None if numpy isnt available.
+    # The columns are built the first time theyre needed, and kept up to date as entries are added.
+    # Usage:
+    #    columns = flow_entry_container.get_columns()
+    #    for flow_entry in flow_entry_container.select(columns.filter_indices(table=3, matched_only=True)):
+    #        print flow_entry
+    #
+    def get_columns(self):
+        if self._columns is None and numpy is not None:
+            self._columns = FlowEntryColumns(self.flow_entries)
+        return self._columns
+
+    #
+    # Return a list of the entries at the specified indices, as returned by FlowEntryColumns
+    #
+    def select(self, indices):
+        return [self.flow_entries[i] for i in indices]
+
+    #
+    # Return a list of the entries for one table, as displayed by the CLI and GUI
+    #   by_priority  - ordered by ascending priority, else alphabetically
+    #   matched_only - only the entries that have matched, meaning n_packets > 0
+    # The FlowEntryColumns are used to filter and sort, if numpy is available
+    #
+    def get_table_view(self, table, by_priority=False, matched_only=False):
+        columns = self.get_columns()
+        if columns is not None:
+            indices = columns.filter_indices(table, matched_only)
+            if by_priority:
+                return self.select(columns.sort_indices(indices, 'priority'))
+            return sorted(self.select(indices))
+        return self._get_table_view_entries(table, by_priority, matched_only)
+
+    # get_table_view() without the FlowEntryColumns
+    def _get_table_view_entries(self, table, by_priority, matched_only):
+        if by_priority:
+            entries = [entry for (__, entry_list) in self.iter_table_priority_entries(table) for entry in entry_list]
+        else:
+            entries = list(self.iter_table_entries(table))
+        if matched_only:
+            entries = [entry for entry in entries if entry.n_packets_ > 0]
+        return entries
+
+    #
+    # Return a list of the n entries with the most bytes, largest first
+    #
+    def get_top_entries(self, n):
+        columns = self.get_columns()
+        if columns is not None:
+            return self.select(columns.top_n_indices(n, 'n_bytes'))
+        return heapq.nlargest(n, self.flow_entries, key=lambda entry: entry.n_bytes_)
+
+    #
+    # Return a dictionary {table : (num entries, total n_packets, total n_bytes)}
+    #
+    def get_table_totals(self):
+        columns = self.get_columns()
+        if columns is not None:
+            return columns.table_totals()
+
+        totals = {}
+        for flow_entry in self.flow_entries:
+            (num_entries, n_packets, n_bytes) = totals.get(flow_entry.table_, (0, 0, 0))
+            totals[flow_entry.table_] = (num_entries + 1, n_packets + flow_entry.n_packets_, n_bytes + flow_entry.n_bytes_)
+        return totals
+
     def add_flow_entry(self, flow_entry):
+        # Keep the table classifier up to date, if its already been built,
+        # the cached lookup results may no longer be the highest priority match
+        classifier = self._table_classifiers.get(flow_entry.table_)
+        if classifier is not None:
+            classifier.add_flow_entry(flow_entry)
+            self._lookup_cache.clear()
+
+        # Keep the columns up to date, if theyve already been built
+        if self._columns is not None:
+            self._columns.append(flow_entry)
+
+        # Keep the sorted views up to date, if theyve already been built
+        if self._sorted_all is not None:
+            bisect.insort(self._sorted_all, flow_entry)
+        sorted_table = self._sorted_byTable.get(flow_entry.table_)
+        if sorted_table is not None:
+            bisect.insort(sorted_table, flow_entry)
+
         # Store all the entries together
         self.flow_entries.append(flow_entry)
 
@@ -139,6 +430,7 @@ class FlowEntryContainer(object):
         if not flows_list:
             # the first entry for this table number
             self.flow_entries_byTable[flow_entry.table_] = [flow_entry]
+            bisect.insort(self._sorted_tables, flow_entry.table_)
         else:
             # append the entry to the existing table list
             flows_list.append(flow_entry)
@@ -148,17 +440,142 @@ class FlowEntryContainer(object):
         if not flows_prio_table:
             # the first entry for this table number
             self.flow_entries_byTablePriority[flow_entry.table_] = {flow_entry.priority_ : [flow_entry]}
+            self._sorted_priorities[flow_entry.table_] = [flow_entry.priority_]
         else:
             priority_dict = flows_prio_table.get(flow_entry.priority_)
             if not priority_dict:
                 # the first entry in this table for this priority
                 flows_prio_table[flow_entry.priority_] = [flow_entry]
+                bisect.insort(self._sorted_priorities[flow_entry.table_], flow_entry.priority_)
             else:
                 priority_dict.append(flow_entry)
 
+    #
+    # Remove several FlowEntry objects at once, each list is only filtered once.
+    # The classifiers of the affected tables and the columns are rebuilt the next time theyre needed.
+    #
+    def remove_flow_entries(self, flow_entries):
+        removed_ids = set(id(flow_entry) for flow_entry in flow_entries)
+        if not removed_ids:
+            return
+        tables = set(flow_entry.table_ for flow_entry in flow_entries)
+
+        # The entries are compared by identity, since FlowEntry.__eq__() only compares the match
+        keep = lambda entry_list: [entry for entry in entry_list if id(entry) not in removed_ids]
+
+        self.flow_entries[:] = keep(self.flow_entries)
+        self._lookup_cache.clear()
+        if self._sorted_all is not None:
+            self._sorted_all = keep(self._sorted_all)
+        self._columns = None
+
+        for table in tables:
+            self._table_classifiers.pop(table, None)
+            flows_list = keep(self.flow_entries_byTable[table])
+            if not flows_list:
+                del self.flow_entries_byTable[table]
+                del self.flow_entries_byTablePriority[table]
+                del self._sorted_priorities[table]
+                self._sorted_byTable.pop(table, None)
+                self._sorted_tables.remove(table)
+                continue
+
+            self.flow_entries_byTable[table] = flows_list
+            if table in self._sorted_byTable:
+                self._sorted_byTable[table] = keep(self._sorted_byTable[table])
+
+            flows_prio_table = self.flow_entries_byTablePriority[table]
+            for priority in set(flow_entry.priority_ for flow_entry in flow_entries if flow_entry.table_ == table):
+                priority_list = keep(flows_prio_table[priority])
+                if priority_list:
+                    flows_prio_table[priority] = priority_list
+                else:
+                    del flows_prio_table[priority]
+                    self._sorted_priorities[table].remove(priority)
+
+    #
+    # Call this after changing the counters of FlowEntry objects already stored in the
+    # container, so the columns are rebuilt with the new values the next time theyre needed
+    #
+    def counters_changed(self):
+        self._columns = None
+
     def reset(self):
         del self.flow_entries[:]
         self.flow_entries_byTable.clear()
+        self.flow_entries_byTablePriority.clear()
+        self._table_classifiers.clear()
+        self._lookup_cache.clear()
+        self._columns = None
+        self._sorted_all = None
+        self._sorted_byTable.clear()
+        del self._sorted_tables[:]
+        self._sorted_priorities.clear()
+
+
+#
+# Stores a FlowEntryContainer per dump target, as returned by DumpFlows.dump_flows_targets()
+# The targets are iterated in the order they were added, and for each one the
+# time taken to dump it and the error, if any, are also stored.
+# Usage:
+#    for target in target_container:
+#        if target_container.get_error(target):
+#            print 'Target %s failed: %s' % (target, target_container.get_error(target))
+#        else:
+#            print 'Target %s, %d entries' % (target, len(target_container.get_flow_entries(target)))
+#
+class FlowEntryTargetContainer(object):
+    def __init__(self):
+        self._targets = []
+        self._flow_entries_byTarget = {}
+        self._elapsed_byTarget = {}
+        self._error_byTarget = {}
+
+    def __len__(self):
+        return len(self._targets)
+
+    def __iter__(self):
+        return iter(self._targets)
+
+    def __contains__(self, target):
+        return target in self._flow_entries_byTarget
+
+    def add_target(self, target, flow_entries, elapsed=0.0, error=None):
+        if target not in self._flow_entries_byTarget:
+            self._targets.append(target)
+        self._flow_entries_byTarget[target] = flow_entries
+        self._elapsed_byTarget[target] = elapsed
+        self._error_byTarget[target] = error
+
+    # Return the FlowEntryContainer for the target, which is empty if the dump failed
+    def get_flow_entries(self, target):
+        return self._flow_entries_byTarget[target]
+
+    # Return the number of seconds it took to dump the target
+    def get_elapsed(self, target):
+        return self._elapsed_byTarget[target]
+
+    # Return a string describing why the target dump failed, or None if it succeeded
+    def get_error(self, target):
+        return self._error_byTarget[target]
+
+    # Return the total number of flow entries for all the targets
+    def num_flow_entries(self):
+        return sum(len(flow_entries) for flow_entries in self._flow_entries_byTarget.itervalues())
+
+    #
+    # Iterate (target, flow_entry) for all the targets, in the order they were added
+    #
+    def iter_all(self):
+        for target in self._targets:
+            for flow_entry in self._flow_entries_byTarget[target]:
+                yield (target, flow_entry)
+
+    def reset(self):
+        del self._targets[:]
+        self._flow_entries_byTarget.clear()
+        self._elapsed_byTarget.clear()
+        self._error_byTarget.clear()
 
 
 class FlowEntryFormatter(object):
@@ -4,7 +4,7 @@ Created on Nov 17, 2014
 @author: Brady Johnson
 '''
 
-import inspect
+from FlowDebugger.Flows.FlowEntryFields import FlowEntryFieldsType, copy_fields
 
 #
 # The FlowEntryAction classes are used to parse the "ovs-ofctl dump-flows" action output.
@@ -18,34 +18,37 @@ import inspect
 # To print a particular FlowEntryMatches, the __str__() built-in function has been
 # overridden to print all properties using the property fget function. This way, we
 # dont need __str__() functions in all the derived classes.
+# The properties of each class are listed once, when the class is defined, in the
+# class _field_table attribute, see FlowEntryFields.py
 #
 
 
 #
 # Base class for FlowEntry Actions
+# There is a FlowEntryAction object per action of each FlowEntry, so they use __slots__
+# to keep them small. The action_str is parsed by FlowEntryFactory._parse_action(), and
+# is only stored by FlowEntryActionUnknown, since it cant be rebuilt from the properties.
 #
 class FlowEntryAction(object):
+    __metaclass__ = FlowEntryFieldsType
+    __slots__ = ('_frozen',)
+
     def __init__(self, action_str=''):
-        self.action_str = action_str
-        action_str_list = action_str.split(':', 1)
-        self.action_str_key = action_str_list[0]
-        self.action_str_value = None
-        if len(action_str_list) == 2:
-            self.action_str_value = action_str_list[1]
+        pass
+
+    # The copy isnt frozen, see FlowEntryFields.freeze_fields()
+    def __copy__(self):
+        return copy_fields(self)
 
     def apply_action(self, packet_metadata):
         ''' '''
 
     def __str__(self):
         str_list = []
-        attributes = inspect.getmembers(type(self), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-        #print 'FlowEntryAction len(attrs)=%d' % (attributes)
-        for attr in attributes:
-            if not(attr[0].startswith('__') and attr[0].endswith('__')) and attr[1].fget:
-                value = attr[1].fget(self) 
-                #print 'FlowEntryAction property %s=%s' % (attr[0], value)
-                if value:
-                    str_list.append('%s = %s' % (attr[0], value))
+        for (name, fget) in self._field_table.getters:
+            value = fget(self)
+            if value:
+                str_list.append('%s = %s' % (name, value))
         return ', '.join(str_list) if len(str_list) > 0 else None
 
 #
@@ -53,6 +56,8 @@ class FlowEntryAction(object):
 #   Metadata, goto table, etc
 #
 class FlowEntryActionSwitch(FlowEntryAction):
+    __slots__ = ('_goto_table', '_metadata_value', '_metadata_mask')
+
     def __init__(self, action_str=''):
         super(FlowEntryActionSwitch, self).__init__(action_str)
         self._goto_table     = None
@@ -74,51 +79,55 @@ class FlowEntryActionSwitch(FlowEntryAction):
 #   output, drop, normal, enqueue, flood, all, local, in_port, etc
 #
 class FlowEntryActionSwitchPort(FlowEntryAction):
+    # Only one of these actions is set per object, so _output_type is enough to know which:
+    #   Drop, Port, Controller,
+    #   Normal - Output the packet to the device's normal L2/L3 processing: to the OS
+    #   All    - Output the packet on all switch physical ports, except received port
+    #   Flood  - Output the packet on all switch physical ports, except received port
+    #   InPort - Output the packet to the port it was received on
+    #   Local  - Output the packet to the "local port"
+    __slots__ = ('_output_type', '_output_port', '_controller_id', '_packet_in_size', '_packet_in_reason')
+
     def __init__(self, action_str=''):
         super(FlowEntryActionSwitchPort, self).__init__(action_str)
-        self._drop    = False
-        self._normal  = False  # Output the packet to the device's normal L2/L3 processing: to the OS
-        self._all     = False  # Output the packet on all switch physical ports, except received port
-        self._flood   = False  # Output the packet on all switch physical ports, except received port
-        self._in_port = False  # Output the packet to the port it was received on
-        self._local   = False  # Output the packet to the "local port"
         self._output_port = None  # Port to output the packet to
         self._output_type = 'Unknown'
-        self._packet_in = False
         self._controller_id = 0
         self._packet_in_size = 0
         self._packet_in_reason = 0
 
-    def set_drop(self, empty):         (self._output_type, self._drop)    = ('Drop', True)
-    def set_normal(self, empty):       (self._output_type, self._normal)  = ('Normal', True)
-    def set_all(self, empty):          (self._output_type, self._all)     = ('All', True)
-    def set_flood(self, empty):        (self._output_type, self._flood)   = ('Flood', True)
-    def set_in_port(self, empty):      (self._output_type, self._in_port) = ('InPort', True)
-    def set_local(self, empty):        (self._output_type, self._loacl)   = ('Local', True)
+    def set_drop(self, empty):         self._output_type = 'Drop'
+    def set_normal(self, empty):       self._output_type = 'Normal'
+    def set_all(self, empty):          self._output_type = 'All'
+    def set_flood(self, empty):        self._output_type = 'Flood'
+    def set_in_port(self, empty):      self._output_type = 'InPort'
+    def set_local(self, empty):        self._output_type = 'Local'
     def set_output(self, output_port): (self._output_type, self._output_port) = ('Port', output_port)
     def set_controller(self, controller_str):
         self._output_type = 'Controller'
-        self._packet_in = True
-        # 2 forms for controller_str:
-        #    controller(key=value...)
-        #    controller[:nbytes]  same as controller() or controller(max_len=nbytes)
-        if controller_str.find(':') > 0:
-            self._packet_in_size = int(controller_str[len('controller:'):])
-        elif controller_str.find('(') > 0:
-            kv_pairs = controller_str.strip('controller(').rstrip(')').split(',')
-            for pair in kv_pairs:
-                kv = pair.split('=')
-                if kv[0] == 'max_len':
-                    self._packet_in_size = int(kv[1])
-                elif kv[0] == 'reason':
-                    self._packet_in_reason = int(kv[1])
-                elif kv[0] == 'id':
-                    self._controller_id = int(kv[1])
-                else:
-                    print 'Unknown controller options: %s' % pair
+        # 2 forms for controller_str, as parsed by FlowEntryFactory._create_action():
+        #    controller(key=value...)  the controller_str is "key=value,..."
+        #    controller[:nbytes]       same as controller() or controller(max_len=nbytes)
+        if not controller_str:
+            return
+        if controller_str.find('=') < 0:
+            self._packet_in_size = int(controller_str)
+            return
+        kv_pairs = controller_str.split(',')
+        for pair in kv_pairs:
+            kv = pair.split('=')
+            if kv[0] == 'max_len':
+                self._packet_in_size = int(kv[1])
+            elif kv[0] == 'reason':
+                # Newer versions of OVS output the reason name instead of its number
+                self._packet_in_reason = int(kv[1]) if kv[1].isdigit() else kv[1]
+            elif kv[0] == 'id':
+                self._controller_id = int(kv[1])
+            else:
+                print 'Unknown controller options: %s' % pair
     def get_output(self): return self._output_port
     def get_output_type(self): return self._output_type
-    def get_drop(self): return self._drop
+    def get_drop(self): return self._output_type == 'Drop'
     drop        = property(fset=set_drop, fget=get_drop)
     normal      = property(fset=set_normal)
     all         = property(fset=set_all)
@@ -134,6 +143,8 @@ class FlowEntryActionSwitchPort(FlowEntryAction):
 # Set packet fields Actions
 #
 class FlowEntryActionSetField(FlowEntryAction):
+    __slots__ = ('set_field_key', 'set_field_value')
+
     def __init__(self, action_str=''):
         super(FlowEntryActionSetField, self).__init__(action_str)
         self.set_field_key = ''
@@ -146,39 +157,36 @@ class FlowEntryActionSetField(FlowEntryAction):
     set_field  = property(fget=get_set_field, fset=set_set_field)
 
 # TODO consider converting the FlowEntryActionMod class into FlowEntryActionSetField class (or vice versa)
-#      All you need to do is remove the "mod_" string from the _set_mod_key, and they're the same
+#      All you need to do is remove the "mod_" string from the mod_key, and they're the same
+# Only one mod_* action is set per object, so its stored as mod_key, mod_value
+#   mod_key is the action name, for example "mod_dl_src"
+#
 class FlowEntryActionMod(FlowEntryAction):
+    __slots__ = ('mod_key', 'mod_value')
+
     def __init__(self, action_str=''):
         super(FlowEntryActionMod, self).__init__(action_str)
-        self._set_mod_key = self.action_str_key
-        self._set_mod_value = self.action_str_value
-        self._dl_src = None
-        self._dl_dst = None
-        self._nw_src = None
-        self._nw_dst = None
-        self._nw_tos = None
-        self._tp_src = None
-        self._tp_dst = None
-        self._vlan_vid = None
-        self._vlan_pcp = None
-    def set_mod_dl_src(self, mac):   self._dl_src = mac
-    def set_mod_dl_dst(self, mac):   self._dl_dst = mac
-    def set_mod_nw_src(self, ip):    self._nw_src = ip
-    def set_mod_nw_dst(self, ip):    self._nw_dst = ip
-    def set_mod_tp_src(self, port):  self._tp_src = port
-    def set_mod_tp_dst(self, port):  self._tp_dst = port
-    def set_mod_nw_tos(self, tos):   self._nw_tos = tos
-    def set_mod_vlan_vid(self, vid): self._vlan_vid = vid
-    def set_mod_vlan_pcp(self, pcp): self._vlan_pcp = pcp
-    def get_mod_dl_src(self):   return self._dl_src
-    def get_mod_dl_dst(self):   return self._dl_dst
-    def get_mod_nw_src(self):   return self._nw_src
-    def get_mod_nw_dst(self):   return self._nw_dst
-    def get_mod_tp_src(self):   return self._tp_src
-    def get_mod_tp_dst(self):   return self._tp_dst
-    def get_mod_nw_tos(self):   return self._nw_tos
-    def get_mod_vlan_vid(self): return self._vlan_vid
-    def get_mod_vlan_pcp(self): return self._vlan_pcp
+        self.mod_key = None
+        self.mod_value = None
+    def _get_mod(self, mod_key):     return self.mod_value if self.mod_key == mod_key else None
+    def set_mod_dl_src(self, mac):   (self.mod_key, self.mod_value) = ('mod_dl_src', mac)
+    def set_mod_dl_dst(self, mac):   (self.mod_key, self.mod_value) = ('mod_dl_dst', mac)
+    def set_mod_nw_src(self, ip):    (self.mod_key, self.mod_value) = ('mod_nw_src', ip)
+    def set_mod_nw_dst(self, ip):    (self.mod_key, self.mod_value) = ('mod_nw_dst', ip)
+    def set_mod_tp_src(self, port):  (self.mod_key, self.mod_value) = ('mod_tp_src', port)
+    def set_mod_tp_dst(self, port):  (self.mod_key, self.mod_value) = ('mod_tp_dst', port)
+    def set_mod_nw_tos(self, tos):   (self.mod_key, self.mod_value) = ('mod_nw_tos', tos)
+    def set_mod_vlan_vid(self, vid): (self.mod_key, self.mod_value) = ('mod_vlan_vid', vid)
+    def set_mod_vlan_pcp(self, pcp): (self.mod_key, self.mod_value) = ('mod_vlan_pcp', pcp)
+    def get_mod_dl_src(self):   return self._get_mod('mod_dl_src')
+    def get_mod_dl_dst(self):   return self._get_mod('mod_dl_dst')
+    def get_mod_nw_src(self):   return self._get_mod('mod_nw_src')
+    def get_mod_nw_dst(self):   return self._get_mod('mod_nw_dst')
+    def get_mod_tp_src(self):   return self._get_mod('mod_tp_src')
+    def get_mod_tp_dst(self):   return self._get_mod('mod_tp_dst')
+    def get_mod_nw_tos(self):   return self._get_mod('mod_nw_tos')
+    def get_mod_vlan_vid(self): return self._get_mod('mod_vlan_vid')
+    def get_mod_vlan_pcp(self): return self._get_mod('mod_vlan_pcp')
     mod_dl_src    = property(fget=get_mod_dl_src,   fset=set_mod_dl_src)
     mod_dl_dst    = property(fget=get_mod_dl_dst,   fset=set_mod_dl_dst)
     mod_nw_src    = property(fget=get_mod_nw_src,   fset=set_mod_nw_src)
@@ -195,5 +203,11 @@ class FlowEntryActionMod(FlowEntryAction):
 #  push_vlan, push_mpls
 
 class FlowEntryActionUnknown(FlowEntryAction):
+    __slots__ = ('_action_str',)
+
     def __init__(self, action_str=''):
         super(FlowEntryActionUnknown, self).__init__(action_str)
+        self._action_str = action_str
+
+    def get_action_str(self): return self._action_str
+    action_str = property(fget=get_action_str)
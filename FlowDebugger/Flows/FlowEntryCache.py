@@ -0,0 +1,171 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+#
+# A dictionary with at most max_size entries, used to cache parse results.
+# Its a dict subclass so that a cache hit is just a dict lookup, without calling any
+# Python function. On a miss, __missing__() calls create(key) to create the value,
+# or if create is None, the values are added with put().
+# When its full, its cleared before adding a new entry, which is cheaper than keeping the
+# entries ordered or evicting them one at a time, and good enough for the parse caches
+# since the common tokens are quickly added back.
+# To avoid counting each lookup with a function call, the callers add the number of
+# lookups with add_lookups(), once per batch, and each value added counts as a miss.
+# The caches may be used by several threads, like the DumpFlows worker threads, so the
+# changes and the counters are guarded by a lock, the hits are still plain dict lookups.
+# Usage:
+#    cache = BoundedCache(max_size=1000, create=parse_token)
+#    cache.add_lookups(len(tokens))
+#    values = [cache[token] for token in tokens]
+#    print 'Hit rate %.1f%%' % (cache.hit_rate * 100)
+#
+class BoundedCache(dict):
+    def __init__(self, max_size, create=None):
+        super(BoundedCache, self).__init__()
+        self._max_size = max_size
+        self._create = create
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+
+    # put() is inlined here, since this is called for every miss
+    def __missing__(self, key):
+        value = self._create(key)
+        with self._lock:
+            # Another thread may have created it meanwhile, then its value is shared
+            existing = dict.get(self, key, _MISSING)
+            if existing is not _MISSING:
+                return existing
+            self.misses += 1
+            if len(self) >= self._max_size:
+                if self._max_size < 1:
+                    return value
+                self.clear()
+            self[key] = value
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.misses += 1
+            if len(self) >= self._max_size:
+                if self._max_size < 1:
+                    return
+                self.clear()
+            self[key] = value
+
+    def add_lookups(self, lookups):
+        with self._lock:
+            self.lookups += lookups
+
+    def get_max_size(self):  return self._max_size
+    def get_hits(self):      return max(0, self.lookups - self.misses)
+
+    def get_hit_rate(self):
+        return float(self.hits) / self.lookups if self.lookups else 0.0
+
+    # A max_size of 0 disables the cache
+    def set_max_size(self, max_size):
+        with self._lock:
+            self._max_size = max_size
+            if len(self) > max_size:
+                self.clear()
+
+    max_size = property(fget=get_max_size, fset=set_max_size)
+    hits = property(fget=get_hits)
+    hit_rate = property(fget=get_hit_rate)
+
+    def __str__(self):
+        return 'size=%d/%d, hits=%d, misses=%d, hit rate=%.1f%%' % (len(self), self._max_size, self.hits, self.misses, self.hit_rate * 100)
+
+    def reset(self):
+        with self._lock:
+            self.clear()
+            self.lookups = 0
+            self.misses = 0
+
+
+#
+# A Least Recently Used cache with at most max_size entries, used to cache lookup
+# results, see FlowEntryContainer.lookup_projection(). Unlike BoundedCache, the entries
+# are evicted one at a time, the least recently used first, since the lookup keys
+# are more expensive to recreate than the parse tokens, and each get() counts as a
+# hit or a miss. The values may be None, so get() returns default on a miss.
+# Its guarded by a lock, since the GUI traces on a worker thread.
+# Usage:
+#    cache = LruCache(max_size=1000)
+#    value = cache.get(key, LruCache.MISSING)
+#    if value is LruCache.MISSING:
+#        value = lookup(key)
+#        cache.put(key, value)
+#    print cache
+#
+class LruCache(object):
+    MISSING = object()
+
+    def __init__(self, max_size):
+        self._entries = OrderedDict()
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            # Move the entry to the end, the most recently used
+            value = self._entries.pop(key, LruCache.MISSING)
+            if value is LruCache.MISSING:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self._max_size < 1:
+                return
+            self._entries.pop(key, None)
+            if len(self._entries) >= self._max_size:
+                self._entries.popitem(last=False)
+            self._entries[key] = value
+
+    def get_max_size(self):  return self._max_size
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    # A max_size of 0 disables the cache
+    def set_max_size(self, max_size):
+        with self._lock:
+            self._max_size = max_size
+            while len(self._entries) > max(0, max_size):
+                self._entries.popitem(last=False)
+
+    max_size = property(fget=get_max_size, fset=set_max_size)
+    hit_rate = property(fget=get_hit_rate)
+
+    def __str__(self):
+        return 'size=%d/%d, hits=%d, misses=%d, hit rate=%.1f%%' % (len(self), self._max_size, self.hits, self.misses, self.hit_rate * 100)
+
+    # Remove the entries, but keep the hit and miss counts
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
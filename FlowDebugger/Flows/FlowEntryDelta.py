@@ -0,0 +1,191 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+
+#
+# The key that identifies a flow between consecutive dumps: (table, priority, canonical match)
+# The match strings are sorted, so the key doesnt depend on the order theyre output in
+#
+def flow_entry_key(flow_entry):
+    return (flow_entry.table_, flow_entry.priority_, tuple(sorted(flow_entry.match_str_list_)))
+
+#
+# The differences between 2 consecutive dumps, as returned by FlowEntryDeltaRefresher.refresh()
+#   added         - the new FlowEntry objects
+#   removed       - the FlowEntry objects that are no longer in the dump
+#   modified      - the FlowEntry objects whose actions, cookie or send_flow_rem changed,
+#                   theyre updated in place and their counters may have also changed
+#   counters_only - the FlowEntry objects for which only n_packets or n_bytes changed
+#   num_unchanged - the number of flows for which nothing but the duration changed
+#
+class FlowEntryDelta(object):
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.modified = []
+        self.counters_only = []
+        self.num_unchanged = 0
+
+    def __str__(self):
+        return 'added=%d, removed=%d, modified=%d, counters_only=%d, unchanged=%d' % (
+            len(self.added), len(self.removed), len(self.modified), len(self.counters_only), self.num_unchanged)
+
+    # Returns True if flows were added, removed or modified, meaning the table contents changed
+    def has_flow_changes(self):
+        return bool(self.added or self.removed or self.modified)
+
+#
+# Keeps a FlowEntryContainer up to date with consecutive dumps of the same switch.
+# Only the lines whose flow key isnt known, or whose actions changed are parsed into match
+# and action objects, the counters of the other flows are updated in place. So on a
+# steady-state switch, the cost of a refresh depends on the number of flows that changed,
+# not on the number of flows in the table.
+# If the flags, match and actions text of a line is the same as in the previous refresh,
+# then even the FlowEntryFactory header parsing is skipped, and only the counters and
+# the other header fields, like idle_age, are read.
+# The FlowEntry objects stay the same between refreshes, so theyre still valid keys for
+# the GUI and the trace results.
+# A switch shouldnt output 2 flows with the same key, but if it does, theyre told apart
+# by the order theyre output in, so the results are the same as with DumpFlows.dump_flows()
+# Usage:
+#    refresher = FlowEntryDeltaRefresher()
+#    delta = refresher.refresh(dump_flows_lines)
+#    flow_entries = refresher.flow_entries
+#
+class FlowEntryDeltaRefresher(object):
+    def __init__(self, flow_entries=None):
+        self._flow_entries = flow_entries if flow_entries is not None else FlowEntryContainer()
+        self._flow_entries_byKey = {}   # dictionary {(flow_entry_key(), occurrence) : flow_entry}
+        self._flow_entries_byText = {}  # dictionary {(cookie, table, flow text[, flags]) : ((flow_entry_key(), occurrence), flow_entry, flags)}
+        occurrences = {}
+        for flow_entry in self._flow_entries.flow_entries:
+            base_key = flow_entry_key(flow_entry)
+            occurrences[base_key] = occurrences.get(base_key, -1) + 1
+            self._flow_entries_byKey[(base_key, occurrences[base_key])] = flow_entry
+
+    def get_flow_entries(self):
+        return self._flow_entries
+
+    # The FlowEntries.FlowEntryContainer with the results of the last refresh
+    flow_entries = property(fget=get_flow_entries)
+
+    #
+    # Update the flow entries with the dump-flows output lines, and return a FlowEntryDelta
+    # If the lines have a return_code, as returned by DumpFlows, and its not 0, then the
+    # flow entries arent changed and None is returned.
+    #   progress - an optional DumpFlows.DumpFlowsProgress, its flows_parsed is incremented
+    #              for each flow line
+    #
+    def refresh(self, flow_entry_strs, progress=None):
+        delta = FlowEntryDelta()
+        flow_entries_byKey = {}
+        flow_entries_byText = {}
+        occurrences = {}  # dictionary {flow_entry_key() : number of times its been seen in this dump}
+        counters = []  # list of (flow_entry, new header), the counters are only updated if the dump succeeds
+        unchanged = [] # list of (flow_entry, duration, n_packets, n_bytes, extra_fields) for the unchanged flow text
+
+        for line in flow_entry_strs:
+            line = line.strip()
+            if not FlowEntryFactory.is_flow_line(line):
+                continue
+            if progress is not None:
+                progress.flows_parsed += 1
+
+            # cookie=0x0, duration=10.1s, table=0, n_packets=0, n_bytes=0, [flags ][idle_age=5, ]priority=256,ip,in_port=2 actions=output:1
+            # The flags are output right after n_bytes, followed by the next field or the match
+            fields = line.split(', ')
+            if len(fields) > 6 and ' ' in fields[5]:
+                text = (fields[0], fields[2], fields[-1], fields[5].rpartition(' ')[0])
+            else:
+                text = (fields[0], fields[2], fields[-1])
+            (key, flow_entry, flags) = self._flow_entries_byText.get(text, (None, None, None))
+            if flow_entry is not None and key[1] == occurrences.get(key[0], 0):
+                occurrences[key[0]] = key[1] + 1
+                flow_entries_byKey[key] = flow_entry
+                flow_entries_byText[text] = (key, flow_entry, flags)
+                n_packets = int(fields[3][len(FlowEntryFactory.NPACKETS_STR):])
+                n_bytes = int(fields[4][len(FlowEntryFactory.NBYTES_STR):])
+                extra_fields = FlowEntryFactory.parse_extra_fields(fields[5:-1]) + flags if len(fields) > 6 else flags
+                unchanged.append((flow_entry, fields[1][len(FlowEntryFactory.DURATION_STR):], n_packets, n_bytes, extra_fields))
+                if flow_entry.n_packets_ != n_packets or flow_entry.n_bytes_ != n_bytes:
+                    delta.counters_only.append(flow_entry)
+                else:
+                    delta.num_unchanged += 1
+                continue
+
+            header = FlowEntryFactory.parse_entry_header(line)
+            base_key = flow_entry_key(header)
+            occurrence = occurrences.get(base_key, 0)
+            occurrences[base_key] = occurrence + 1
+            key = (base_key, occurrence)
+
+            # The flags before the match are the extra fields after the ones separated by ", "
+            flags = header.extra_fields_[len(FlowEntryFactory.parse_extra_fields(fields[5:-1])):] if len(fields) > 6 else header.extra_fields_
+
+            flow_entry = self._flow_entries_byKey.get(key)
+            if flow_entry is None:
+                # A new flow
+                FlowEntryFactory.parse_entry_objects(header)
+                delta.added.append(header)
+                flow_entries_byKey[key] = header
+                flow_entries_byText[text] = (key, header, flags)
+                continue
+
+            flow_entries_byKey[key] = flow_entry
+            flow_entries_byText[text] = (key, flow_entry, flags)
+            counters.append((flow_entry, header))
+            if (flow_entry.action_str_list_ != header.action_str_list_ or
+                flow_entry.cookie_ != header.cookie_ or
+                flow_entry.send_flow_rem_ != header.send_flow_rem_):
+                delta.modified.append(flow_entry)
+            elif flow_entry.n_packets_ != header.n_packets_ or flow_entry.n_bytes_ != header.n_bytes_:
+                delta.counters_only.append(flow_entry)
+            else:
+                delta.num_unchanged += 1
+
+        if getattr(flow_entry_strs, 'return_code', 0) != 0:
+            return None
+
+        #
+        # Apply the changes to the existing entries
+        #
+        for (flow_entry, duration, n_packets, n_bytes, extra_fields) in unchanged:
+            flow_entry.duration_  = duration
+            flow_entry.n_packets_ = n_packets
+            flow_entry.n_bytes_   = n_bytes
+            flow_entry.extra_fields_ = extra_fields
+
+        modified_ids = set(id(flow_entry) for flow_entry in delta.modified)
+        for (flow_entry, header) in counters:
+            flow_entry.duration_  = header.duration_
+            flow_entry.n_packets_ = header.n_packets_
+            flow_entry.n_bytes_   = header.n_bytes_
+            flow_entry.extra_fields_ = header.extra_fields_
+            if id(flow_entry) in modified_ids:
+                flow_entry.cookie_ = header.cookie_
+                flow_entry.send_flow_rem_ = header.send_flow_rem_
+                if flow_entry.action_str_list_ != header.action_str_list_:
+                    flow_entry.action_str_list_ = header.action_str_list_
+                    FlowEntryFactory.parse_entry_actions(flow_entry)
+
+        delta.removed = [flow_entry for (key, flow_entry) in self._flow_entries_byKey.iteritems() if key not in flow_entries_byKey]
+        self._flow_entries.remove_flow_entries(delta.removed)
+        for flow_entry in delta.added:
+            self._flow_entries.add_flow_entry(flow_entry)
+        if counters or unchanged:
+            self._flow_entries.counters_changed()
+
+        self._flow_entries_byKey = flow_entries_byKey
+        self._flow_entries_byText = flow_entries_byText
+
+        return delta
+
+    def reset(self):
+        self._flow_entries.reset()
+        self._flow_entries_byKey.clear()
+        self._flow_entries_byText.clear()
@@ -4,9 +4,9 @@ Created on Nov 24, 2014
 @author: Brady Johnson
 '''
 
-import inspect
-
 from FlowDebugger.Flows.FlowEntries import FlowEntry
+from FlowDebugger.Flows.FlowEntryCache import BoundedCache
+from FlowDebugger.Flows.FlowEntryFields import freeze_fields
 from FlowDebugger.Flows.FlowEntryActions import FlowEntryActionSwitch, FlowEntryActionSwitchPort, FlowEntryActionSetField, FlowEntryActionUnknown, FlowEntryActionMod
 from FlowDebugger.Flows.FlowEntryMatches import FlowEntryMatchSwitch, FlowEntryMatchLayer2, FlowEntryMatchLayer3, FlowEntryMatchLayer4, FlowEntryMatchUnknown
 
@@ -22,111 +22,302 @@ class FlowEntryFactory(object):
     TABLE_STR          =  'table='
     NPACKETS_STR       =  'n_packets='
     NBYTES_STR         =  'n_bytes='
-    SEND_FLOW_REM_STR  =  'senf_flow_rem'
+    SEND_FLOW_REM_STR  =  'send_flow_rem'
     ACTIONS_STR        =  'actions='
+    PRIORITY_STR       =  'priority='
+    DEFAULT_PRIORITY   =  FlowEntry.DEFAULT_PRIORITY
+    # The flags that may be output between the header fields and the match, without a value
+    FLAG_STRS          =  frozenset(['send_flow_rem', 'reset_counts', 'no_packet_counts', 'no_byte_counts', 'check_overlap'])
+
+    #
+    # The same match and action strings are repeated thousands of times in a dump, so the
+    # parsed objects are cached and shared between the FlowEntry objects, by string, and
+    # by the whole list of match and action strings of a FlowEntry.
+    # Since theyre shared, the cached match and action objects are frozen, their setters raise
+    # AttributeError, to change a match, modify a copy.copy() of it, or create a new object
+    # with get_match_object(). See FlowEntryFields.freeze_fields()
+    #
+    # The match and action caches are created after the class, since they call its static methods
+    _match_cache  = None  # {match_str : FlowEntryMatch object}
+    _action_cache = None  # {action_str : FlowEntryAction object}
+    _line_cache   = BoundedCache(65536)  # {(match_str_list_, action_str_list_) : (match_str_list_, match_object_list_, action_str_list_, action_object_list_)}
 
-    # TODO _init_flow_match_dict() and _init_flow_action_dict() do exactly the same thing, but with different classes
-    #      either those from FlowEntryMatches.py or FlowEntryActions.py, consider simplifying and removing duplicate code
     # TODO same goes for _parse_match() and _parse_action()
 
+    @staticmethod
+    def _init_setters_dict(setters_dict, class_list):
+        # The Python properties of each of these classes is considered a parseable entry,
+        # they are listed in the class _field_table, see FlowEntryFields.py
+        # The objects are new when theyre set, so the setters arent checked for frozen objects
+        for cls in class_list:
+            for (name, __, fset) in cls._field_table.fields:
+                setters_dict[name] = [cls, getattr(fset, 'unchecked', fset)]
+
     @staticmethod
     def _init_flow_match_dict():
-        # The Python properties of each of these FlowEntryMatch* classes is considered a parseable match entry
-        for flow_entry_match in [FlowEntryMatchSwitch(), FlowEntryMatchLayer2(), FlowEntryMatchLayer3(), FlowEntryMatchLayer4()]:
-            attributes = inspect.getmembers(type(flow_entry_match), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-            for attr in attributes:
-                if not(attr[0].startswith('__') and attr[0].endswith('__')):
-                    FlowEntryFactory._flow_match_setters[attr[0]] = [type(flow_entry_match), attr[1].fset]
+        FlowEntryFactory._init_setters_dict(FlowEntryFactory._flow_match_setters,
+                                            [FlowEntryMatchSwitch, FlowEntryMatchLayer2, FlowEntryMatchLayer3, FlowEntryMatchLayer4])
         FlowEntryFactory._flow_match_initialized = True
 
     @staticmethod
     def _init_flow_action_dict():
-        # The Python properties of each of these FlowEntryAction* classes is considered a parseable action entry
-        for flow_entry_action in [FlowEntryActionSwitch(), FlowEntryActionSwitchPort(), FlowEntryActionSetField(), FlowEntryActionMod()]:
-            attributes = inspect.getmembers(type(flow_entry_action), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-            for attr in attributes:
-                if not(attr[0].startswith('__') and attr[0].endswith('__')):
-                    FlowEntryFactory._flow_action_setters[attr[0]] = [type(flow_entry_action), attr[1].fset]
+        FlowEntryFactory._init_setters_dict(FlowEntryFactory._flow_action_setters,
+                                            [FlowEntryActionSwitch, FlowEntryActionSwitchPort, FlowEntryActionSetField, FlowEntryActionMod])
         FlowEntryFactory._flow_action_initialized = True
 
     @staticmethod
     def _parse_match(match_str):
+        FlowEntryFactory._match_cache.add_lookups(1)
+        return FlowEntryFactory._match_cache[match_str]
+
+    @staticmethod
+    def _create_match(match_str):
         if not FlowEntryFactory._flow_match_initialized:
             FlowEntryFactory._init_flow_match_dict()
-        parser_obj_list = FlowEntryFactory._flow_match_setters.get(match_str.split('=')[0], [FlowEntryMatchUnknown.__class__, None])
+        (match_key, separator, match_value) = match_str.partition('=')
+        parser_obj_list = FlowEntryFactory._flow_match_setters.get(match_key, [FlowEntryMatchUnknown, None])
         obj = parser_obj_list[0](match_str) # instantiate the object
         if parser_obj_list[1]:              # call the property setter, if there is one
-            parser_obj_list[1](obj, obj.match_str_value)
+            parser_obj_list[1](obj, match_value if separator else None)
         else:
             print 'Cant parse: %s' % match_str
 
-        return obj
+        return freeze_fields(obj)
 
     @staticmethod
     def _parse_action(action_str):
+        FlowEntryFactory._action_cache.add_lookups(1)
+        return FlowEntryFactory._action_cache[action_str]
+
+    #
+    # The actions have one of the following formats, the key is case insensitive:
+    #   key, key:value, key(value)
+    # For example: NORMAL, output:1, controller(reason=no_match,max_len=65535), resubmit(,3)
+    #
+    @staticmethod
+    def _create_action(action_str):
         if not FlowEntryFactory._flow_action_initialized:
             FlowEntryFactory._init_flow_action_dict()
-        parser_obj_list = FlowEntryFactory._flow_action_setters.get(action_str.split(':')[0], [FlowEntryActionUnknown.__class__, None])
+        colon_index = action_str.find(':')
+        paren_index = action_str.find('(')
+        if paren_index > 0 and (colon_index < 0 or paren_index < colon_index):
+            (action_key, action_value) = (action_str[:paren_index], action_str[paren_index+1:].rstrip(')'))
+        elif colon_index > 0:
+            (action_key, action_value) = (action_str[:colon_index], action_str[colon_index+1:])
+        else:
+            (action_key, action_value) = (action_str, None)
+        parser_obj_list = FlowEntryFactory._flow_action_setters.get(action_key.lower(), [FlowEntryActionUnknown, None])
         obj = parser_obj_list[0](action_str) # instantiate the object
         if parser_obj_list[1]:               # call the property setter, if there is one
-            parser_obj_list[1](obj, obj.action_str_value)
+            parser_obj_list[1](obj, action_value)
         else:
             print 'Cant parse: %s' % action_str
 
-        return obj
+        return freeze_fields(obj)
 
+    #
+    # Split the actions string on the commas that arent inside parenthesis, for example:
+    #   ct(commit,zone=1,exec(set_field:1->ct_mark)),resubmit(,3),output:1
+    #
     @staticmethod
-    def _parse_item(item_key, item_str):
-        value = item_str
-        if len(item_key) > 0:
-            value = item_str.partition(item_key)[2]
+    def _split_actions(actions_str):
+        if '(' not in actions_str:
+            return actions_str.split(',')
 
-        return value.rstrip(',')
+        action_str_list = []
+        pending = []
+        depth = 0
+        for action_str in actions_str.split(','):
+            pending.append(action_str)
+            depth += action_str.count('(') - action_str.count(')')
+            if depth <= 0:
+                action_str_list.append(','.join(pending))
+                pending = []
+                depth = 0
+        if pending:
+            # Unbalanced parenthesis, keep what there is
+            action_str_list.append(','.join(pending))
 
+        return action_str_list
+
+    #
+    # Return True if a stripped dump-flows output line is a flow entry, False for the reply
+    # headers, like "OFPST_FLOW reply (OF1.3) (xid=0x2):" or "NXST_FLOW reply (xid=0x4):",
+    # and for the empty lines or any other line without actions, like in a saved dump file
+    #
     @staticmethod
-    def parse_entry(line):
+    def is_flow_line(line):
+        return (' ' + FlowEntryFactory.ACTIONS_STR) in line and not line.partition(' ')[0].endswith('_FLOW')
+
+    @staticmethod
+    def parse_entry_header(line):
         '''
-        Expecting one of the following formats:
+        Parse just the header fields and the match and action strings of a dump-flows line,
+        without creating the match and action objects, see parse_entry_objects().
+        Expecting the following format, the header fields may be in any order:
+          <key=value, ...>, [flags ]<[priority=N,]match,...> actions=<action,...>
+        For example:
           cookie=0x0, duration=1573.875s, table=0, n_packets=2, n_bytes=152, send_flow_rem priority=10 actions=goto_table:1
           cookie=0xa, duration=1573.091s, table=1, n_packets=0, n_bytes=0, priority=256,ip,nw_src=172.16.150.134 actions=write_metadata:0x3e/0xfff,goto_table:2
           cookie=0x0, duration=243628.614s, table=0, n_packets=251762, n_bytes=18340623, priority=0 actions=NORMAL
           cookie=0x0, duration=218.554s, table=0, n_packets=0, n_bytes=0, ip,in_port=2 actions=output:1
+          cookie=0x0, duration=5.2s, table=0, n_packets=0, n_bytes=0, idle_timeout=60, idle_age=5, priority=5 actions=resubmit(,3)
+          cookie=0x0, duration=5.2s, table=0, n_packets=0, n_bytes=0, send_flow_rem idle_age=5, priority=5,ip actions=drop
+        The header fields that arent stored in a FlowEntry attribute are stored in extra_fields_
         '''
 
-        str_list = line.split(' ')
+        (header_str, separator, actions_str) = line.partition(' ' + FlowEntryFactory.ACTIONS_STR)
+        if not separator:
+            raise ValueError('Invalid flow entry, no actions: %s' % line)
+
+        # The header fields are separated by ", " and the flags and the match are separated by " "
+        header_list = header_str.split(', ')
+        if header_str.endswith(','):
+            # There is no match
+            header_list[-1] = header_list[-1][:-1]
+            match_str = ''
+        else:
+            (flags_str, __, match_str) = header_list.pop().rpartition(' ')
+            if match_str in FlowEntryFactory.FLAG_STRS:
+                (flags_str, match_str) = ((flags_str + ' ' + match_str).lstrip(), '')
+            if flags_str:
+                header_list.extend(flags_str.split(' '))
+        header_list = FlowEntryFactory._split_header_items(header_list)
 
         flow_entry = FlowEntry()
-        flow_entry.cookie_    =  FlowEntryFactory._parse_item(FlowEntryFactory.COOKIE_STR,        str_list[0])
-        flow_entry.duration_  =  FlowEntryFactory._parse_item(FlowEntryFactory.DURATION_STR,      str_list[1])
-        flow_entry.table_     =  int(FlowEntryFactory._parse_item(FlowEntryFactory.TABLE_STR,     str_list[2]))
-        flow_entry.n_packets_ =  int(FlowEntryFactory._parse_item(FlowEntryFactory.NPACKETS_STR,  str_list[3]))
-        flow_entry.n_bytes_   =  int(FlowEntryFactory._parse_item(FlowEntryFactory.NBYTES_STR,    str_list[4]))
-
-        # Parse the send_flow_rem, if present
-        next_index = 5
-        if len(str_list) == 8:
-            flow_entry.send_flow_rem_ = True
-            next_index = 6
-
-        flow_entry.raw_match_   =  FlowEntryFactory._parse_item('', str_list[next_index])
-        flow_entry.raw_actions_ =  FlowEntryFactory._parse_item(FlowEntryFactory.ACTIONS_STR, str_list[next_index+1])
-
-        flow_entry.action_str_list_ =  flow_entry.raw_actions_.split(',')
-        flow_entry.match_str_list_  =  flow_entry.raw_match_.split(',')
-        if flow_entry.match_str_list_[0].startswith('priority='):
-            flow_entry.priority_  =  int(flow_entry.match_str_list_[0].split('=')[1])
-            flow_entry.match_str_list_.pop(0) # Remove the priority from the match list
+        extra_fields = []
+        if (len(header_list) >= 5 and header_list[0].startswith(FlowEntryFactory.COOKIE_STR) and
+            header_list[4].startswith(FlowEntryFactory.NBYTES_STR)):
+            # The usual field order, the counters are always output first
+            flow_entry.cookie_    =  header_list[0][7:]    # len('cookie=')
+            flow_entry.duration_  =  header_list[1][9:]    # len('duration=')
+            flow_entry.table_     =  int(header_list[2][6:])   # len('table=')
+            flow_entry.n_packets_ =  int(header_list[3][10:])  # len('n_packets=')
+            flow_entry.n_bytes_   =  int(header_list[4][8:])   # len('n_bytes=')
+            header_list = header_list[5:]
+
+        for header_item in header_list:
+            (key, separator, value) = header_item.partition('=')
+            if key == 'cookie':
+                flow_entry.cookie_ = value
+            elif key == 'duration':
+                flow_entry.duration_ = value
+            elif key == 'table':
+                flow_entry.table_ = int(value)
+            elif key == 'n_packets':
+                flow_entry.n_packets_ = int(value)
+            elif key == 'n_bytes':
+                flow_entry.n_bytes_ = int(value)
+            elif key == FlowEntryFactory.SEND_FLOW_REM_STR:
+                flow_entry.send_flow_rem_ = True
+            elif key:
+                extra_fields.append((key, value if separator else None))
+
+        # The priority is usually the first match string
+        flow_entry.priority_ = FlowEntryFactory.DEFAULT_PRIORITY
+        if match_str.startswith(FlowEntryFactory.PRIORITY_STR):
+            (priority_str, __, match_str) = match_str.partition(',')
+            flow_entry.priority_ = int(priority_str[9:])  # len('priority=')
+        match_str_list = match_str.split(',') if match_str else []
+        if FlowEntryFactory.PRIORITY_STR in match_str:
+            for (i, item_str) in enumerate(match_str_list):
+                if item_str.startswith(FlowEntryFactory.PRIORITY_STR):
+                    flow_entry.priority_ = int(item_str[len(FlowEntryFactory.PRIORITY_STR):])
+                    del match_str_list[i] # Remove the priority from the match list
+                    break
+
+        # The FlowEntry stores tuples, see the comments in FlowEntries.py
+        flow_entry.match_str_list_  =  tuple(match_str_list)
+        flow_entry.action_str_list_ =  tuple(FlowEntryFactory._split_actions(actions_str))
+        if extra_fields:
+            flow_entry.extra_fields_ = tuple(extra_fields)
+
+        return flow_entry
+
+    #
+    # The flags arent followed by ", " like the other header fields, but by a space and
+    # the next field, for example: n_bytes=0, send_flow_rem reset_counts idle_age=5, ...
+    # Return the header items with the flags split into their own items.
+    #
+    @staticmethod
+    def _split_header_items(header_items):
+        for header_item in header_items:
+            if ' ' in header_item:
+                break
+        else:
+            return header_items
+        return [item_str for header_item in header_items for item_str in header_item.split(' ') if item_str]
+
+    #
+    # Return the extra_fields_ tuple for a list of "key=value" or "flag" header items,
+    # as parse_entry_header() would, send_flow_rem is stored in send_flow_rem_ instead
+    #
+    @staticmethod
+    def parse_extra_fields(header_items):
+        extra_fields = []
+        for header_item in FlowEntryFactory._split_header_items(header_items):
+            (key, separator, value) = header_item.partition('=')
+            if key != FlowEntryFactory.SEND_FLOW_REM_STR:
+                extra_fields.append((key, value if separator else None))
+        return tuple(extra_fields)
+
+    #
+    # Create the match and action objects of a FlowEntry returned by parse_entry_header()
+    #
+    @staticmethod
+    def parse_entry_objects(flow_entry):
+        line_cache = FlowEntryFactory._line_cache
+        line_key = (flow_entry.match_str_list_, flow_entry.action_str_list_)
+        line_cache.add_lookups(1)
+        cached = line_cache.get(line_key)
+        if cached is not None:
+            # The cached string tuples are also shared, so the new ones can be freed
+            (flow_entry.match_str_list_, flow_entry.match_object_list_, flow_entry.action_str_list_, flow_entry.action_object_list_) = cached
+            return
 
         # Parse each match string into a match object
-        for match_str in flow_entry.match_str_list_:
-            flow_entry.match_object_list_.append(FlowEntryFactory._parse_match(match_str))
+        match_cache = FlowEntryFactory._match_cache
+        match_cache.add_lookups(len(flow_entry.match_str_list_))
+        flow_entry.match_object_list_ = tuple([match_cache[match_str] for match_str in flow_entry.match_str_list_])
 
         # Parse each action string into an action object
-        for action_str in flow_entry.action_str_list_:
-            flow_entry.action_object_list_.append(FlowEntryFactory._parse_action(action_str))
+        FlowEntryFactory.parse_entry_actions(flow_entry)
+
+        line_cache.put(line_key, (flow_entry.match_str_list_, flow_entry.match_object_list_,
+                                  flow_entry.action_str_list_, flow_entry.action_object_list_))
+
+    @staticmethod
+    def parse_entry_actions(flow_entry):
+        action_cache = FlowEntryFactory._action_cache
+        action_cache.add_lookups(len(flow_entry.action_str_list_))
+        flow_entry.action_object_list_ = tuple([action_cache[action_str] for action_str in flow_entry.action_str_list_])
+
+    @staticmethod
+    def parse_entry(line):
+        flow_entry = FlowEntryFactory.parse_entry_header(line)
+        FlowEntryFactory.parse_entry_objects(flow_entry)
 
         return flow_entry
 
+    #
+    # Return a dictionary {cache name : FlowEntryCache.BoundedCache} with the parse caches,
+    # to report their hit rates or change their sizes. A max_size of 0 disables a cache.
+    # Usage:
+    #    for (name, cache) in FlowEntryFactory.get_caches().iteritems():
+    #        print '%s cache: %s' % (name, cache)
+    #
+    @staticmethod
+    def get_caches():
+        return {'match'  : FlowEntryFactory._match_cache,
+                'action' : FlowEntryFactory._action_cache,
+                'line'   : FlowEntryFactory._line_cache}
+
+    @staticmethod
+    def clear_caches():
+        for cache in FlowEntryFactory.get_caches().itervalues():
+            cache.reset()
+
+    # The object returned is new, so it can be modified
     @staticmethod
     def get_match_object(key, value):
         if not FlowEntryFactory._flow_match_initialized:
@@ -142,3 +333,15 @@ class FlowEntryFactory(object):
             parser_obj_list[1](obj, value)
 
         return obj
+
+    #
+    # Return a list of the match objects of a comma separated match string, as in the
+    # dump-flows output, like "in_port=2,tcp,tp_dst=80". The objects are shared with
+    # the parse cache, so theyre frozen.
+    #
+    @staticmethod
+    def parse_match_list(matches_str):
+        return [FlowEntryFactory._parse_match(match_str.strip()) for match_str in matches_str.split(',') if match_str.strip()]
+
+FlowEntryFactory._match_cache  = BoundedCache(10000, FlowEntryFactory._create_match)
+FlowEntryFactory._action_cache = BoundedCache(10000, FlowEntryFactory._create_action)
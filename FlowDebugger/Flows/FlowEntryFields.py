@@ -0,0 +1,237 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import socket
+import struct
+import types
+
+#
+# The FlowEntryMatches and FlowEntryAction classes are parsed, compared and printed via their
+# Python properties, see the comments at the top of FlowEntryMatches.py and FlowEntryActions.py.
+# Instead of looking up the properties with the inspect module every time theyre needed, the
+# FlowEntryFieldsType metaclass builds a FlowEntryFieldTable once, when each class is defined,
+# and stores it in the class _field_table attribute.
+#
+# The parsed objects are cached and shared between the FlowEntries, see FlowEntryFactory.py,
+# so once theyre created, theyre frozen with freeze_fields(): the metaclass wraps the property
+# setters, and the set_* methods used as setters, so they raise AttributeError on a frozen
+# object. copy.copy() of a frozen object returns an object that can be modified.
+#
+
+class FlowEntryFieldTable(object):
+    def __init__(self, cls):
+        # List of (property name, fget, fset) tuples, ordered by property name.
+        # Either fget or fset may be None, depending on how the property was defined
+        self.fields = []
+        for name in sorted(dir(cls)):
+            if name.startswith('__') and name.endswith('__'):
+                continue
+            attr = getattr(cls, name)
+            if isinstance(attr, property):
+                self.fields.append((name, attr.fget, attr.fset))
+
+        # List of (property name, fget) tuples, for the properties that have an fget
+        self.getters = [(name, fget) for (name, fget, __) in self.fields if fget]
+        # Dictionary {property name : fset}, for the properties that have an fset
+        self.setters = dict((name, fset) for (name, __, fset) in self.fields if fset)
+        self.names = frozenset(name for (name, __, __) in self.fields)
+
+
+class FlowEntryFieldsType(type):
+    def __init__(cls, name, bases, namespace):
+        super(FlowEntryFieldsType, cls).__init__(name, bases, namespace)
+        # Only the setters defined by this class, the base class ones are already wrapped
+        checked_setters = {}
+        for (attr_name, attr) in namespace.items():
+            if isinstance(attr, property) and attr.fset is not None:
+                checked_fset = checked_setters.setdefault(attr.fset, _frozen_checked(attr.fset))
+                setattr(cls, attr_name, property(fget=attr.fget, fset=checked_fset, doc=attr.__doc__))
+        for (attr_name, attr) in namespace.items():
+            if isinstance(attr, types.FunctionType) and attr in checked_setters:
+                setattr(cls, attr_name, checked_setters[attr])
+        cls._field_table = FlowEntryFieldTable(cls)
+        # The slots copied by copy.copy(), see copy_fields()
+        cls._copy_slots = tuple(slot for klass in cls.__mro__ for slot in getattr(klass, '__slots__', ()) if slot != '_frozen')
+
+#
+# Internal function to wrap a setter, so it raises AttributeError if the object is frozen.
+# The setter itself is kept in the unchecked attribute, for the FlowEntryFactory to set
+# the fields of the new objects, before theyre frozen.
+#
+def _frozen_checked(fset):
+    def checked_fset(obj, value):
+        if getattr(obj, '_frozen', False):
+            raise AttributeError('Cant modify a frozen %s, its shared by the parse cache, modify a copy.copy() of it' % type(obj).__name__)
+        fset(obj, value)
+    checked_fset.__name__ = fset.__name__
+    checked_fset.unchecked = fset
+    return checked_fset
+
+#
+# Freeze a FlowEntryMatches or FlowEntryAction object, its setters raise AttributeError after this
+#
+def freeze_fields(obj):
+    obj._frozen = True
+    return obj
+
+#
+# Return a copy of a FlowEntryMatches or FlowEntryAction object that isnt frozen,
+# used by their __copy__() method
+#
+def copy_fields(obj):
+    cls = type(obj)
+    copy_obj = cls.__new__(cls)
+    for slot in cls._copy_slots:
+        value = getattr(obj, slot, _UNSET)
+        if value is not _UNSET:
+            setattr(copy_obj, slot, value)
+    return copy_obj
+
+_UNSET = object()
+
+
+#
+# The header field values are normalized when theyre parsed, into a (value, mask) tuple of
+# integers, so they can be matched with bitwise (packet value & mask) == value checks, see
+# FlowClassifier.py, and so the different formats of the same value are equal, for example
+# 1023 and 0x3ff, or 10.0.0.1/24 and 10.0.0.0/255.255.255.0. A value without a mask has
+# the mask of all the field bits.
+# The values that cant be normalized, like port names, are stored as (value string, None),
+# and only match the same string.
+#
+
+_IPV4_STRUCT = struct.Struct('!I')
+
+# The OpenFlow 1.0 reserved port numbers, as printed by ovs-ofctl
+PORT_NUMBERS = {'IN_PORT' : 0xfff8, 'TABLE' : 0xfff9, 'NORMAL' : 0xfffa, 'FLOOD' : 0xfffb, 'ALL' : 0xfffc,
+                'CONTROLLER' : 0xfffd, 'LOCAL' : 0xfffe, 'ANY' : 0xffff, 'NONE' : 0xffff}
+PORT_NAMES = dict((number, name) for (name, number) in PORT_NUMBERS.iteritems() if name != 'ANY')
+
+def _parse_int(value_str):
+    if value_str[:2].lower() == '0x':
+        return int(value_str, 16)
+    return int(value_str)
+
+#
+# Return the (value, mask) of a "value[/mask]" string of integers, decimal or hexadecimal,
+# or None if value_str is None
+#
+def parse_masked_int(value_str, bits):
+    if value_str is None:
+        return None
+    all_bits = (1 << bits) - 1
+    (value, separator, mask) = value_str.partition('/')
+    try:
+        mask = _parse_int(mask) & all_bits if separator else all_bits
+        return (_parse_int(value) & mask, mask)
+    except ValueError:
+        return (value_str, None)
+
+# The masked values are always printed in hexadecimal, as ovs-ofctl does
+def format_masked_int(packed, bits, hex_format=True):
+    if packed is None:
+        return None
+    (value, mask) = packed
+    if mask is None:
+        return value
+    if mask != (1 << bits) - 1:
+        return '0x%x/0x%x' % (value, mask)
+    return '0x%x' % value if hex_format else str(value)
+
+#
+# Return the (value, mask) of a port number or name, or None if value_str is None
+#
+def parse_port(value_str):
+    if value_str is None:
+        return None
+    number = PORT_NUMBERS.get(value_str.upper())
+    if number is not None:
+        return (number, 0xffffffff)
+    return parse_masked_int(value_str, 32)
+
+def format_port(packed):
+    if packed is None:
+        return None
+    (value, mask) = packed
+    if mask is None:
+        return value
+    return PORT_NAMES.get(value, str(value))
+
+#
+# Return the (value, mask) of a "xx:xx:xx:xx:xx:xx[/xx:xx:xx:xx:xx:xx]" MAC address string,
+# or None if value_str is None
+#
+def parse_mac(value_str):
+    if value_str is None:
+        return None
+    (value, separator, mask) = value_str.partition('/')
+    try:
+        mask = int(mask.replace(':', ''), 16) if separator else 0xffffffffffff
+        octets = value.split(':')
+        if len(octets) != 6:
+            raise ValueError(value)
+        return (int(''.join(octets), 16) & mask, mask)
+    except ValueError:
+        return (value_str, None)
+
+def _format_mac(value):
+    return ':'.join('%02x' % ((value >> shift) & 0xff) for shift in (40, 32, 24, 16, 8, 0))
+
+def format_mac(packed):
+    if packed is None:
+        return None
+    (value, mask) = packed
+    if mask is None:
+        return value
+    return _format_mac(value) if mask == 0xffffffffffff else '%s/%s' % (_format_mac(value), _format_mac(mask))
+
+#
+# Return the (value, mask) of an "a.b.c.d[/prefix length | /a.b.c.d]" IPv4 address string,
+# or None if value_str is None
+#
+def _parse_ipv4(value_str):
+    # inet_aton() also accepts the short forms, like 10.1
+    if value_str.count('.') != 3:
+        raise ValueError(value_str)
+    try:
+        return _IPV4_STRUCT.unpack(socket.inet_aton(value_str))[0]
+    except socket.error:
+        raise ValueError(value_str)
+
+def parse_ipv4(value_str):
+    if value_str is None:
+        return None
+    (value, separator, mask) = value_str.partition('/')
+    try:
+        if not separator:
+            mask = 0xffffffff
+        elif '.' in mask:
+            mask = _parse_ipv4(mask)
+        else:
+            prefix_len = int(mask)
+            if prefix_len < 0 or prefix_len > 32:
+                raise ValueError(mask)
+            mask = (0xffffffff << (32 - prefix_len)) & 0xffffffff
+        return (_parse_ipv4(value) & mask, mask)
+    except ValueError:
+        return (value_str, None)
+
+def _format_ipv4(value):
+    return '%d.%d.%d.%d' % ((value >> 24) & 0xff, (value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff)
+
+def format_ipv4(packed):
+    if packed is None:
+        return None
+    (value, mask) = packed
+    if mask is None:
+        return value
+    if mask == 0xffffffff:
+        return _format_ipv4(value)
+    # A prefix mask is printed as its length, as ovs-ofctl does
+    prefix_len = bin(mask).count('1')
+    if mask == (0xffffffff << (32 - prefix_len)) & 0xffffffff:
+        return '%s/%d' % (_format_ipv4(value), prefix_len)
+    return '%s/%s' % (_format_ipv4(value), _format_ipv4(mask))
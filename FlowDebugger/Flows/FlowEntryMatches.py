@@ -4,7 +4,7 @@ Created on Nov 6, 2014
 @author: Brady Johnson
 '''
 
-import inspect
+from FlowDebugger.Flows.FlowEntryFields import FlowEntryFieldsType, copy_fields, parse_masked_int, format_masked_int, parse_port, format_port, parse_mac, format_mac, parse_ipv4, format_ipv4
 
 #
 # The FlowEntryMatches classes are used to parse the "ovs-ofctl dump-flows" match output.
@@ -18,33 +18,40 @@ import inspect
 # To print a particular FlowEntryMatches, the __str__() built-in function has been
 # overridden to print all properties using the property fget function. This way, we
 # dont need __str__() functions in all the derived classes.
+# The properties of each class are listed once, when the class is defined, in the
+# class _field_table attribute, see FlowEntryFields.py
+# The header field values are normalized to (value, mask) integer tuples when theyre set,
+# see FlowEntryFields.parse_masked_int(), and the property getters print them back. The
+# _packed_fields class attribute lists the (field name, slot name) of these values.
 #  
 
 #
 # Base class for FlowEntry Matching
+# There is a FlowEntryMatches object per match field of each FlowEntry, so they use
+# __slots__ to keep them small. The match_str is parsed by FlowEntryFactory._parse_match(),
+# and is only stored by FlowEntryMatchUnknown, since it cant be rebuilt from the properties.
 #
 class FlowEntryMatches(object):
+    __metaclass__ = FlowEntryFieldsType
+    __slots__ = ('_protocol', '_frozen')
+    _packed_fields = ()
+
     def __init__(self, match_str='', protocol='EMPTY'):
-        self.match_str_ = match_str
         self._protocol = protocol
-        match_str_list = match_str.split('=')
-        self.match_str_key = match_str_list[0]
-        self.match_str_value = None
-        if len(match_str_list) == 2:
-            self.match_str_value = match_str_list[1]
-        #print 'FlowEntryMatches: match_str[%s] _protocol[%s]' % (match_str, _protocol)
+
+    # The copy isnt frozen, see FlowEntryFields.freeze_fields()
+    def __copy__(self):
+        return copy_fields(self)
 
     @property
     def protocol(self): return self._protocol
 
     def __str__(self):
         str_list = []
-        attributes = inspect.getmembers(type(self), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-        for attr in attributes:
-            if not(attr[0].startswith('__') and attr[0].endswith('__')) and attr[1].fget:
-                value = attr[1].fget(self)
-                if value:
-                    str_list.append('%s = %s' % (attr[0], value))
+        for (name, fget) in self._field_table.getters:
+            value = fget(self)
+            if value:
+                str_list.append('%s = %s' % (name, value))
         return ', '.join(str_list)
 
     def __eq__(self, match_rhs):
@@ -52,26 +59,38 @@ class FlowEntryMatches(object):
 
     #
     # Compare two FlowEntryMatches objects for equality. They must both be of the same derived 
-    # class type, have the same attributes set, and the attributes values must be equal
+    # class type, have the same fields set, and the normalized values and masks must be equal
     #
     def match(self, match_rhs):
         if type(self) != type(match_rhs):
             #print '\tFlowEntryMatches.match() False: %s != %s' % (type(self), type(match_rhs))
             return False
 
-        #print '\tFlowEntryMatches.match() checking self [%s][%s] match [%s][%s]' % (type(self), self, type(match_rhs), match_rhs)
-        attributes = inspect.getmembers(type(self), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-        for attr in attributes:
-            if not(attr[0].startswith('__') and attr[0].endswith('__')) and attr[1].fget:
-                if not hasattr(match_rhs, attr[0]):
-                    #print '\tFlowEntryMatches.match() False, %s does not have attr %s' % (type(match_rhs), attr[0])
-                    return False
-                if attr[1].fget(self) != attr[1].fget(match_rhs):
-                    #print '\tFlowEntryMatches.match() False, %s values not equal: self [%s][%s] match [%s][%s]' % (attr[0], type(attr[1].fget(self)), attr[1].fget(self), type(attr[1].fget(match_rhs)), attr[1].fget(match_rhs))
-                    return False
-        #print '\tFlowEntryMatches.match() True'
+        for (__, slot) in self._packed_fields:
+            if getattr(self, slot) != getattr(match_rhs, slot):
+                return False
         return True
 
+    #
+    # Return a tuple of (field name, value, mask) for each field that is set, see FlowEntryFields.py
+    # Used by the FlowClassifier.FlowTableClassifier to match packets with bitwise checks
+    #
+    def get_packed_fields(self):
+        packed_fields = []
+        for (name, slot) in self._packed_fields:
+            packed = getattr(self, slot)
+            if packed is not None:
+                packed_fields.append((name, packed[0], packed[1]))
+        return tuple(packed_fields)
+
+    #
+    # Return a hashable key for this FlowEntryMatches object: the derived class type and
+    # the normalized field values. Two objects match() each other only if their keys are equal.
+    # Used by the Flows.PacketHeader to compare packet headers
+    #
+    def match_key(self):
+        return (type(self), self.get_packed_fields())
+
     #
     # Compare if two FlowEntryMatches objects are compareable, meaning they are 
     # both of the same derived class type, they have same attributes, and the
@@ -84,51 +103,40 @@ class FlowEntryMatches(object):
             #print '\tFlowEntryMatches.is_compareable() False: %s != %s' % (type(self), type(match_rhs))
             return False
 
-        #print '\tFlowEntryMatches.is_compareable() checking self [%s][%s] match [%s][%s]' % (type(self), self, type(match_rhs), match_rhs)
-        attributes = inspect.getmembers(type(self), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-        for attr in attributes:
-            if not(attr[0].startswith('__') and attr[0].endswith('__')) and attr[1].fget:
-                # Check that both have the same attributes
-                if not hasattr(match_rhs, attr[0]):
-                    #print '\tFlowEntryMatches.is_compareable() False, %s does not have attr %s' % (type(match_rhs), attr[0])
-                    return False
-                # Check that for each self.attribute that its not None in match_rhs
-                if attr[1].fget(self) and not attr[1].fget(match_rhs):
-                    #print '\tFlowEntryMatches.is_compareable() False, match doesnt have an attr value: [%s][%s]' % (attr[1].fget(self), attr[1].fget(match_rhs))
-                    return False
-        #print 'They are compareable'
+        for (__, slot) in self._packed_fields:
+            # Check that for each self field thats set, its also set in match_rhs
+            if getattr(self, slot) is not None and getattr(match_rhs, slot) is None:
+                return False
         return True
 
     def copy_match(self, match_rhs):
-        attributes = inspect.getmembers(type(self), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
-        for attr in attributes:
-            if not(attr[0].startswith('__') and attr[0].endswith('__')) and attr[1].fget:
-                # Set it, only if match_rhs has the attr, self has the setter, the match_rhs getter isnt None
-                if hasattr(match_rhs, attr[0]) and attr[1].fset and attr[1].fget(match_rhs):
-                    attr[1].fset(self, attr[1].fget(match_rhs))
-                    
+        rhs_names = match_rhs._field_table.names
+        for (name, fget, fset) in self._field_table.fields:
+            # Set it, only if match_rhs has the attr, self has the setter, the match_rhs getter isnt None
+            if fget and fset and name in rhs_names and fget(match_rhs):
+                fset(self, fget(match_rhs))
+
 
 #
 # OpenFlow Switch matching
 # TODO should metadata be included here
 #
 class FlowEntryMatchSwitch(FlowEntryMatches):
+    __slots__ = ('_in_port', '_out_port', '_metadata')
+    _packed_fields = (('in_port', '_in_port'), ('out_port', '_out_port'), ('metadata', '_metadata'))
+
     def __init__(self, match_str=''):
         super(FlowEntryMatchSwitch, self).__init__(match_str, 'OFS')
         self._in_port = None
         self._out_port = None
-        self._metadata_value = None
-        self._metadata_mask = None
-
-    def set_inport(self, inport):   self._in_port  = inport
-    def set_outport(self, outport): self._out_port = outport
-    def set_metadata(self, metadata):
-        metadata_list = metadata.split('/')
-        self._metadata_value = metadata_list[0]
-        self._metadata_mask  = metadata_list[1]
-    def get_inport(self):   return self._in_port
-    def get_outport(self):  return self._out_port
-    def get_metadata(self): return '%s/%s' % (self._metadata_value, self._metadata_mask) if self._metadata_value else None
+        self._metadata = None
+
+    def set_inport(self, inport):   self._in_port  = parse_port(inport)
+    def set_outport(self, outport): self._out_port = parse_port(outport)
+    def set_metadata(self, metadata): self._metadata = parse_masked_int(metadata, 64)
+    def get_inport(self):   return format_port(self._in_port)
+    def get_outport(self):  return format_port(self._out_port)
+    def get_metadata(self): return format_masked_int(self._metadata, 64)
     in_port  = property(fget=get_inport, fset=set_inport)
     out_port = property(fget=get_outport, fset=set_outport)
     metadata = property(fget=get_metadata, fset=set_metadata)
@@ -139,6 +147,9 @@ class FlowEntryMatchSwitch(FlowEntryMatches):
 class FlowEntryMatchLayer2(FlowEntryMatches):
     _ethertypes = {'0x0800' : 'IP', '0x0806' : 'ARP', '0x8035' : 'RARP'}
     _ethertype_names  = {'IP' : '0x0800', 'ARP' : '0x0806', 'RARP' : '0x8035'}
+    __slots__ = ('_dl_src', '_dl_dst', '_protocol_layer3', '_dl_type', '_dl_vlan', '_dl_vlan_pcp')
+    _packed_fields = (('dl_src', '_dl_src'), ('dl_dst', '_dl_dst'), ('dl_type', '_dl_type'),
+                      ('dl_vlan', '_dl_vlan'), ('dl_vlan_pcp', '_dl_vlan_pcp'))
 
     def __init__(self, match_str=''):
         super(FlowEntryMatchLayer2, self).__init__(match_str, 'ETHERNET')
@@ -149,20 +160,23 @@ class FlowEntryMatchLayer2(FlowEntryMatches):
         self._dl_vlan = None     # VLAN tag
         self._dl_vlan_pcp = None # VLAN Priority Code Point
 
-    def set_dl_src(self, dl_src): self._dl_src = dl_src
-    def set_dl_dst(self, dl_dst): self._dl_dst = dl_dst
-    def set_dl_vlan(self, dl_vlan): self._dl_vlan = int(dl_vlan)
-    def set_dl_vlan_pcp(self, dl_vlan_pcp): self._dl_vlan = int(dl_vlan_pcp)
+    def set_dl_src(self, dl_src): self._dl_src = parse_mac(dl_src)
+    def set_dl_dst(self, dl_dst): self._dl_dst = parse_mac(dl_dst)
+    def set_dl_vlan(self, dl_vlan): self._dl_vlan = parse_masked_int(dl_vlan, 12)
+    def set_dl_vlan_pcp(self, dl_vlan_pcp): self._dl_vlan_pcp = parse_masked_int(dl_vlan_pcp, 3)
     # The value for this property setter isnt used 
-    def set_ip(self, empty): (self._protocol_layer3, self._dl_type) = ('IP', '0x0800')
+    def set_ip(self, empty): (self._protocol_layer3, self._dl_type) = ('IP', (0x0800, 0xffff))
     def set_dl_type(self, dl_type):
-        self._protocol_layer3 = self._ethertypes.get(dl_type, dl_type)
-        self._dl_type = self._ethertype_names.get(dl_type, dl_type)
-    def get_dl_src(self): return self._dl_src
-    def get_dl_dst(self): return self._dl_dst
-    def get_dl_vlan(self): return self._dl_vlan
-    def get_dl_vlan_pcp(self): return self._dl_vlan
-    def get_dl_type(self): return self._dl_type
+        self._dl_type = parse_masked_int(self._ethertype_names.get(dl_type, dl_type), 16)
+        self._protocol_layer3 = self._ethertypes.get(self.get_dl_type(), dl_type)
+    def get_dl_src(self): return format_mac(self._dl_src)
+    def get_dl_dst(self): return format_mac(self._dl_dst)
+    def get_dl_vlan(self): return format_masked_int(self._dl_vlan, 12, hex_format=False)
+    def get_dl_vlan_pcp(self): return format_masked_int(self._dl_vlan_pcp, 3, hex_format=False)
+    def get_dl_type(self):
+        if self._dl_type is None or self._dl_type[1] != 0xffff:
+            return format_masked_int(self._dl_type, 16)
+        return '0x%04x' % self._dl_type[0]
     def get_l3_protocol(self): return self._protocol_layer3
     dl_src      = property(fget=get_dl_src, fset=set_dl_src)
     dl_dst      = property(fget=get_dl_dst, fset=set_dl_dst)
@@ -176,6 +190,14 @@ class FlowEntryMatchLayer2(FlowEntryMatches):
 # IP, ICMP, IGMP
 #
 class FlowEntryMatchLayer3(FlowEntryMatches):
+    _layer3_protocols = {'TCP' : 'IP', 'UDP' : 'IP', 'SCTP' : 'IP'}
+    _nw_protos        = {'1' : 'ICMP', '6' : 'TCP', '17' : 'UDP', '132' : 'SCTP'}
+    _nw_proto_names   = {'ICMP' : '1', 'TCP' : '6', 'UDP' : '17', 'SCTP' : '132'}
+    __slots__ = ('_nw_src', '_nw_dst', '_nw_tos', '_protocol_layer4', '_nw_proto')
+    _packed_fields = (('nw_src', '_nw_src'), ('nw_dst', '_nw_dst'), ('nw_tos', '_nw_tos'), ('nw_proto', '_nw_proto'))
+    # The address fields matched on prefixes, see FlowPrefixTrie.py
+    PREFIX_FIELDS = {'nw_src' : 32, 'nw_dst' : 32}
+
     def __init__(self, match_str=''):
         super(FlowEntryMatchLayer3, self).__init__(match_str, 'L3')
         self._nw_src = None
@@ -184,26 +206,23 @@ class FlowEntryMatchLayer3(FlowEntryMatches):
         self._protocol_layer4 = ''
         #self._nw_proto = 0
         self._nw_proto = None
-        self._layer3_protocols = {'TCP' : 'IP', 'UDP' : 'IP', 'SCTP' : 'IP'}
-        self._nw_protos        = {'1' : 'ICMP', '6' : 'TCP', '17' : 'UDP', '132' : 'SCTP'}
-        self._nw_proto_names   = {'ICMP' : '1', 'TCP' : '6', 'UDP' : '17', 'SCTP' : '132'}
         # TODO need to add icmp_type, icmp_code
         # TODO need to add IP ecn, ttl
 
-    def set_tcp(self, empty): (self._nw_proto, self._protocol_layer4, self._protocol) = ('6', 'TCP', 'IP')
-    def set_udp(self, empty): (self._nw_proto, self._protocol_layer4, self._protocol) = ('17', 'UDP', 'IP')
+    def set_tcp(self, empty): (self._nw_proto, self._protocol_layer4, self._protocol) = ((6, 0xff), 'TCP', 'IP')
+    def set_udp(self, empty): (self._nw_proto, self._protocol_layer4, self._protocol) = ((17, 0xff), 'UDP', 'IP')
     def set_nw_proto(self, nw_proto):
-        self._protocol_layer4 = self._nw_protos.get(nw_proto, nw_proto)
-        self._nw_proto = self._nw_proto_names.get(nw_proto, nw_proto)
+        self._nw_proto = parse_masked_int(self._nw_proto_names.get(nw_proto, nw_proto), 8)
+        self._protocol_layer4 = self._nw_protos.get(self.get_nw_proto(), nw_proto)
         self._protocol = self._layer3_protocols.get(self._protocol_layer4, 'L3')
             
-    def set_nw_src(self, nw_src): self._nw_src = nw_src
-    def set_nw_dst(self, nw_dst): self._nw_dst = nw_dst
-    def set_nw_tos(self, tos): self._nw_tos = tos
-    def get_nw_proto(self): return self._nw_proto
-    def get_nw_src(self): return self._nw_src
-    def get_nw_dst(self): return self._nw_dst
-    def get_nw_tos(self): return self._nw_tos
+    def set_nw_src(self, nw_src): self._nw_src = parse_ipv4(nw_src)
+    def set_nw_dst(self, nw_dst): self._nw_dst = parse_ipv4(nw_dst)
+    def set_nw_tos(self, tos): self._nw_tos = parse_masked_int(tos, 8)
+    def get_nw_proto(self): return format_masked_int(self._nw_proto, 8, hex_format=False)
+    def get_nw_src(self): return format_ipv4(self._nw_src)
+    def get_nw_dst(self): return format_ipv4(self._nw_dst)
+    def get_nw_tos(self): return format_masked_int(self._nw_tos, 8, hex_format=False)
     tcp      = property(fset=set_tcp)
     udp      = property(fset=set_udp)
     nw_proto = property(fget=get_nw_proto, fset=set_nw_proto)
@@ -215,21 +234,37 @@ class FlowEntryMatchLayer3(FlowEntryMatches):
 # TCP, UDP
 #
 class FlowEntryMatchLayer4(FlowEntryMatches):
+    __slots__ = ('_tp_dst', '_tp_src')
+    _packed_fields = (('tp_src', '_tp_src'), ('tp_dst', '_tp_dst'))
+
     def __init__(self, match_str=''):
         super(FlowEntryMatchLayer4, self).__init__(match_str, 'L4')
         # Should be either TCP or UDP
         self._tp_dst = None
         self._tp_src = None
 
-    def set_tp_src(self, tp_src): self._tp_src = tp_src
-    def set_tp_dst(self, tp_dst): self._tp_dst = tp_dst
-    def get_tp_src(self): return self._tp_src
-    def get_tp_dst(self): return self._tp_dst
+    def set_tp_src(self, tp_src): self._tp_src = parse_masked_int(tp_src, 16)
+    def set_tp_dst(self, tp_dst): self._tp_dst = parse_masked_int(tp_dst, 16)
+    def get_tp_src(self): return format_masked_int(self._tp_src, 16, hex_format=False)
+    def get_tp_dst(self): return format_masked_int(self._tp_dst, 16, hex_format=False)
     tp_src = property(fget=get_tp_src, fset=set_tp_src)
     tp_dst = property(fget=get_tp_dst, fset=set_tp_dst)
 
 
 class FlowEntryMatchUnknown(FlowEntryMatches):
+    __slots__ = ('_match_str',)
+
     def __init__(self, match_str=''):
         super(FlowEntryMatchUnknown, self).__init__(match_str, 'UNKNOWN')
+        self._match_str = match_str
+
+    def get_match_str(self): return self._match_str
+    match_str = property(fget=get_match_str)
+
+    # The unknown matches arent normalized, the match string is compared instead
+    def match(self, match_rhs):
+        return type(self) == type(match_rhs) and self._match_str == match_rhs._match_str
+
+    def get_packed_fields(self):
+        return (('match_str', self._match_str, None),)
 
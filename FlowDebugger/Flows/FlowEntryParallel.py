@@ -0,0 +1,150 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import cPickle
+import gc
+import multiprocessing
+from FlowDebugger.Flows.FlowEntries import FlowEntry
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+
+#
+# Parses the "ovs-ofctl dump-flows" output lines in a pool of processes, to use more
+# than one core on very large dumps, see DumpFlows.dump_flows() processes argument.
+# The lines are sent to the worker processes in chunks, and each chunk is returned in a
+# compact form, so unpickling it in the main process is much cheaper than parsing it:
+#   (match_table, action_table, entries)
+#     match_table  - list of (match_str, match object) for the unique match strings of the chunk
+#     action_table - list of (action_str, action object) for the unique action strings of the chunk
+#     entries      - list of (cookie, duration, table, n_packets, n_bytes, send_flow_rem, priority,
+#                             extra_fields, match indices, action indices), one per FlowEntry
+# Where the indices are into the tables. Each parsed match and action object is only sent
+# once per chunk, and since they use __slots__, theyre unpickled without calling any Python
+# code, which is several times faster than parsing their strings again.
+# The chunks are returned already pickled, so theyre unpickled by the thread iterating
+# the entries instead of the pool result thread, see iter_flow_entries_parallel().
+# The chunks are returned in order, so the result is the same as parsing the lines serially.
+#
+
+#
+# Internal function to return the index of a match or action string in a chunk table,
+# adding it with its parsed object if its not already there
+#
+def _get_table_index(table_indices, table, item_str, item_obj):
+    index = table_indices.get(item_str)
+    if index is None:
+        index = len(table)
+        table_indices[item_str] = index
+        table.append((item_str, item_obj))
+    return index
+
+#
+# Executed in the worker processes, parse a chunk of lines and return it in the pickled compact form
+#
+def _parse_chunk(lines):
+    match_indices = {}
+    match_table = []
+    action_indices = {}
+    action_table = []
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not FlowEntryFactory.is_flow_line(line):
+            continue
+
+        flow_entry = FlowEntryFactory.parse_entry(line)
+        entries.append((flow_entry.cookie_, flow_entry.duration_, flow_entry.table_,
+                        flow_entry.n_packets_, flow_entry.n_bytes_, flow_entry.send_flow_rem_,
+                        flow_entry.priority_, flow_entry.extra_fields_,
+                        tuple([_get_table_index(match_indices, match_table, match_str, match_obj)
+                               for (match_str, match_obj) in zip(flow_entry.match_str_list_, flow_entry.match_object_list_)]),
+                        tuple([_get_table_index(action_indices, action_table, action_str, action_obj)
+                               for (action_str, action_obj) in zip(flow_entry.action_str_list_, flow_entry.action_object_list_)])))
+
+    return cPickle.dumps((match_table, action_table, entries), cPickle.HIGHEST_PROTOCOL)
+
+#
+# Internal function to return the objects of a chunk table, the objects already in the
+# FlowEntryFactory parse cache are used instead of the unpickled ones, so theyre shared
+#
+def _get_table_objects(table, cache):
+    objects = []
+    cache.add_lookups(len(table))
+    for (item_str, obj) in table:
+        cached_obj = cache.get(item_str)
+        if cached_obj is None:
+            cache.put(item_str, obj)
+            cached_obj = obj
+        objects.append(cached_obj)
+    return objects
+
+#
+# Return the list of FlowEntry objects of a chunk returned by _parse_chunk()
+#
+def _get_chunk_entries(pickled_chunk):
+    (match_table, action_table, entries) = cPickle.loads(pickled_chunk)
+    caches = FlowEntryFactory.get_caches()
+    match_strs = [match_str for (match_str, __) in match_table]
+    match_objs = _get_table_objects(match_table, caches['match'])
+    action_strs = [action_str for (action_str, __) in action_table]
+    action_objs = _get_table_objects(action_table, caches['action'])
+
+    # The entries with the same match and actions share the tuples, as done by FlowEntryFactory
+    shared = {}  # dictionary {(match indices, action indices) : (match_str_list_, match_object_list_, action_str_list_, action_object_list_)}
+    flow_entries = []
+    for (cookie, duration, table, n_packets, n_bytes, send_flow_rem, priority, extra_fields, match_indices, action_indices) in entries:
+        # All the attributes are set below, so FlowEntry.__init__() isnt needed
+        flow_entry = FlowEntry.__new__(FlowEntry)
+        flow_entry.cookie_ = cookie
+        flow_entry.duration_ = duration
+        flow_entry.table_ = table
+        flow_entry.n_packets_ = n_packets
+        flow_entry.n_bytes_ = n_bytes
+        flow_entry.send_flow_rem_ = send_flow_rem
+        flow_entry.priority_ = priority
+        flow_entry.extra_fields_ = extra_fields
+
+        lists = shared.get((match_indices, action_indices))
+        if lists is None:
+            lists = (tuple([match_strs[i] for i in match_indices]), tuple([match_objs[i] for i in match_indices]),
+                     tuple([action_strs[i] for i in action_indices]), tuple([action_objs[i] for i in action_indices]))
+            shared[(match_indices, action_indices)] = lists
+        (flow_entry.match_str_list_, flow_entry.match_object_list_, flow_entry.action_str_list_, flow_entry.action_object_list_) = lists
+        flow_entries.append(flow_entry)
+
+    return flow_entries
+
+#
+# Generator that parses the chunks of dump-flows output lines in a pool of processes,
+# and yields the resulting Flows.FlowEntries.FlowEntry objects, in the order of the lines.
+#   chunks    - an iterable of lists of lines, its iterated in a pool thread
+#   processes - the number of worker processes
+# The garbage collector is disabled while each chunk is unpickled and its entries are
+# created, since the tens of thousands of objects would otherwise trigger lots of full
+# collections, which roughly doubles the time spent in this process, and none of the
+# objects created are cyclic. Its enabled again before the entries are yielded, so the
+# caller runs with the collector as it was, even if it stops the iteration early.
+# Usage:
+#    for flow_entry in FlowEntryParallel.iter_flow_entries_parallel(chunks, processes=4):
+#        flow_entries.add_flow_entry(flow_entry)
+#
+def iter_flow_entries_parallel(chunks, processes):
+    pool = multiprocessing.Pool(processes)
+    try:
+        for pickled_chunk in pool.imap(_parse_chunk, chunks):
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                flow_entries = _get_chunk_entries(pickled_chunk)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            for flow_entry in flow_entries:
+                yield flow_entry
+        pool.close()
+    finally:
+        # If the iteration was stopped early, or a worker failed, dont wait for the other chunks
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,173 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import heapq
+import time
+from collections import deque
+import FlowDebugger.Flows.DumpFlows as DumpFlows
+from FlowDebugger.Flows.FlowEntryDelta import FlowEntryDeltaRefresher
+
+#
+# Keeps the recent counter history of each flow, and the flows with the highest rates.
+#   history_size - the number of samples kept per flow, the oldest are discarded
+#   top_n        - the number of flows kept in the top flows
+#   by           - the rate used to rank the top flows, either 'bytes' or 'packets'
+# Each flow has a ring buffer of (timestamp, n_packets, n_bytes) samples. The rates are
+# calculated from the last 2 samples. As each sample is added, the flow is offered to a
+# min-heap of at most top_n flows, so the top flows are found in O(flows * log(top_n))
+# without sorting all the flows.
+# The flows are keyed by FlowEntry, so the same FlowEntry objects should be used for
+# each sample, as with a FlowEntryDelta.FlowEntryDeltaRefresher, see FlowMonitor.
+# Usage:
+#    rate_monitor = FlowRateMonitor(top_n=10)
+#    rate_monitor.add_sample(flow_entries)
+#    ...
+#    rate_monitor.add_sample(flow_entries)
+#    for (flow_entry, packets_per_sec, bytes_per_sec) in rate_monitor.get_top_flows():
+#        print '%.1f bytes/sec %s' % (bytes_per_sec, flow_entry)
+#
+class FlowRateMonitor(object):
+    BY_VALUES = ['bytes', 'packets']
+
+    def __init__(self, history_size=60, top_n=10, by='bytes'):
+        if by not in FlowRateMonitor.BY_VALUES:
+            raise ValueError('Invalid rate monitor by "%s", expected one of %s' % (by, FlowRateMonitor.BY_VALUES))
+        self._history_size = max(2, history_size)
+        self._top_n = top_n
+        self._by_bytes = (by == 'bytes')
+        self._history = {}      # dictionary {flow_entry : deque([(timestamp, n_packets, n_bytes)])}
+        self._rates = {}        # dictionary {flow_entry : (packets_per_sec, bytes_per_sec)}
+        self._top_flows = []    # list of (flow_entry, packets_per_sec, bytes_per_sec)
+        self._num_samples = 0
+
+    def __len__(self):
+        return len(self._history)
+
+    def get_num_samples(self):  return self._num_samples
+    def get_top_n(self):        return self._top_n
+
+    num_samples = property(fget=get_num_samples)
+    top_n = property(fget=get_top_n)
+
+    #
+    # Add a sample of the counters of all the flow_entries, which may be a FlowEntryContainer
+    # The flows that arent in flow_entries are no longer monitored.
+    #
+    def add_sample(self, flow_entries, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        history = {}
+        rates = {}
+        top_heap = []  # min-heap of (rate, sequence, flow_entry, packets_per_sec, bytes_per_sec)
+        top_n = self._top_n
+        sequence = 0
+
+        for flow_entry in flow_entries:
+            flow_history = self._history.get(flow_entry)
+            if flow_history is None:
+                flow_history = deque(maxlen=self._history_size)
+            history[flow_entry] = flow_history
+
+            packets_per_sec = bytes_per_sec = 0.0
+            if flow_history:
+                (last_timestamp, last_packets, last_bytes) = flow_history[-1]
+                elapsed = timestamp - last_timestamp
+                if flow_entry.n_packets_ < last_packets or flow_entry.n_bytes_ < last_bytes:
+                    # The flow was replaced on the switch and its counters restarted
+                    flow_history.clear()
+                elif elapsed > 0:
+                    packets_per_sec = (flow_entry.n_packets_ - last_packets) / elapsed
+                    bytes_per_sec = (flow_entry.n_bytes_ - last_bytes) / elapsed
+            flow_history.append((timestamp, flow_entry.n_packets_, flow_entry.n_bytes_))
+            rates[flow_entry] = (packets_per_sec, bytes_per_sec)
+
+            # Only the flows with traffic are considered for the top flows
+            rate = bytes_per_sec if self._by_bytes else packets_per_sec
+            if rate <= 0 or top_n < 1:
+                continue
+            sequence += 1
+            if len(top_heap) < top_n:
+                heapq.heappush(top_heap, (rate, sequence, flow_entry, packets_per_sec, bytes_per_sec))
+            elif rate > top_heap[0][0]:
+                heapq.heapreplace(top_heap, (rate, sequence, flow_entry, packets_per_sec, bytes_per_sec))
+
+        self._history = history
+        self._rates = rates
+        # Only the top_n flows are sorted
+        top_heap.sort(reverse=True)
+        self._top_flows = [(flow_entry, packets_per_sec, bytes_per_sec) for (__, __, flow_entry, packets_per_sec, bytes_per_sec) in top_heap]
+        self._num_samples += 1
+
+    #
+    # Return (packets_per_sec, bytes_per_sec) for a flow between the last 2 samples
+    #
+    def get_rate(self, flow_entry):
+        return self._rates.get(flow_entry, (0.0, 0.0))
+
+    #
+    # Return (packets_per_sec, bytes_per_sec) for a flow over all its samples
+    #
+    def get_average_rate(self, flow_entry):
+        flow_history = self._history.get(flow_entry)
+        if not flow_history or len(flow_history) < 2:
+            return (0.0, 0.0)
+        (first_timestamp, first_packets, first_bytes) = flow_history[0]
+        (last_timestamp, last_packets, last_bytes) = flow_history[-1]
+        elapsed = last_timestamp - first_timestamp
+        if elapsed <= 0:
+            return (0.0, 0.0)
+        return ((last_packets - first_packets) / elapsed, (last_bytes - first_bytes) / elapsed)
+
+    # Return a list of the (timestamp, n_packets, n_bytes) samples of a flow, oldest first
+    def get_history(self, flow_entry):
+        return list(self._history.get(flow_entry, ()))
+
+    #
+    # Return a list of (flow_entry, packets_per_sec, bytes_per_sec) for the top_n flows
+    # with the highest rate in the last sample, highest first
+    #
+    def get_top_flows(self):
+        return self._top_flows
+
+    def reset(self):
+        self._history.clear()
+        self._rates.clear()
+        self._top_flows = []
+        self._num_samples = 0
+
+#
+# Polls a switch, using DumpFlows.refresh_flows() so only the flows that changed are
+# parsed, and adds each dump to a FlowRateMonitor.
+# Usage:
+#    flow_monitor = FlowMonitor('OpenFlow13', 'br-int', top_n=10)
+#    while True:
+#        flow_monitor.poll()
+#        print flow_monitor.rate_monitor.get_top_flows()
+#        time.sleep(interval)
+#
+class FlowMonitor(object):
+    def __init__(self, of_version, switch, host='localhost', table='', user='', pw='', history_size=60, top_n=10, by='bytes'):
+        self._dump_args = dict(of_version=of_version, switch=switch, host=host, table=table, user=user, pw=pw)
+        self._refresher = FlowEntryDeltaRefresher()
+        self._rate_monitor = FlowRateMonitor(history_size, top_n, by)
+
+    def get_flow_entries(self):  return self._refresher.flow_entries
+    def get_rate_monitor(self):  return self._rate_monitor
+
+    flow_entries = property(fget=get_flow_entries)
+    rate_monitor = property(fget=get_rate_monitor)
+
+    #
+    # Dump the flows and add them to the rate monitor
+    # Returns the FlowEntryDelta.FlowEntryDelta, or None if the dump failed,
+    # in which case no sample is added
+    #
+    def poll(self):
+        delta = DumpFlows.refresh_flows(self._refresher, **self._dump_args)
+        if delta is not None:
+            self._rate_monitor.add_sample(self._refresher.flow_entries.flow_entries)
+        return delta
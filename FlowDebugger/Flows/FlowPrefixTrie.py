@@ -0,0 +1,152 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+#
+# Multibit longest prefix match trie of the FlowEntries that match on a prefix of one
+# address field, like nw_dst=10.1.2.0/24, used by FlowClassifier.FlowTableClassifier.
+#
+# Each trie node consumes stride bits of the address. The prefixes are stored in the node
+# at depth prefix_len / stride, in a dictionary per prefix length keyed by the masked value,
+# and each node lists the prefix lengths stored in it, so walking the trie for an address only
+# checks the prefix lengths that are actually used under that address. With the default
+# stride of 8, an IPv4 address is matched in at most 5 nodes, whatever the number of
+# prefixes and prefix lengths in the table. The trie also answers which prefixes cover
+# another prefix, see get_covering_entries().
+# Usage:
+#    trie = FlowPrefixTrie(32)
+#    trie.add_prefix(0x0a010200, 0xffffff00, flow_entry)
+#    for (prefix_len, mask, value, flow_entries) in trie.get_matches(0x0a010203):
+#        print prefix_len, flow_entries
+#
+
+class _FlowPrefixTrieNode(object):
+    __slots__ = ('prefix_lists', 'children')
+
+    def __init__(self):
+        # sorted list of [prefix_len, mask, dictionary {masked value : [FlowEntries]}],
+        # one per prefix length stored in the node
+        self.prefix_lists = []
+        self.children = {}      # dictionary {stride bits of the address : _FlowPrefixTrieNode}
+
+
+class FlowPrefixTrie(object):
+
+    # bits is the address size, it must be a multiple of stride
+    def __init__(self, bits=32, stride=8):
+        if bits % stride:
+            raise ValueError('The address bits %d must be a multiple of the stride %d' % (bits, stride))
+        self._bits = bits
+        self._stride = stride
+        self._stride_mask = (1 << stride) - 1
+        # The shift of the address bits of the child node at each depth
+        self._shifts = range(bits - stride, -1, -stride)
+        full_mask = (1 << bits) - 1
+        # The mask of each prefix length, indexed by the prefix length
+        self._masks = [(full_mask << (bits - prefix_len)) & full_mask for prefix_len in xrange(bits + 1)]
+        self._prefix_lens_byMask = dict((mask, prefix_len) for (prefix_len, mask) in enumerate(self._masks))
+        self._root = _FlowPrefixTrieNode()
+        self._num_prefixes = 0
+        self._prefix_lens = set()
+
+    # Return the number of different prefixes in the trie
+    def __len__(self):
+        return self._num_prefixes
+
+    def get_bits(self): return self._bits
+    # Return the sorted list of the prefix lengths in the trie
+    def get_prefix_lens(self): return sorted(self._prefix_lens)
+    bits = property(fget=get_bits)
+    prefix_lens = property(fget=get_prefix_lens)
+
+    # Return the prefix length of a mask, or None if its not a prefix mask, like 255.0.255.0
+    def get_prefix_len(self, mask):
+        return self._prefix_lens_byMask.get(mask)
+
+    #
+    # Add a FlowEntry matching on the prefix value/mask. Return False, and dont add it,
+    # if the mask isnt a prefix mask, those FlowEntries must be looked up another way.
+    #
+    def add_prefix(self, value, mask, flow_entry):
+        prefix_len = self._prefix_lens_byMask.get(mask)
+        if prefix_len is None or not isinstance(value, (int, long)):
+            return False
+
+        node = self._root
+        for shift in self._shifts[:prefix_len / self._stride]:
+            child_bits = (value >> shift) & self._stride_mask
+            child = node.children.get(child_bits)
+            if child is None:
+                child = _FlowPrefixTrieNode()
+                node.children[child_bits] = child
+            node = child
+
+        for prefix_list in node.prefix_lists:
+            if prefix_list[0] == prefix_len:
+                break
+        else:
+            prefix_list = [prefix_len, mask, {}]
+            node.prefix_lists.append(prefix_list)
+            node.prefix_lists.sort()
+        flow_entries = prefix_list[2].get(value & mask)
+        if flow_entries is None:
+            flow_entries = []
+            prefix_list[2][value & mask] = flow_entries
+            self._num_prefixes += 1
+            self._prefix_lens.add(prefix_len)
+        flow_entries.append(flow_entry)
+        return True
+
+    #
+    # Return a list of the prefixes in the trie that contain the address value, or if
+    # prefix_len is specified, that contain the whole value/prefix_len prefix, from the
+    # shortest prefix to the longest. The list items are (prefix_len, mask, masked value,
+    # list of FlowEntries) tuples, the FlowEntry lists must not be modified.
+    #
+    def get_matches(self, value, prefix_len=None):
+        if prefix_len is None:
+            prefix_len = self._bits
+        matches = []
+        node = self._root
+        for shift in self._shifts:
+            for (node_prefix_len, mask, flow_entries_byValue) in node.prefix_lists:
+                if node_prefix_len > prefix_len:
+                    return matches
+                flow_entries = flow_entries_byValue.get(value & mask)
+                if flow_entries is not None:
+                    matches.append((node_prefix_len, mask, value & mask, flow_entries))
+            if self._bits - shift > prefix_len:
+                return matches
+            node = node.children.get((value >> shift) & self._stride_mask)
+            if node is None:
+                return matches
+
+        # The node of the full address prefixes
+        for (node_prefix_len, mask, flow_entries_byValue) in node.prefix_lists:
+            flow_entries = flow_entries_byValue.get(value)
+            if flow_entries is not None:
+                matches.append((node_prefix_len, mask, value, flow_entries))
+        return matches
+
+    #
+    # Return the (prefix_len, mask, masked value, list of FlowEntries) of the longest prefix
+    # in the trie containing the address value, or None if no prefix contains it
+    #
+    def longest_match(self, value):
+        matches = self.get_matches(value)
+        return matches[-1] if matches else None
+
+    #
+    # Return a list of the FlowEntries whose prefix covers the value/prefix_len prefix,
+    # that is all the packets in value/prefix_len are in the FlowEntry prefix, ordered
+    # by descending priority, then from the longest prefix to the shortest.
+    #
+    def get_covering_entries(self, value, prefix_len=None):
+        covering_entries = []
+        for (__, __, __, flow_entries) in reversed(self.get_matches(value, prefix_len)):
+            covering_entries.extend(flow_entries)
+        # The sort is stable, so the longer prefixes stay first for the same priority
+        covering_entries.sort(key=lambda flow_entry: flow_entry.priority_, reverse=True)
+        return covering_entries
@@ -0,0 +1,387 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+from bisect import bisect_left
+from FlowDebugger.Flows.FlowEntryMatches import FlowEntryMatches
+from FlowDebugger.Flows.FlowTracer import FlowTracer
+from FlowDebugger.Flows.HeaderSpace import HeaderSpace, cube_covers, cube_from_fields, cube_from_match_fields, cube_intersection, remove_covered
+
+#
+# Symbolic reachability analysis: the FlowTracer traces one concrete packet through the
+# tables, the FlowReachability propagates a HeaderSpace, a set of packets, see HeaderSpace.py,
+# and returns where each subset of the packets ends up: output to a port, dropped by a
+# FlowEntry, or not matched in a table. This answers questions like "which packets can
+# reach output:5 from in_port=2" or "which packets are dropped in table 3".
+#
+# The actions have the FlowTracer semantics, see FlowTracer._parse_actions(): goto_table,
+# or else the next table, output and drop stop the packet, and the set_field, mod_* and
+# write_metadata actions rewrite header bits to constants. The sets are always kept on the
+# input packets: after a rewrite, the packets are the input packets with the rewritten bits
+# replaced, so a FlowEntry match on the rewritten header is translated back to the input
+# header, which ignores the rewritten bits and needs them to have the written values.
+# So the results are sets of input packets, even if they were modified on the way.
+#
+# In a table, the packets hitting a FlowEntry are the packets it matches, minus those matched
+# by the higher priority FlowEntries. Only the FlowEntries that intersect the packets are
+# compared, they are found with an index per FlowEntry mask, like the FlowClassifier groups,
+# and the lower priority FlowEntries are skipped once a FlowEntry matches all the packets.
+# The higher priority FlowEntries subtracted from each one are also found with the index,
+# so a table of routes, where all the FlowEntries intersect all the packets, isnt quadratic,
+# and so are the subtracted cubes of the packets, when there are many of them.
+# The FlowEntries covered by one higher priority FlowEntry are never hit, so theyre left
+# out of the tables, and the subtracted cubes covered by another one are removed, so the
+# terms dont accumulate every higher priority FlowEntry of each table they go through.
+# The terms are only expanded to check that they have packets when an outcome is reported.
+# The FlowEntry matches have the OVS prerequisites, see HeaderSpace.add_prerequisites().
+# Usage:
+#    reachability = FlowReachability(flow_entries)
+#    space = HeaderSpace.from_fields([('in_port', 2, 0xffffffff)])
+#    print reachability.get_output_space(space, 5)
+#    for result in reachability.analyze(space):
+#        print result
+#
+
+class FlowReachabilityResult(object):
+    __slots__ = ('path', 'table', 'drop', 'miss', 'output', 'header_space')
+
+    def __init__(self, path, table, drop, miss, output, header_space):
+        self.path = path                  # tuple of the FlowEntries matched, in order
+        self.table = table                # the last table
+        self.drop = drop                  # True if the packets are dropped, or not matched
+        self.miss = miss                  # True if the packets arent matched in the last table
+        self.output = output              # None or str where the packets are output, as with FlowTracer.trace()
+        self.header_space = header_space  # HeaderSpace of the input packets
+
+    def __str__(self):
+        if self.miss:
+            outcome = 'No match in table %d' % self.table
+        elif self.drop:
+            outcome = 'Drop in table %d' % self.table
+        else:
+            outcome = 'Output %s in table %d' % (self.output, self.table)
+        return '%s, path %s: %s' % (outcome, ' -> '.join('%d/%d' % (entry.table_, entry.priority_) for entry in self.path) or '-', self.header_space)
+
+#
+# The FlowEntries of one table with their match cubes, in descending priority order,
+# indexed to find the FlowEntries that intersect a cube, also used by FlowShadowing.py
+#
+class FlowCubeTable(object):
+    # flow_entries is an iterable of the FlowEntry objects of one table, by descending priority
+    def __init__(self, flow_entries):
+        self.entries = []        # list of (FlowEntry, cube), by descending priority
+        self.unsupported = []    # list of the FlowEntries that cant be matched on the header bits
+        for flow_entry in flow_entries:
+            fields = []
+            for match_obj in flow_entry.match_object_list_:
+                fields.extend(match_obj.get_packed_fields())
+            try:
+                cube = cube_from_match_fields(fields)
+            except ValueError:
+                self.unsupported.append(flow_entry)
+                continue
+            # Contradictory matches never match, as with the FlowClassifier
+            if cube is not None:
+                self.entries.append((flow_entry, cube))
+        self._index_entries()
+
+    # Internal method to index the entries by mask
+    def _index_entries(self):
+        # dictionary {cube mask : [indices in entries]}
+        self._indices_byMask = {}
+        for (index, (__, cube)) in enumerate(self.entries):
+            self._indices_byMask.setdefault(cube[1], []).append(index)
+        # dictionary {(cube mask, common mask) : dictionary {value & common mask : [indices]}}
+        self._indices_byMaskedValue = {}
+
+    # Return the number of different entry masks, each index lookup probes one dictionary per mask
+    def get_num_masks(self):
+        return len(self._indices_byMask)
+
+    # Return a FlowCubeTable of cubes without FlowEntries, the entries are (None, cube)
+    @staticmethod
+    def from_cubes(cubes):
+        cube_table = FlowCubeTable(())
+        cube_table.entries = [(None, cube) for cube in cubes]
+        cube_table._index_entries()
+        return cube_table
+
+    #
+    # Return a FlowCubeTable without the entries covered by one higher priority entry, like
+    # the ip FlowEntries below an ip catch-all. They never match any packet, and subtracting
+    # them is redundant, since the entry that covers them is subtracted too.
+    #
+    def get_unhidden(self):
+        cube_table = FlowCubeTable(())
+        cube_table.entries = [entry for (index, entry) in enumerate(self.entries) if self.get_first_covering(entry[1]) == index]
+        cube_table.unsupported = self.unsupported
+        cube_table._index_entries()
+        return cube_table
+
+    # Return a FlowCubeTable of the FlowEntries of a table in a Flows.FlowEntries.FlowEntryContainer
+    @staticmethod
+    def from_container(flow_entries, table):
+        table_entries = []
+        if table in flow_entries.iter_tables():
+            for (__, priority_entries) in flow_entries.iter_table_priority_entries(table, descending=True):
+                table_entries.extend(priority_entries)
+        return FlowCubeTable(table_entries)
+
+    #
+    # Return the sorted list of the indices of the entries that intersect the cube, from the
+    # start index up to, but not including, the stop index, if its specified. The entries
+    # with the same mask intersect the cube if their values are equal to the cube value on
+    # the mask bits they have in common, so theyre indexed by their masked value, per common
+    # mask. The indices are sorted in each list, so the bounds are found with bisect.
+    #
+    def get_intersecting(self, cube, start=0, stop=None):
+        (value, mask) = cube
+        if stop is None:
+            stop = len(self.entries)
+        indices = []
+        for (entries_mask, entries_indices) in self._indices_byMask.iteritems():
+            common_mask = entries_mask & mask
+            if common_mask:
+                entries_indices = self._get_indices_byValue(entries_mask, common_mask).get(value & common_mask, ())
+            if entries_indices and (start > entries_indices[0] or stop <= entries_indices[-1]):
+                entries_indices = entries_indices[bisect_left(entries_indices, start):bisect_left(entries_indices, stop)]
+            indices.extend(entries_indices)
+        indices.sort()
+        return indices
+
+    #
+    # Return the index of the first entry, from the start index, that covers the cube, that
+    # is matches all its packets, or None. Only the masks that are a subset of the cube mask
+    # are checked.
+    #
+    def get_first_covering(self, cube, start=0):
+        (value, mask) = cube
+        first_index = None
+        for entries_mask in self._indices_byMask:
+            if entries_mask & ~mask:
+                continue
+            entries_indices = self._get_indices_byValue(entries_mask, entries_mask).get(value & entries_mask)
+            if not entries_indices or entries_indices[-1] < start:
+                continue
+            index = entries_indices[0] if entries_indices[0] >= start else entries_indices[bisect_left(entries_indices, start)]
+            if first_index is None or index < first_index:
+                first_index = index
+        return first_index
+
+    # Internal method to return the dictionary {value & common mask : [indices]} of the entries with a mask
+    def _get_indices_byValue(self, entries_mask, common_mask):
+        indices_byValue = self._indices_byMaskedValue.get((entries_mask, common_mask))
+        if indices_byValue is None:
+            indices_byValue = {}
+            for index in self._indices_byMask[entries_mask]:
+                indices_byValue.setdefault(self.entries[index][1][0] & common_mask, []).append(index)
+            self._indices_byMaskedValue[(entries_mask, common_mask)] = indices_byValue
+        return indices_byValue
+
+# Internal function to return True if one of the subtracted cubes covers the cube
+def _is_covered(cube, subtracted):
+    for sub in subtracted:
+        if cube_covers(sub, cube):
+            return True
+    return False
+
+
+class FlowReachability(FlowTracer):
+    # The maximum number of tables in a path, goto_table can only go to a following table
+    MAX_PATH_LEN = 256
+    # The subtracted cubes of a term are indexed when there are at least this many, see _lookup_space()
+    SUBTRACTED_INDEX_MIN = 64
+    # The packet metadata is 0 until its written, as with FlowTracer
+    INITIAL_REWRITE = cube_from_fields([('metadata', 0, (1 << 64) - 1)])
+
+    # flow_entries is a Flows.FlowEntries.FlowEntryContainer
+    def __init__(self, flow_entries):
+        super(FlowReachability, self).__init__(flow_entries)
+        self._tables = {}                # dictionary {table : FlowCubeTable}
+        self._rewrites_byEntry = {}      # dictionary {FlowEntry : action results, see _get_rewrites()}
+
+    #
+    # Internal method to return the FlowCubeTable of a table, its built the first time its needed,
+    # without the FlowEntries covered by one higher priority FlowEntry, see FlowCubeTable.get_unhidden()
+    #
+    def _get_table(self, table):
+        cube_table = self._tables.get(table)
+        if cube_table is None:
+            cube_table = FlowCubeTable.from_container(self._flow_entries, table).get_unhidden()
+            self._tables[table] = cube_table
+        return cube_table
+
+    #
+    # Return a list of the FlowEntries that were ignored by the analysis since they match on
+    # values that couldnt be normalized, like port names, see FlowEntryFields.py. They're only
+    # listed for the tables that have been analyzed.
+    #
+    def get_unsupported_entries(self):
+        unsupported = []
+        for table in sorted(self._tables):
+            unsupported.extend(self._tables[table].unsupported)
+        return unsupported
+
+    #
+    # Internal method to return the results of the flow_entry actions:
+    # (next_table, drop, output, rewrite cube) where the rewrite cube (value, mask) has
+    # the header bits written by the actions in the mask, and their values
+    #
+    def _get_rewrites(self, flow_entry):
+        rewrites = self._rewrites_byEntry.get(flow_entry)
+        if rewrites is None:
+            (next_table, drop, output, writes) = self._parse_actions(flow_entry)
+            (rewrite_value, rewrite_mask) = (0L, 0L)
+            for write in writes:
+                if isinstance(write, FlowEntryMatches):
+                    fields = write.get_packed_fields()
+                else:
+                    fields = [('metadata', write[0], write[1])]
+                try:
+                    (value, mask) = cube_from_fields(fields)
+                except ValueError:
+                    # The written value couldnt be normalized, its not tracked
+                    continue
+                rewrite_value = (rewrite_value & ~mask) | value
+                rewrite_mask |= mask
+            rewrites = (next_table, drop, output, (rewrite_value, rewrite_mask))
+            self._rewrites_byEntry[flow_entry] = rewrites
+        return rewrites
+
+    #
+    # Propagate the input packets through the tables, starting with table, and return a list
+    # of FlowReachabilityResult, one per path and outcome. The header spaces of the results
+    # are disjoint, and their union is the input HeaderSpace.
+    #
+    def analyze(self, input_space, table=0):
+        results = []
+        # The pending paths: (path, table, rewrite cube, HeaderSpace)
+        pending = [((), table, FlowReachability.INITIAL_REWRITE, input_space)]
+        while pending:
+            (path, table, rewrite, space) = pending.pop()
+            if len(path) >= FlowReachability.MAX_PATH_LEN:
+                self._add_result(results, path, table, True, True, None, space.get_terms())
+                continue
+
+            (hit_terms, miss_terms) = self._lookup_space(table, rewrite, space)
+            self._add_result(results, path, table, True, True, None, miss_terms)
+
+            # In descending priority order, as the results of FlowTracer.trace()
+            for (flow_entry, terms) in hit_terms:
+                (next_table, drop, output, (rewrite_value, rewrite_mask)) = self._get_rewrites(flow_entry)
+                entry_path = path + (flow_entry,)
+                if drop or output:
+                    self._add_result(results, entry_path, table, drop, False, output, terms)
+                else:
+                    next_rewrite = ((rewrite[0] & ~rewrite_mask) | rewrite_value, rewrite[1] | rewrite_mask)
+                    pending.append((entry_path, next_table, next_rewrite, HeaderSpace.from_terms(terms)))
+
+        return results
+
+    #
+    # Internal method to append a FlowReachabilityResult to the results with the terms that
+    # have packets, if there are any. The terms are only expanded to check for packets when
+    # their outcome is reported, not in each table they go through, see _lookup_space().
+    #
+    def _add_result(self, results, path, table, drop, miss, output, terms):
+        space = HeaderSpace.from_terms(terms).compact()
+        if len(space):
+            results.append(FlowReachabilityResult(path, table, drop, miss, output, space))
+
+    #
+    # Internal method to lookup a HeaderSpace in a table. The HeaderSpace is on the input
+    # packets, and the rewrite cube is applied to them before the lookup.
+    # Returns (hit_terms, miss_terms):
+    #   hit_terms  - a list of (FlowEntry, [terms]) for the FlowEntries hit by some packets,
+    #                by descending priority, the terms are those of the packets that hit it
+    #   miss_terms - a list of the terms of the packets that dont match any FlowEntry
+    # The subtracted cubes covered by another one are removed from the terms. A term is only
+    # dropped here if one of its subtracted cubes covers it, like a higher priority catch-all,
+    # so the terms may have no packets, theyre expanded when their outcome is reported.
+    #
+    def _lookup_space(self, table, rewrite, space):
+        cube_table = self._get_table(table)
+        entries = cube_table.entries
+        (rewrite_value, rewrite_mask) = rewrite
+        # The cubes of the FlowEntries on the input packets, see _input_cube()
+        input_cubes = {}
+        terms_byIndex = {}
+        miss_terms = []
+
+        num_masks = cube_table.get_num_masks()
+        for (cube, subtracted) in space.get_terms():
+            # The cube of the packets after the rewrites
+            rewritten_cube = ((cube[0] & ~rewrite_mask) | rewrite_value, cube[1] | rewrite_mask)
+            intersecting = cube_table.get_intersecting(rewritten_cube)
+            # The subtracted cubes are compared with the packets hitting each FlowEntry, the
+            # terms of the packets that went through several tables can have lots of them
+            subtracted_table = None
+            if len(subtracted) >= FlowReachability.SUBTRACTED_INDEX_MIN and len(intersecting) > 1:
+                subtracted_table = FlowCubeTable.from_cubes(subtracted)
+            for (position, index) in enumerate(intersecting):
+                entry_input_cube = self._input_cube(input_cubes, entries, index, rewrite_mask)
+                hit_cube = cube_intersection(cube, entry_input_cube)
+                if subtracted_table is not None:
+                    hit_subtracted = [subtracted[sub_index] for sub_index in subtracted_table.get_intersecting(hit_cube)]
+                else:
+                    hit_subtracted = [sub for sub in subtracted if cube_intersection(hit_cube, sub)]
+                # The packets matched by a higher priority FlowEntry dont hit this one
+                if position > num_masks:
+                    # The higher priority FlowEntries that intersect the hit packets after the
+                    # rewrites, their bits in the rewrite mask are always the written values
+                    higher_indices = cube_table.get_intersecting(cube_intersection(rewritten_cube, entries[index][1]), stop=index)
+                    hit_subtracted.extend(self._input_cube(input_cubes, entries, higher, rewrite_mask) for higher in higher_indices)
+                else:
+                    # Theres fewer of them than there are masks to probe in the index
+                    for higher in intersecting[:position]:
+                        higher_cube = input_cubes[higher]
+                        if cube_intersection(hit_cube, higher_cube):
+                            hit_subtracted.append(higher_cube)
+                hit_subtracted = remove_covered(hit_subtracted)
+                if not _is_covered(hit_cube, hit_subtracted):
+                    terms_byIndex.setdefault(index, []).append((hit_cube, hit_subtracted))
+                if cube_covers(entry_input_cube, cube):
+                    # All the packets of the term are matched, the lower priority FlowEntries cant be hit
+                    break
+            else:
+                miss_subtracted = remove_covered(subtracted + tuple([input_cubes[index] for index in intersecting]))
+                if not _is_covered(cube, miss_subtracted):
+                    miss_terms.append((cube, miss_subtracted))
+
+        hit_terms = [(entries[index][0], terms_byIndex[index]) for index in sorted(terms_byIndex)]
+        return (hit_terms, miss_terms)
+
+    #
+    # Internal method to return the cube of the input packets matched by a FlowEntry after
+    # the rewrites: the rewritten bits are ignored, the callers only use the FlowEntries that
+    # intersect the rewritten packets, so their values are the written ones
+    #
+    def _input_cube(self, input_cubes, entries, index, rewrite_mask):
+        input_cube = input_cubes.get(index)
+        if input_cube is None:
+            (value, mask) = entries[index][1]
+            input_cube = (value & ~rewrite_mask, mask & ~rewrite_mask)
+            input_cubes[index] = input_cube
+        return input_cube
+
+    #
+    # Return the HeaderSpace of the input packets output to a port, or an output type like
+    # "Normal" or "Controller", see FlowEntryActionSwitchPort
+    #
+    def get_output_space(self, input_space, output, table=0):
+        output = str(output)
+        space = HeaderSpace()
+        for result in self.analyze(input_space, table):
+            if result.output in ('Port %s' % output, output):
+                space = space.union(result.header_space)
+        return space
+
+    # Return the HeaderSpace of the input packets dropped, or not matched, in a table
+    def get_dropped_space(self, input_space, dropped_table, table=0):
+        space = HeaderSpace()
+        for result in self.analyze(input_space, table):
+            if result.drop and result.table == dropped_table:
+                space = space.union(result.header_space)
+        return space
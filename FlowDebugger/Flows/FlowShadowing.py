@@ -0,0 +1,182 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+from FlowDebugger.Flows.FlowReachability import FlowCubeTable
+from FlowDebugger.Flows.HeaderSpace import cube_covers, cube_intersection, is_subtracted, sample_packets
+
+#
+# Detection of the FlowEntries that can be removed from a table without changing how any
+# packet is processed, often leaked by the controllers:
+#   shadowed  - all the packets the FlowEntry matches are matched by higher priority
+#               FlowEntries, so it can never be hit
+#   redundant - the FlowEntry can be hit, but all the packets that hit it would hit lower
+#               priority FlowEntries with the same actions if it were removed
+#   undetermined - the FlowEntry intersects too many other FlowEntries to be compared with
+#               them, see MAX_COMPARED_ENTRIES, it may be shadowed or redundant
+#
+# The FlowEntries are compared as HeaderSpace cubes, see HeaderSpace.py, so a FlowEntry
+# is also shadowed when several higher priority FlowEntries cover it together, like
+# tcp,tp_dst=80 below tcp,nw_src=10.0.0.0/1 and tcp,nw_src=128.0.0.0/1. Instead of comparing
+# all the pairs of FlowEntries, the FlowCubeTable index per match mask first finds the
+# highest priority FlowEntry covering each one, with a dictionary probe per mask. Then the
+# index finds the FlowEntries matching a few packets of each one, see HeaderSpace.sample_packets():
+# if no higher priority FlowEntry matches one of them, the FlowEntry is hit, and its not
+# redundant if the first lower priority FlowEntry matching that packet has other actions,
+# or if there is none. Only the other FlowEntries are compared with those that intersect
+# them, and only up to MAX_COMPARED_ENTRIES of them, so the analysis stays about linear in
+# the number of FlowEntries. The FlowEntries with the same priority dont shadow each other,
+# OpenFlow doesnt define which one a packet hits, and only the lower priority FlowEntries
+# make one redundant.
+# Usage:
+#    shadowing = FlowShadowing(flow_entries)
+#    for result in shadowing.analyze_table(0):
+#        print result
+#
+
+class FlowShadowingResult(object):
+    SHADOWED = 'shadowed'
+    REDUNDANT = 'redundant'
+    UNDETERMINED = 'undetermined'
+    __slots__ = ('flow_entry', 'kind', 'covering_entries')
+
+    def __init__(self, flow_entry, kind, covering_entries):
+        self.flow_entry = flow_entry              # the shadowed, redundant or undetermined FlowEntry
+        self.kind = kind                          # SHADOWED, REDUNDANT or UNDETERMINED
+        # list of the FlowEntries that match its packets instead: the higher priority ones
+        # if its shadowed, the lower priority ones with the same actions if its redundant,
+        # else its empty
+        self.covering_entries = covering_entries
+
+    def __str__(self):
+        if self.kind == FlowShadowingResult.UNDETERMINED:
+            return '%s %s, it intersects too many FlowEntries' % (self.kind.capitalize(), self.flow_entry)
+        return '%s %s by %s' % (self.kind.capitalize(), self.flow_entry,
+                                ', '.join('priority=%d' % covering_entry.priority_ for covering_entry in self.covering_entries))
+
+
+class FlowShadowing(object):
+    # The higher priority cubes are indexed when there are at least this many, see _get_redundant_covering()
+    HIGHER_INDEX_MIN = 64
+    # The maximum number of intersecting FlowEntries a FlowEntry is compared with, its undetermined if
+    # there are more of them, comparing the packets of many FlowEntries can expand many cubes
+    MAX_COMPARED_ENTRIES = 256
+
+    # flow_entries is a Flows.FlowEntries.FlowEntryContainer
+    def __init__(self, flow_entries):
+        self._flow_entries = flow_entries
+        self._unsupported = []
+
+    #
+    # Return a list of the FlowEntries that werent analyzed since they match on values that
+    # couldnt be normalized, like port names, see FlowEntryFields.py. They're only listed for
+    # the tables that have been analyzed.
+    #
+    def get_unsupported_entries(self):
+        return self._unsupported
+
+    # Return a dictionary {table : list of FlowShadowingResult} for the tables with results
+    def analyze(self):
+        results_byTable = {}
+        for table in self._flow_entries.iter_tables():
+            results = self.analyze_table(table)
+            if results:
+                results_byTable[table] = results
+        return results_byTable
+
+    # Return a list of FlowShadowingResult for the FlowEntries of a table, by descending priority
+    def analyze_table(self, table):
+        cube_table = FlowCubeTable.from_container(self._flow_entries, table)
+        self._unsupported.extend(cube_table.unsupported)
+        entries = cube_table.entries
+
+        results = []
+        priority_start = 0   # the index of the first entry with the priority of flow_entry
+        priority_stop = 0    # the index of the first entry with a lower priority
+        for (index, (flow_entry, cube)) in enumerate(entries):
+            if index == priority_stop:
+                priority_start = index
+                while priority_stop < len(entries) and entries[priority_stop][0].priority_ == flow_entry.priority_:
+                    priority_stop += 1
+
+            # A single higher priority FlowEntry covering it is the common case, and the cheapest
+            covering_index = cube_table.get_first_covering(cube)
+            if covering_index is not None and covering_index < priority_start:
+                results.append(FlowShadowingResult(flow_entry, FlowShadowingResult.SHADOWED, [entries[covering_index][0]]))
+                continue
+
+            hit_packet = self._get_hit_packet(cube_table, cube, priority_start)
+            if hit_packet is not None:
+                # If it were removed, the packet would hit the first lower priority FlowEntry matching it
+                lower_index = cube_table.get_first_covering(hit_packet, start=priority_stop)
+                if lower_index is None or entries[lower_index][0].action_str_list_ != flow_entry.action_str_list_:
+                    continue
+
+            higher_indices = cube_table.get_intersecting(cube, stop=priority_start)
+            if len(higher_indices) > FlowShadowing.MAX_COMPARED_ENTRIES:
+                results.append(FlowShadowingResult(flow_entry, FlowShadowingResult.UNDETERMINED, []))
+                continue
+            higher_cubes = tuple(entries[other][1] for other in higher_indices)
+            if hit_packet is None and higher_indices and is_subtracted(cube, higher_cubes):
+                results.append(FlowShadowingResult(flow_entry, FlowShadowingResult.SHADOWED, [entries[other][0] for other in higher_indices]))
+                continue
+
+            lower_indices = cube_table.get_intersecting(cube, start=priority_stop)
+            if len(higher_indices) + len(lower_indices) > FlowShadowing.MAX_COMPARED_ENTRIES:
+                results.append(FlowShadowingResult(flow_entry, FlowShadowingResult.UNDETERMINED, []))
+                continue
+            covering_entries = self._get_redundant_covering(entries, flow_entry, cube, higher_cubes, lower_indices)
+            if covering_entries:
+                results.append(FlowShadowingResult(flow_entry, FlowShadowingResult.REDUNDANT, covering_entries))
+
+        return results
+
+    #
+    # Internal method to return the cube of a packet of the cube that no entry before the
+    # stop index matches, so a FlowEntry with that cube is hit, or None if the sample
+    # packets are all matched by them, see HeaderSpace.sample_packets()
+    #
+    def _get_hit_packet(self, cube_table, cube, stop):
+        for packet in sample_packets(cube):
+            covering_index = cube_table.get_first_covering(packet)
+            if covering_index is None or covering_index >= stop:
+                return packet
+        return None
+
+    #
+    # Internal method to return the list of the lower priority FlowEntries that would match
+    # the packets hitting flow_entry if it were removed, when they all have the same actions,
+    # or None if some of the packets would be processed differently, or not matched at all.
+    # The packets hitting flow_entry are those of its cube that arent in the higher_cubes,
+    # which are compared with the packets of each lower priority FlowEntry, so when there
+    # are many of them, theyre indexed by mask, see FlowCubeTable.
+    #
+    def _get_redundant_covering(self, entries, flow_entry, cube, higher_cubes, lower_indices):
+        higher_table = None
+        if len(higher_cubes) >= FlowShadowing.HIGHER_INDEX_MIN and len(lower_indices) > 1:
+            higher_table = FlowCubeTable.from_cubes(higher_cubes)
+        covering_entries = []
+        covering_cubes = []
+        for other in lower_indices:
+            (lower_entry, lower_cube) = entries[other]
+            # The packets hitting flow_entry that lower_entry would match, if they arent
+            # matched by the covering FlowEntries before it
+            lower_hit_cube = cube_intersection(cube, lower_cube)
+            if higher_table is not None:
+                lower_subtracted = [higher_cubes[higher] for higher in higher_table.get_intersecting(lower_hit_cube)]
+            else:
+                lower_subtracted = [sub for sub in higher_cubes if cube_intersection(lower_hit_cube, sub)]
+            lower_subtracted.extend(sub for sub in covering_cubes if cube_intersection(lower_hit_cube, sub))
+            if is_subtracted(lower_hit_cube, lower_subtracted):
+                continue
+            if lower_entry.action_str_list_ != flow_entry.action_str_list_:
+                return None
+            covering_entries.append(lower_entry)
+            if cube_covers(lower_cube, cube):
+                return covering_entries
+            covering_cubes.append(lower_cube)
+            if is_subtracted(cube, higher_cubes + tuple(covering_cubes)):
+                return covering_entries
+        return None
@@ -0,0 +1,330 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import heapq
+import mmap
+import struct
+import sys
+from array import array
+from FlowDebugger.Flows.FlowEntries import FlowEntry, FlowEntryContainer
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+
+#
+# Binary snapshot of a FlowEntries.FlowEntryContainer, to analyze a dump later or on
+# another machine, without running "ovs-ofctl dump-flows" or parsing the text again.
+# The file has the following sections, all the integers are little endian:
+#   header       - see _HEADER
+#   string table - (num_strings + 1) uint32 offsets into the string data, then the string data.
+#                  Each distinct string is stored once, the strings are referenced by index.
+#   items        - uint32 string indices, the match, action and extra field lists of the flows.
+#                  Flows with the same list share the same items.
+#   records      - a fixed width record per flow, see _RECORD, ordered by table
+#   tables       - a record per table, see _TABLE, with the first flow record of the table,
+#                  its number of flows, and its counter totals
+# The match and action objects arent stored, theyre parsed from their strings when a flow
+# is decoded, using the FlowEntryFactory parse caches.
+# Usage:
+#    FlowSnapshot.save(flow_entries, 'incident.fsnap')
+#    ...
+#    flow_entries = FlowSnapshot.load('incident.fsnap')
+#
+_MAGIC = 'FLOWSNAP'
+_VERSION = 1
+# magic, version, num_flows, num_tables, num_strings, num_items, strings offset, items offset, records offset, tables offset
+_HEADER = struct.Struct('<8sIIIIIQQQQ')
+# cookie string, duration string, table, priority, flags, n_packets, n_bytes,
+# match items start and count, action items start and count, extra field items start and count
+_RECORD = struct.Struct('<IIHHBQQIHIHIH')
+# table, first record, num records, total n_packets, total n_bytes
+_TABLE = struct.Struct('<HIIQQ')
+# The n_bytes of a _RECORD, used to find the top entries without decoding the records
+_RECORD_NBYTES = struct.Struct('<%dxQ' % struct.calcsize('<IIHHBQ'))
+# The string index of the extra fields without a value, like send_flow_rem
+_NO_STRING = 0xffffffff
+_FLAG_SEND_FLOW_REM = 0x01
+
+#
+# Internal function to return the little endian bytes of an array
+#
+def _array_bytes(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tostring()
+
+#
+# Internal class that assigns an index to each distinct string, and stores the
+# lists of string indices, used by FlowSnapshot.save()
+#
+class _SnapshotWriter(object):
+    def __init__(self):
+        self._string_indices = {}  # dictionary {string : index}
+        self._strings = []
+        self._list_starts = {}     # dictionary {tuple of strings : start in self.items}
+        self.items = array('I')
+
+    def get_string_index(self, string):
+        if string is None:
+            return _NO_STRING
+        index = self._string_indices.get(string)
+        if index is None:
+            index = len(self._strings)
+            self._string_indices[string] = index
+            self._strings.append(string)
+        return index
+
+    # Return the start of the items of a tuple of strings, and the number of items
+    def get_list_items(self, strings):
+        start = self._list_starts.get(strings)
+        if start is None:
+            start = len(self.items)
+            self._list_starts[strings] = start
+            self.items.extend([self.get_string_index(string) for string in strings])
+        return (start, len(strings))
+
+    # Return the string table bytes and the number of strings
+    def get_string_table(self):
+        offsets = array('I', [0])
+        offset = 0
+        for string in self._strings:
+            offset += len(string)
+            offsets.append(offset)
+        return (_array_bytes(offsets) + ''.join(self._strings), len(self._strings))
+
+#
+# A FlowEntries.FlowEntryContainer loaded from a snapshot file, returned by FlowSnapshot.load()
+# Only the header and the table records are read when its created, the file is memory
+# mapped, and the flows of each table are decoded the first time theyre needed. The
+# methods that need all the flows, like iter_all() and get_columns(), decode all of them.
+# Once its been modified with add_flow_entry() or remove_flow_entries(), its the same as
+# any other FlowEntryContainer. Call close() to unmap the file.
+#
+class FlowSnapshotContainer(FlowEntryContainer):
+    def __init__(self, file_name):
+        self._mmap = None
+        self._all_loaded = False
+        self._loaded_tables = set()
+        self._table_index = {}  # dictionary {table : (first record, num records, total n_packets, total n_bytes)}
+        super(FlowSnapshotContainer, self).__init__()
+
+        with open(file_name, 'rb') as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError('Invalid flow snapshot file "%s", its too short' % file_name)
+        (magic, version, self._num_flows, num_tables, num_strings, __,
+         self._strings_offset, self._items_offset, self._records_offset, tables_offset) = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError('Invalid flow snapshot file "%s", magic [%s] version [%d]' % (file_name, magic, version))
+        self._string_data_offset = self._strings_offset + (num_strings + 1) * 4
+
+        for i in xrange(num_tables):
+            (table, first_record, num_records, n_packets, n_bytes) = _TABLE.unpack_from(self._mmap, tables_offset + i * _TABLE.size)
+            self._table_index[table] = (first_record, num_records, n_packets, n_bytes)
+        self._sorted_tables = sorted(self._table_index)
+
+        self._records = [None] * self._num_flows  # the decoded FlowEntry of each record
+        self._strings = {}  # dictionary {string index : string}, so the decoded strings are shared
+        self._lists = {}    # dictionary {(items start, count) : tuple of strings}
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _get_string(self, index):
+        string = self._strings.get(index)
+        if string is None:
+            if index == _NO_STRING:
+                return None
+            (start, end) = struct.unpack_from('<II', self._mmap, self._strings_offset + index * 4)
+            string = self._mmap[self._string_data_offset + start:self._string_data_offset + end]
+            self._strings[index] = string
+        return string
+
+    def _get_list(self, start, count):
+        strings = self._lists.get((start, count))
+        if strings is None:
+            indices = struct.unpack_from('<%dI' % count, self._mmap, self._items_offset + start * 4)
+            strings = tuple([self._get_string(index) for index in indices])
+            self._lists[(start, count)] = strings
+        return strings
+
+    def _get_record(self, record):
+        flow_entry = self._records[record]
+        if flow_entry is not None:
+            return flow_entry
+
+        (cookie, duration, table, priority, flags, n_packets, n_bytes, match_start, match_count,
+         action_start, action_count, extra_start, extra_count) = _RECORD.unpack_from(self._mmap, self._records_offset + record * _RECORD.size)
+        flow_entry = FlowEntry()
+        flow_entry.cookie_ = self._get_string(cookie)
+        flow_entry.duration_ = self._get_string(duration)
+        flow_entry.table_ = table
+        flow_entry.priority_ = priority
+        flow_entry.send_flow_rem_ = bool(flags & _FLAG_SEND_FLOW_REM)
+        flow_entry.n_packets_ = n_packets
+        flow_entry.n_bytes_ = n_bytes
+        flow_entry.match_str_list_ = self._get_list(match_start, match_count)
+        flow_entry.action_str_list_ = self._get_list(action_start, action_count)
+        if extra_count:
+            extra_items = self._get_list(extra_start, extra_count)
+            flow_entry.extra_fields_ = tuple(zip(extra_items[0::2], extra_items[1::2]))
+        FlowEntryFactory.parse_entry_objects(flow_entry)
+
+        self._records[record] = flow_entry
+        return flow_entry
+
+    #
+    # Decode the flows of a table, and store them as FlowEntryContainer.add_flow_entry() does
+    #
+    def _load_table(self, table):
+        if table in self._loaded_tables or table not in self._table_index:
+            return
+
+        (first_record, num_records, __, __) = self._table_index[table]
+        flows_list = [self._get_record(record) for record in xrange(first_record, first_record + num_records)]
+        self.flow_entries_byTable[table] = flows_list
+        flows_prio_table = {}
+        for flow_entry in flows_list:
+            flows_prio_table.setdefault(flow_entry.priority_, []).append(flow_entry)
+        self.flow_entries_byTablePriority[table] = flows_prio_table
+        self._sorted_priorities[table] = sorted(flows_prio_table)
+        # Only once its populated, so a failed decode is retried, and the table is never seen half loaded
+        self._loaded_tables.add(table)
+
+    def _load_all(self):
+        if self._all_loaded:
+            return
+        for table in self._table_index:
+            self._load_table(table)
+        self._flow_entries_list = [self._get_record(record) for record in xrange(self._num_flows)]
+        self._all_loaded = True
+
+    def get_flow_entries(self):
+        self._load_all()
+        return self._flow_entries_list
+
+    def set_flow_entries(self, flow_entries):
+        self._flow_entries_list = flow_entries
+
+    # All the FlowEntry objects, decoding them all the first time
+    flow_entries = property(fget=get_flow_entries, fset=set_flow_entries)
+
+    def __len__(self):
+        if not self._all_loaded:
+            return self._num_flows
+        return super(FlowSnapshotContainer, self).__len__()
+
+    def _get_sorted_table(self, table):
+        self._load_table(table)
+        return super(FlowSnapshotContainer, self)._get_sorted_table(table)
+
+    def iter_table_priority_entries(self, table, descending=False):
+        self._load_table(table)
+        return super(FlowSnapshotContainer, self).iter_table_priority_entries(table, descending)
+
+    def num_table_entries(self, table):
+        if table not in self._loaded_tables:
+            return self._table_index[table][1]
+        return super(FlowSnapshotContainer, self).num_table_entries(table)
+
+    def get_table_classifier(self, table):
+        self._load_table(table)
+        return super(FlowSnapshotContainer, self).get_table_classifier(table)
+
+    # Only the table is decoded, unless the FlowEntryColumns have already been built
+    def get_table_view(self, table, by_priority=False, matched_only=False):
+        if not self._all_loaded:
+            return self._get_table_view_entries(table, by_priority, matched_only)
+        return super(FlowSnapshotContainer, self).get_table_view(table, by_priority, matched_only)
+
+    # Only the n entries are decoded, the others are compared by their n_bytes record field
+    def get_top_entries(self, n):
+        if not self._all_loaded:
+            top_records = heapq.nlargest(n, xrange(self._num_flows),
+                                         key=lambda record: _RECORD_NBYTES.unpack_from(self._mmap, self._records_offset + record * _RECORD.size)[0])
+            return [self._get_record(record) for record in top_records]
+        return super(FlowSnapshotContainer, self).get_top_entries(n)
+
+    # The totals are stored in the table records
+    def get_table_totals(self):
+        if not self._all_loaded:
+            return dict((table, (num_records, n_packets, n_bytes)) for (table, (__, num_records, n_packets, n_bytes)) in self._table_index.iteritems())
+        return super(FlowSnapshotContainer, self).get_table_totals()
+
+    def add_flow_entry(self, flow_entry):
+        self._load_all()
+        super(FlowSnapshotContainer, self).add_flow_entry(flow_entry)
+
+    def remove_flow_entries(self, flow_entries):
+        self._load_all()
+        super(FlowSnapshotContainer, self).remove_flow_entries(flow_entries)
+
+    def reset(self):
+        self._all_loaded = True
+        self._flow_entries_list = []
+        self._table_index.clear()
+        super(FlowSnapshotContainer, self).reset()
+
+class FlowSnapshot(object):
+
+    #
+    # Save the FlowEntry objects of a FlowEntries.FlowEntryContainer to a snapshot file
+    #
+    @staticmethod
+    def save(flow_entries, file_name):
+        writer = _SnapshotWriter()
+
+        # The records are grouped by table, in the container order within each table
+        table_lists = {}
+        for flow_entry in flow_entries.flow_entries:
+            table_lists.setdefault(flow_entry.table_, []).append(flow_entry)
+
+        records = []
+        tables = []
+        for table in sorted(table_lists):
+            flows_list = table_lists[table]
+            tables.append(_TABLE.pack(table, len(records), len(flows_list),
+                                      sum(flow_entry.n_packets_ for flow_entry in flows_list),
+                                      sum(flow_entry.n_bytes_ for flow_entry in flows_list)))
+            for flow_entry in flows_list:
+                extra_items = tuple(item for extra_field in flow_entry.extra_fields_ for item in extra_field)
+                records.append(_RECORD.pack(writer.get_string_index(flow_entry.cookie_),
+                                            writer.get_string_index(flow_entry.duration_),
+                                            flow_entry.table_,
+                                            flow_entry.priority_,
+                                            _FLAG_SEND_FLOW_REM if flow_entry.send_flow_rem_ else 0,
+                                            flow_entry.n_packets_,
+                                            flow_entry.n_bytes_,
+                                            *(writer.get_list_items(flow_entry.match_str_list_) +
+                                              writer.get_list_items(flow_entry.action_str_list_) +
+                                              writer.get_list_items(extra_items))))
+
+        (string_table, num_strings) = writer.get_string_table()
+        items = _array_bytes(writer.items)
+        strings_offset = _HEADER.size
+        items_offset = strings_offset + len(string_table)
+        records_offset = items_offset + len(items)
+        tables_offset = records_offset + len(records) * _RECORD.size
+
+        with open(file_name, 'wb') as snapshot_file:
+            snapshot_file.write(_HEADER.pack(_MAGIC, _VERSION, len(records), len(tables), num_strings, len(writer.items),
+                                             strings_offset, items_offset, records_offset, tables_offset))
+            snapshot_file.write(string_table)
+            snapshot_file.write(items)
+            snapshot_file.write(''.join(records))
+            snapshot_file.write(''.join(tables))
+
+    #
+    # Return a FlowSnapshotContainer for a snapshot file saved with save()
+    # Raises ValueError if its not a snapshot file
+    #
+    @staticmethod
+    def load(file_name):
+        return FlowSnapshotContainer(file_name)
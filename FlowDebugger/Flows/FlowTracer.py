@@ -4,16 +4,18 @@ Created on Nov 27, 2014
 @author: Brady Johnson
 '''
 
-import copy
 from collections import OrderedDict
 from FlowDebugger.Flows.FlowEntries import FlowEntry
 from FlowDebugger.Flows.FlowEntryActions import FlowEntryActionSetField, FlowEntryActionMod, FlowEntryActionSwitchPort, FlowEntryActionSwitch 
-from FlowDebugger.Flows.FlowEntryMatches import FlowEntryMatchSwitch, FlowEntryMatchLayer2, FlowEntryMatchLayer3, FlowEntryMatchLayer4
+from FlowDebugger.Flows.FlowEntryFields import parse_masked_int
+from FlowDebugger.Flows.FlowEntryMatches import FlowEntryMatches, FlowEntryMatchSwitch, FlowEntryMatchLayer2, FlowEntryMatchLayer3, FlowEntryMatchLayer4
+from FlowDebugger.Flows.PacketHeader import PacketHeader
 
 class FlowTracer(object):
 
     # flow_entries is a list as returned by Flows.DumpFlows.dump_flows()
-    def __init__(self, flow_entries, input_match_object_list):
+    # input_match_object_list is only needed by trace(), see trace_batch()
+    def __init__(self, flow_entries, input_match_object_list=None):
         self._flow_entries = flow_entries
         self._input_match_object_list = input_match_object_list
         self._set_fields_actions_to_match = {'eth_src' : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_src],
@@ -27,12 +29,14 @@ class FlowTracer(object):
                                              'udp_src' : [FlowEntryMatchLayer4, FlowEntryMatchLayer4.tp_src],
                                              'udp_dst' : [FlowEntryMatchLayer4, FlowEntryMatchLayer4.tp_dst]                                    
                                              }
+        # The keys are the FlowEntryActionMod.mod_key values
         self._mod_actions_to_match = {'mod_dl_src'      : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_src],
                                       'mod_dl_dst'      : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_dst],
-                                      'mod_dl_vlan_vid' : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_vlan],
-                                      'mod_dl_vlan_pcp' : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_vlan_pcp],
+                                      'mod_vlan_vid'    : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_vlan],
+                                      'mod_vlan_pcp'    : [FlowEntryMatchLayer2, FlowEntryMatchLayer2.dl_vlan_pcp],
                                       'mod_nw_src'      : [FlowEntryMatchLayer3, FlowEntryMatchLayer3.nw_src],
                                       'mod_nw_dst'      : [FlowEntryMatchLayer3, FlowEntryMatchLayer3.nw_dst],
+                                      'mod_nw_tos'      : [FlowEntryMatchLayer3, FlowEntryMatchLayer3.nw_tos],
                                       'mod_tp_src'      : [FlowEntryMatchLayer4, FlowEntryMatchLayer4.tp_src],
                                       'mod_tp_dst'      : [FlowEntryMatchLayer4, FlowEntryMatchLayer4.tp_dst]
                                       }
@@ -44,10 +48,11 @@ class FlowTracer(object):
     #      - next_table the next table to evaluate
     #      - drop - True/False indicates if the packet should be dropped
     #      - output - None/str indicates if the packet should be output and where
-    #      - next_input_matches - a list of FlowEntryMatches objects after having applied the FlowEntry actions.
+    #      - next_input_matches - a PacketHeader, the FlowEntryMatches objects after having applied the FlowEntry actions.
+    #                             Its shared with the previous hop if the actions didnt modify it.
     # 
     def trace(self):
-        next_input_matches = self._input_match_object_list
+        next_input_matches = self._get_header(self._input_match_object_list)
         keep_going = True
         next_table = 0
         matched_flow_entries = OrderedDict()
@@ -77,43 +82,133 @@ class FlowTracer(object):
         return matched_flow_entries
 
     #
-    # Iterate the flow entries in the specified table and returns the 
-    # flow_entry from flow_entries that matched input_match_object_list
+    # Trace many packets at once, input_headers is a list of input match object lists
+    # or PacketHeaders, as passed to the constructor for trace().
+    # Returns a tuple (paths, hit_counts):
+    #   paths      - a list with the trace() result of each input header, in the same order
+    #   hit_counts - a dictionary {FlowEntry : number of input headers that matched it}
+    #
+    # The headers with the same match keys always take the same path, so theyre traced
+    # together as one group. In each table, the groups are bucketed by their projection
+    # onto the table, see FlowTableClassifier.get_projection(), and the table is only
+    # looked up once per bucket, using the container lookup cache. The actions are
+    # applied once per group, and the groups that end up with the same match keys are
+    # merged before the next table.
+    # Usage:
+    #    (paths, hit_counts) = FlowTracer(flow_entries).trace_batch(input_headers)
+    #
+    def trace_batch(self, input_headers):
+        paths = [OrderedDict() for __ in input_headers]
+        hit_counts = {}
+
+        # The active groups: dictionary {(table, frozenset(match keys)) : (PacketHeader, [header indices])}
+        groups = {}
+        for (index, input_matches) in enumerate(input_headers):
+            self._add_to_group(groups, 0, self._get_header(input_matches), [index])
+
+        while groups:
+            # Bucket the groups by table and projection
+            buckets = {}  # dictionary {(table, projection) : [(PacketHeader, [header indices])]}
+            for ((table, __), group) in groups.iteritems():
+                projection = self._flow_entries.get_table_classifier(table).get_projection(group[0].fields)
+                buckets.setdefault((table, projection), []).append(group)
+
+            next_groups = {}
+            for ((table, projection), bucket_groups) in buckets.iteritems():
+                matching_flow_entry = self._flow_entries.lookup_projection(table, projection)
+                for (input_matches, indices) in bucket_groups:
+                    if matching_flow_entry is None:
+                        results = (table, True, None, input_matches)
+                        # Each path has its own no match FlowEntry, as with trace()
+                        for index in indices:
+                            paths[index][FlowEntry()] = results
+                        continue
+
+                    results = self._apply_actions(matching_flow_entry, input_matches)
+                    hit_counts[matching_flow_entry] = hit_counts.get(matching_flow_entry, 0) + len(indices)
+                    for index in indices:
+                        paths[index][matching_flow_entry] = results
+
+                    (next_table, drop, output, next_input_matches) = results
+                    if not (drop or output):
+                        self._add_to_group(next_groups, next_table, next_input_matches, indices)
+            groups = next_groups
+
+        return (paths, hit_counts)
+
+    #
+    # Internal method to add the header indices to the group of (table, PacketHeader)
+    #
+    def _add_to_group(self, groups, table, header, indices):
+        group_key = (table, header.match_keys)
+        group = groups.get(group_key)
+        if group is None:
+            groups[group_key] = (header, list(indices))
+        else:
+            group[1].extend(indices)
+
+    # Internal method to return the input match object list as a PacketHeader
+    def _get_header(self, input_match_object_list):
+        if isinstance(input_match_object_list, PacketHeader):
+            return input_match_object_list
+        return PacketHeader(input_match_object_list or ())
+
+    #
+    # Lookup the specified table and return the highest priority
+    # flow_entry from flow_entries that matched the input_header PacketHeader
     # If no match is found, return None
     #
-    def _get_match(self, table, input_match_object_list):
-        # Iterate each Flow Entry in this table, based on priority
-        for (__, entry_list) in self._flow_entries.iter_table_priority_entries(table):
-            # Iterate each Flow Entry in this table with the same priority
-            for entry in entry_list:
-                entry_matched = True
-                for match_obj in entry.match_object_list_:
-                    #print 'Looking for a match for in table %s, priority %s: %s' % (table, entry.priority_, match_obj)
-                    item_matched = False
-                    for input_match_obj in input_match_object_list:
-                        if match_obj.match(input_match_obj):
-                            item_matched = True
-                            break
-                    if not item_matched:
-                        # Go on to the next entry in the table
-                        entry_matched = False
-                        break
-
-                if entry_matched:
-                    return entry
+    def _get_match(self, table, input_header):
+        # The table classifier is built once per FlowEntryContainer, see FlowClassifier.py,
+        # and the lookup results are cached by the container
+        classifier = self._flow_entries.get_table_classifier(table)
+        projection = classifier.get_projection(input_header.fields)
+        return self._flow_entries.lookup_projection(table, projection)
 
     #
-    # Given a flow_entry returned by get_match(), return an input_match_object_list
-    # which is a result of applying the flow_entry actions
+    # Given a flow_entry returned by get_match(), return the PacketHeader
+    # which is a result of applying the flow_entry actions to input_matches
     # Return (next_table, drop, output, next_input_matches)
     #
     def _apply_actions(self, flow_entry, input_matches):
+        (next_table, drop, output, writes) = self._parse_actions(flow_entry)
+
+        # The matches set by the actions, theyre merged into a derived PacketHeader at the end
+        merge_matches = []
+        # The packet metadata is 0 until its written
+        metadata = input_matches.fields.get('metadata', 0)
+
+        for write in writes:
+            if isinstance(write, FlowEntryMatches):
+                merge_matches.append(write)
+                continue
+
+            # Only the metadata bits in the mask are written
+            metadata_match = FlowEntryMatchSwitch()
+            (value, mask) = write
+            if mask is None or not isinstance(metadata, (int, long)):
+                # The value is the write_metadata string, it couldnt be parsed
+                metadata_match.metadata = value
+            else:
+                metadata = (metadata & ~mask) | value
+                metadata_match.metadata = '0x%x' % metadata
+            merge_matches.append(metadata_match)
+
+        # If nothing is modified, this is the input PacketHeader itself
+        return (next_table, drop, output, input_matches.with_matches(merge_matches))
+
+    #
+    # Internal method to return the results of the flow_entry actions, which dont depend
+    # on the packet: (next_table, drop, output, writes). writes is a list of the packet
+    # modifications, in the order of the actions:
+    #   - a FlowEntryMatches object with the fields set by a set_field or mod_* action
+    #   - a (value, mask) tuple for a write_metadata action, see parse_masked_int()
+    #
+    def _parse_actions(self, flow_entry):
         next_table = flow_entry.table_ + 1
         drop = False
         output = None
-
-        # Perform a deep copy, since we may be modifying it
-        next_input_matches = copy.deepcopy(input_matches)
+        writes = []
 
         for action in flow_entry.action_object_list_:
             if isinstance(action, FlowEntryActionSwitchPort):
@@ -135,9 +230,7 @@ class FlowTracer(object):
                 if action.goto_table:
                     next_table = int(action.goto_table)
                 else:
-                    metadata_match = FlowEntryMatchSwitch()
-                    metadata_match.metadata = action.write_metadata
-                    self._merge_match(next_input_matches, metadata_match)
+                    writes.append(parse_masked_int(action.write_metadata, 64))
 
             elif isinstance(action, FlowEntryActionSetField):
                 #print 'FlowEntryActionSetField: %s' % action
@@ -145,35 +238,24 @@ class FlowTracer(object):
                 if not action_list:
                     # TODO popup
                     print 'ERROR FlowTracer.apply_actions() cant get match object for %s' % action
+                    continue
                 match = action_list[0]() # instantiate
                 action_list[1].fset(match, action.set_field_value)
-                self._merge_match(next_input_matches, match)
+                writes.append(match)
                     
             elif isinstance(action, FlowEntryActionMod):
                 #print 'FlowEntryActionMod: %s' % action
-                action_list = self._mod_actions_to_match.get(action.action_str_key)
+                action_list = self._mod_actions_to_match.get(action.mod_key)
                 if not action_list:
                     # TODO popup
                     print 'ERROR FlowTracer.apply_actions() cant get match object for %s' % action
+                    continue
                 match = action_list[0]() # instantiate
-                action_list[1].fset(match, action.action_str_value)
-                self._merge_match(next_input_matches, match)
+                action_list[1].fset(match, action.mod_value)
+                writes.append(match)
 
             else:
                 # TODO popup
                 print 'ERROR unknown action %s' % action
 
-        return (next_table, drop, output, next_input_matches)
-
-    def _merge_match(self, input_match_list, flow_entry_match):
-        flow_entry_match_found = False
-        for match in input_match_list:
-            if match.is_compareable(flow_entry_match):
-                # merge the match
-                match.copy_match(flow_entry_match)
-                flow_entry_match_found = True
-                break
-
-        # if it wasnt already in the input_match_list, then add it
-        if not flow_entry_match_found:
-            input_match_list.append(flow_entry_match)
+        return (next_table, drop, output, writes)
@@ -0,0 +1,352 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+from FlowDebugger.Flows.FlowEntryFields import format_masked_int, format_port, format_mac, format_ipv4
+
+#
+# Header space sets of packets, as in Header Space Analysis (Kazemian et al, NSDI 2012),
+# used by FlowReachability.py to propagate sets of packets through the tables.
+#
+# The packet header fields that the FlowEntries match on, see FlowEntryMatches.get_packed_fields(),
+# are concatenated into one bit vector, and a set of packets is a union of "cubes": ternary
+# bit vectors, stored as a (value, mask) tuple of Python longs, where the mask bits are the
+# bits that must be equal to the value bits and the other bits are wildcards. So a FlowEntry
+# match is one cube, and intersecting or comparing cubes are a few bitwise operations on
+# longs, whatever the number of fields.
+#
+# A difference of cubes can need many cubes, one per bit, so a HeaderSpace is stored as a
+# list of terms: (cube, tuple of subtracted cubes), and the differences are only expanded
+# when needed, see HeaderSpace.is_empty() and HeaderSpace.get_cubes(). Only the subtracted
+# cubes that intersect the term cube are kept.
+# Usage:
+#    space = HeaderSpace.from_fields([('in_port', 2, 0xffffffff)])
+#    web = HeaderSpace.from_fields([('dl_type', 0x0800, 0xffff), ('tp_dst', 80, 0xffff)])
+#    print space.difference(web)
+#
+
+#
+# The header fields: (field name, bits, format function), the format functions are the
+# FlowEntryFields.py format functions of the matches, see FlowEntryMatches.py
+#
+HEADER_FIELDS = (('in_port',     32, format_port),
+                 ('metadata',    64, lambda packed: format_masked_int(packed, 64)),
+                 ('dl_src',      48, format_mac),
+                 ('dl_dst',      48, format_mac),
+                 ('dl_type',     16, lambda packed: format_masked_int(packed, 16)),
+                 ('dl_vlan',     12, lambda packed: format_masked_int(packed, 12, hex_format=False)),
+                 ('dl_vlan_pcp',  3, lambda packed: format_masked_int(packed, 3, hex_format=False)),
+                 ('nw_src',      32, format_ipv4),
+                 ('nw_dst',      32, format_ipv4),
+                 ('nw_tos',       8, lambda packed: format_masked_int(packed, 8, hex_format=False)),
+                 ('nw_proto',     8, lambda packed: format_masked_int(packed, 8, hex_format=False)),
+                 ('tp_src',      16, lambda packed: format_masked_int(packed, 16, hex_format=False)),
+                 ('tp_dst',      16, lambda packed: format_masked_int(packed, 16, hex_format=False)))
+
+# Return a dictionary {field name : (bit offset in the header, all the field bits)}
+def _get_field_offsets():
+    field_offsets = {}
+    offset = 0
+    for (name, bits, __) in HEADER_FIELDS:
+        field_offsets[name] = (offset, (1 << bits) - 1)
+        offset += bits
+    return field_offsets
+
+_FIELD_OFFSETS = _get_field_offsets()
+
+# The cube of all the packets
+ALL_PACKETS = (0L, 0L)
+# The mask of all the header bits, the cubes with this mask are single packets
+_ALL_BITS = (1L << sum(bits for (__, bits, __) in HEADER_FIELDS)) - 1
+
+#
+# Return the cube of the (field name, value, mask) fields, or None if the values contradict
+# each other, like a FlowEntry matching on "tcp,nw_proto=17". Raises ValueError if a field
+# isnt a header field, or its value couldnt be normalized, like a port name.
+#
+def cube_from_fields(fields):
+    cube = ALL_PACKETS
+    for (name, value, mask) in fields:
+        offset = _FIELD_OFFSETS.get(name)
+        if offset is None or mask is None:
+            raise ValueError('Cant match %s=%s on the header bits' % (name, value))
+        (shift, field_bits) = offset
+        cube = cube_intersection(cube, ((value & mask & field_bits) << shift, (mask & field_bits) << shift))
+        if cube is None:
+            return None
+    return cube
+
+#
+# The IPv4 fields, that need dl_type=0x0800, see add_prerequisites()
+#
+_IPV4_FIELDS = frozenset(['nw_src', 'nw_dst', 'nw_tos', 'nw_proto', 'tp_src', 'tp_dst'])
+_IPV4_DL_TYPE = ('dl_type', 0x0800, 0xffff)
+
+#
+# Return the (field name, value, mask) fields of a match with the fields its match fields
+# imply, as OVS does: tcp is ip,nw_proto=6, so the IPv4 fields imply dl_type=0x0800, unless
+# there is a dl_type, like arp with nw_src. The tp_src and tp_dst fields need their protocol,
+# ovs-ofctl always outputs it with them, like tcp,tp_dst=80, so its already a field.
+#
+def add_prerequisites(fields):
+    has_ipv4_field = False
+    for (name, __, __) in fields:
+        if name == 'dl_type':
+            return fields
+        if name in _IPV4_FIELDS:
+            has_ipv4_field = True
+    if has_ipv4_field:
+        return tuple(fields) + (_IPV4_DL_TYPE,)
+    return fields
+
+#
+# Return the cube of the packets matched by the (field name, value, mask) fields of a match,
+# with their prerequisites, see add_prerequisites() and cube_from_fields()
+#
+def cube_from_match_fields(fields):
+    return cube_from_fields(add_prerequisites(fields))
+
+# Return a list of the (field name, value, mask) of a cube, for the fields it matches on
+def cube_to_fields(cube):
+    (value, mask) = cube
+    fields = []
+    for (name, __, __) in HEADER_FIELDS:
+        (shift, field_bits) = _FIELD_OFFSETS[name]
+        field_mask = (mask >> shift) & field_bits
+        if field_mask:
+            fields.append((name, (value >> shift) & field_bits, field_mask))
+    return fields
+
+# Return a "field=value,..." string of a cube, formatted as ovs-ofctl does, "*" for all the packets
+def format_cube(cube):
+    formats = dict((name, format_func) for (name, __, format_func) in HEADER_FIELDS)
+    return ','.join('%s=%s' % (name, formats[name]((value, mask))) for (name, value, mask) in cube_to_fields(cube)) or '*'
+
+# Return the intersection of 2 cubes, or None if its empty
+def cube_intersection(cube1, cube2):
+    if (cube1[0] ^ cube2[0]) & cube1[1] & cube2[1]:
+        return None
+    return (cube1[0] | cube2[0], cube1[1] | cube2[1])
+
+# Return True if cube1 contains all the packets of cube2
+def cube_covers(cube1, cube2):
+    return not (cube1[1] & ~cube2[1]) and not ((cube1[0] ^ cube2[0]) & cube1[1])
+
+#
+# Return a list of the cubes of a few packets of the cube, one packet each, with the bits
+# that the cube doesnt match on all 0, or all 1. Theyre unlikely to be matched by the other
+# cubes, so one of them thats not in the subtracted cubes shows that a term isnt empty,
+# without expanding the difference like is_subtracted().
+#
+def sample_packets(cube):
+    (value, mask) = cube
+    return [(value, _ALL_BITS), (value | (_ALL_BITS & ~mask), _ALL_BITS)]
+
+#
+# Return a list of disjoint cubes, the packets of cube1 that arent in cube2.
+# There is a cube per bit that cube2 matches on and cube1 doesnt.
+#
+def cube_difference(cube1, cube2):
+    (value, mask) = cube1
+    if (value ^ cube2[0]) & mask & cube2[1]:
+        # Disjoint
+        return [cube1]
+    cubes = []
+    bits = cube2[1] & ~mask
+    while bits:
+        bit = bits & -bits
+        bits ^= bit
+        # This bit is different from cube2, and the previous bits are equal to it,
+        # so the cubes are disjoint
+        cubes.append((value | (~cube2[0] & bit), mask | bit))
+        value |= cube2[0] & bit
+        mask |= bit
+    return cubes
+
+#
+# Return True if the packets of the cube are all in the subtracted cubes, that is if the
+# term (cube, subtracted) is empty. The difference is expanded one subtracted cube at a
+# time, starting with the one that needs the fewest cubes, and it stops as soon as a
+# packet that isnt subtracted is found.
+#
+def is_subtracted(cube, subtracted):
+    pending = [(cube, subtracted)]
+    while pending:
+        (cube, subtracted) = pending.pop()
+        subtracted = [sub for sub in subtracted if not (cube[0] ^ sub[0]) & cube[1] & sub[1]]
+        if not subtracted:
+            return False
+        (best_sub, best_bits) = (None, 0)
+        for sub in subtracted:
+            if cube_covers(sub, cube):
+                break
+            bits = _count_bits(sub[1] & ~cube[1])
+            if best_sub is None or bits < best_bits:
+                (best_sub, best_bits) = (sub, bits)
+        else:
+            subtracted.remove(best_sub)
+            # The first pieces have the fewest bits, so theyre more likely to have packets left
+            pending.extend((piece, subtracted) for piece in reversed(cube_difference(cube, best_sub)))
+    return True
+
+#
+# Return a tuple of the subtracted cubes of a term without those covered by another one,
+# theyre redundant. A cube can only be covered by a bigger one, with fewer mask bits, so
+# theyre compared by increasing number of mask bits, with the values of the kept cubes
+# per mask, only the masks that are a subset of the cube mask can cover it.
+#
+def remove_covered(subtracted):
+    values_byMask = {}
+    kept = []
+    for cube in sorted(subtracted, key=lambda sub: _count_bits(sub[1])):
+        (value, mask) = cube
+        for (kept_mask, kept_values) in values_byMask.iteritems():
+            if not kept_mask & ~mask and (value & kept_mask) in kept_values:
+                break
+        else:
+            values_byMask.setdefault(mask, set()).add(value)
+            kept.append(cube)
+    return tuple(kept)
+
+def _count_bits(value):
+    return bin(value).count('1')
+
+
+class HeaderSpace(object):
+    __slots__ = ('_terms',)
+
+    # cubes is an iterable of the cubes in the set
+    def __init__(self, cubes=()):
+        # list of (cube, tuple of the subtracted cubes that intersect it)
+        self._terms = [(cube, ()) for cube in cubes]
+
+    # Return the HeaderSpace of all the packets
+    @staticmethod
+    def all_packets():
+        return HeaderSpace([ALL_PACKETS])
+
+    #
+    # Return the HeaderSpace of the packets matching all the (field name, value, mask) fields,
+    # raises ValueError if a field cant be matched, see cube_from_fields()
+    #
+    @staticmethod
+    def from_fields(fields):
+        cube = cube_from_fields(fields)
+        return HeaderSpace([cube] if cube is not None else [])
+
+    #
+    # Return the HeaderSpace of the packets matching all the FlowEntryMatches objects,
+    # like the FlowTracer input match objects, with their prerequisites, so tcp is ip,nw_proto=6
+    #
+    @staticmethod
+    def from_match_objects(match_object_list):
+        fields = []
+        for match_obj in match_object_list:
+            fields.extend(match_obj.get_packed_fields())
+        return HeaderSpace.from_fields(add_prerequisites(fields))
+
+    # Return a HeaderSpace from a list of terms, see get_terms()
+    @staticmethod
+    def from_terms(terms):
+        space = HeaderSpace()
+        space._terms = terms
+        return space
+
+    # Return the number of terms, see get_terms(), its 0 if the HeaderSpace is trivially empty
+    def __len__(self):
+        return len(self._terms)
+
+    def __str__(self):
+        if not self._terms:
+            return 'empty'
+        term_strs = []
+        for (cube, subtracted) in self._terms:
+            if subtracted:
+                term_strs.append('%s - (%s)' % (format_cube(cube), ' | '.join(format_cube(sub) for sub in subtracted)))
+            else:
+                term_strs.append(format_cube(cube))
+        return ' | '.join(term_strs)
+
+    #
+    # Return the list of terms: (cube, tuple of subtracted cubes), the packets of the set are
+    # the union of the packets of each term cube that arent in any of its subtracted cubes
+    #
+    def get_terms(self):
+        return self._terms
+
+    # Return True if there are no packets in the set
+    def is_empty(self):
+        for (cube, subtracted) in self._terms:
+            if not is_subtracted(cube, subtracted):
+                return False
+        return True
+
+    #
+    # Return a list of cubes with the same packets, without subtracted cubes. The cubes of
+    # a term are disjoint, but the cubes of different terms may intersect. Expanding the
+    # differences may need many cubes, limit is the maximum number returned, or 0
+    #
+    def get_cubes(self, limit=0):
+        cubes = []
+        for (cube, subtracted) in self._terms:
+            pending = [(cube, list(subtracted))]
+            while pending:
+                (cube, subtracted) = pending.pop()
+                subtracted = [sub for sub in subtracted if not (cube[0] ^ sub[0]) & cube[1] & sub[1]]
+                if not subtracted:
+                    cubes.append(cube)
+                    if limit and len(cubes) >= limit:
+                        return cubes
+                    continue
+                sub = subtracted.pop()
+                pending.extend((piece, subtracted) for piece in cube_difference(cube, sub))
+        return cubes
+
+    # Return a HeaderSpace with the packets in this one or in other
+    def union(self, other):
+        return HeaderSpace.from_terms(self._terms + other._terms)
+
+    # Return a HeaderSpace with the packets in both this one and other
+    def intersection(self, other):
+        terms = []
+        for (other_cube, other_subtracted) in other._terms:
+            for (cube, subtracted) in self.intersect_cube(other_cube)._terms:
+                terms.append((cube, subtracted + tuple(sub for sub in other_subtracted if cube_intersection(cube, sub))))
+        return HeaderSpace.from_terms(terms)
+
+    # Return a HeaderSpace with the packets in this one that arent in other
+    def difference(self, other):
+        space = self
+        for (other_cube, other_subtracted) in other._terms:
+            # space - (cube - subtracted) = (space - cube) | (space & cube & subtracted)
+            kept = space.intersect_cube(other_cube)
+            space = space.subtract_cube(other_cube)
+            for sub in other_subtracted:
+                space = space.union(kept.intersect_cube(sub))
+        return space
+
+    # Return a HeaderSpace with the packets in this one that are in the cube
+    def intersect_cube(self, cube):
+        terms = []
+        for (term_cube, subtracted) in self._terms:
+            term_cube = cube_intersection(term_cube, cube)
+            if term_cube is not None:
+                terms.append((term_cube, tuple(sub for sub in subtracted if cube_intersection(term_cube, sub))))
+        return HeaderSpace.from_terms(terms)
+
+    # Return a HeaderSpace with the packets in this one that arent in the cube
+    def subtract_cube(self, cube):
+        terms = []
+        for term in self._terms:
+            (term_cube, subtracted) = term
+            if cube_intersection(term_cube, cube) is None:
+                terms.append(term)
+            elif not cube_covers(cube, term_cube):
+                terms.append((term_cube, subtracted + (cube,)))
+        return HeaderSpace.from_terms(terms)
+
+    # Return a HeaderSpace without the terms that have no packets
+    def compact(self):
+        return HeaderSpace.from_terms([term for term in self._terms if not is_subtracted(*term)])
@@ -0,0 +1,122 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import copy
+
+#
+# The packet header traced by the FlowTracer through the tables: the input match objects,
+# as modified by the set_field, mod_* and write_metadata actions.
+# A PacketHeader is never modified, with_match() returns a derived PacketHeader that shares
+# all the unchanged match objects and indices with this one, so keeping the header of each
+# hop in the trace results costs a tuple per modified hop, instead of a deep copy of all
+# the match objects per hop. The match objects given to the constructor are never modified.
+# Its a sequence of the match objects, so it can be used like the input match object list.
+# Usage:
+#    header = PacketHeader(input_match_object_list)
+#    next_header = header.with_match(set_field_match)
+#    for match_obj in next_header:
+#        print match_obj
+#
+class PacketHeader(object):
+    __slots__ = ('_matches', '_positions_byType', '_keys', '_match_keys', '_fields')
+
+    def __init__(self, match_object_list=()):
+        self._matches = tuple(match_object_list)
+        # dictionary {match class : tuple of the indices in _matches of the objects of that class}
+        positions_byType = {}
+        for (index, match_obj) in enumerate(self._matches):
+            positions_byType.setdefault(type(match_obj), []).append(index)
+        self._positions_byType = dict((match_type, tuple(indices)) for (match_type, indices) in positions_byType.iteritems())
+        # The match_key() of each match object, their frozenset, and the packet fields, computed when needed
+        self._keys = None
+        self._match_keys = None
+        self._fields = None
+
+    def __len__(self):
+        return len(self._matches)
+
+    def __iter__(self):
+        return iter(self._matches)
+
+    def __getitem__(self, index):
+        return self._matches[index]
+
+    def __str__(self):
+        return ', '.join('[%s]' % match_obj for match_obj in self._matches)
+
+    # Return a tuple with the match_key() of each match object
+    def get_keys(self):
+        if self._keys is None:
+            self._keys = tuple([match_obj.match_key() for match_obj in self._matches])
+        return self._keys
+
+    # Return the frozenset of the match keys, two headers with the same match keys
+    # are matched by the same FlowEntries, see FlowClassifier.py
+    def get_match_keys(self):
+        if self._match_keys is None:
+            self._match_keys = frozenset(self.get_keys())
+        return self._match_keys
+
+    #
+    # Return the packet fields, a dictionary {field name : value} of the normalized values
+    # of the match objects, see FlowEntryMatches.get_packed_fields(). If a field is set in
+    # several match objects, the first one is used. The dictionary must not be modified.
+    #
+    def get_fields(self):
+        if self._fields is None:
+            fields = {}
+            for (__, packed_fields) in self.get_keys():
+                for (name, value, __) in packed_fields:
+                    if name not in fields:
+                        fields[name] = value
+            self._fields = fields
+        return self._fields
+
+    keys = property(fget=get_keys)
+    match_keys = property(fget=get_match_keys)
+    fields = property(fget=get_fields)
+
+    #
+    # Return a PacketHeader with match_obj merged into it: if there is a compareable
+    # match object, see FlowEntryMatches.is_compareable(), a copy of it is modified with
+    # FlowEntryMatches.copy_match(), else match_obj is added. Only the match objects of
+    # the same class as match_obj are compared, instead of all of them.
+    #
+    def with_match(self, match_obj):
+        for index in self._positions_byType.get(type(match_obj), ()):
+            header_match = self._matches[index]
+            if header_match.is_compareable(match_obj):
+                header_match = copy.copy(header_match)
+                header_match.copy_match(match_obj)
+                return self._derive(self._matches[:index] + (header_match,) + self._matches[index+1:],
+                                    self._positions_byType, index, header_match)
+
+        # Its not in the header yet, so add it
+        positions_byType = self._positions_byType.copy()
+        positions_byType[type(match_obj)] = positions_byType.get(type(match_obj), ()) + (len(self._matches),)
+        return self._derive(self._matches + (match_obj,), positions_byType, len(self._matches), match_obj)
+
+    # Return a PacketHeader with all the match objects merged in order, see with_match()
+    def with_matches(self, match_object_list):
+        header = self
+        for match_obj in match_object_list:
+            header = header.with_match(match_obj)
+        return header
+
+    #
+    # Internal method to create the derived PacketHeader, the match keys already
+    # computed are reused, only the key of the modified match object is computed
+    #
+    def _derive(self, matches, positions_byType, index, match_obj):
+        header = PacketHeader.__new__(PacketHeader)
+        header._matches = matches
+        header._positions_byType = positions_byType
+        header._keys = None
+        header._match_keys = None
+        header._fields = None
+        if self._keys is not None:
+            header._keys = self._keys[:index] + (match_obj.match_key(),) + self._keys[index+1:]
+        return header
@@ -0,0 +1,166 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import socket
+import threading
+import time
+from contextlib import contextmanager
+import paramiko
+
+#
+# A pooled SSH connection, as returned by SshConnectionPool.acquire(), client is the
+# connected paramiko.SSHClient
+#
+class _PooledConnection(object):
+    def __init__(self, client, password):
+        self.client = client
+        self.password = password
+        self.in_use = 0          # Number of users of the connection, its not evicted while in use
+        self.last_used = time.time()
+
+#
+# A pool of SSH connections, keyed by (host, user, port), so that the TCP and SSH handshakes
+# and authentication are only done once per host instead of on every command.
+# The connections are kept alive with SSH keepalives, checked before being reused, and
+# closed when theyve been idle for longer than idle_timeout seconds, or by shutdown().
+# The idle connections are checked by a timer thread, every idle_timeout / 2 seconds
+# while there are connections in the pool.
+# Each connection may be used by several threads at the same time: paramiko multiplexes
+# the command channels on the same SSH transport.
+# Usage:
+#    with ssh_pool.connection(host, user, pw) as ssh_client:
+#        ssh_client.exec_command(command)
+#
+class SshConnectionPool(object):
+    def __init__(self, keepalive_interval=30, idle_timeout=300, connect_timeout=10):
+        self._keepalive_interval = keepalive_interval
+        self._idle_timeout = idle_timeout
+        self._connect_timeout = connect_timeout
+        self._connections = {}   # dictionary {(host, user, port) : _PooledConnection}
+        self._key_locks = {}     # dictionary {(host, user, port) : Lock} so each host is only connected once
+        self._evict_timer = None # the threading.Timer that calls evict_idle(), while there are connections
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._connections)
+
+    def _connect(self, host, user, pw, port):
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.load_system_host_keys()
+        client.connect(host, username=user, password=pw, port=port, timeout=self._connect_timeout)
+        client.get_transport().set_keepalive(self._keepalive_interval)
+        return client
+
+    @staticmethod
+    def _is_healthy(client):
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            # Checks the connection without waiting for a reply from the server
+            transport.send_ignore()
+        except (EOFError, socket.error, paramiko.SSHException):
+            return False
+        return True
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _remove(self, key):
+        with self._lock:
+            pooled_connection = self._connections.pop(key, None)
+        if pooled_connection is not None:
+            pooled_connection.client.close()
+
+    # Internal method to start the eviction timer, if its not running. Called with self._lock held
+    def _schedule_eviction(self):
+        if self._evict_timer is None and self._connections:
+            self._evict_timer = threading.Timer(self._idle_timeout / 2.0, self._evict_timer_callback)
+            self._evict_timer.daemon = True
+            self._evict_timer.start()
+
+    def _evict_timer_callback(self):
+        with self._lock:
+            self._evict_timer = None
+        self.evict_idle()
+
+    #
+    # Return a _PooledConnection whose client is a paramiko.SSHClient connected to host, either
+    # from the pool or a new connection. Call release() with it once its no longer needed,
+    # or use connection()
+    #
+    def acquire(self, host, user, pw, port=22):
+        self.evict_idle()
+        key = (host, user, port)
+        with self._get_key_lock(key):
+            with self._lock:
+                pooled_connection = self._connections.get(key)
+                if pooled_connection is not None:
+                    pooled_connection.in_use += 1
+
+            # Dont reuse a broken connection, or one that was opened with a different password,
+            # unless its already being used by someone else
+            if pooled_connection is not None and pooled_connection.in_use == 1:
+                if pooled_connection.password != pw or not self._is_healthy(pooled_connection.client):
+                    self._remove(key)
+                    pooled_connection = None
+
+            if pooled_connection is None:
+                pooled_connection = _PooledConnection(self._connect(host, user, pw, port), pw)
+                pooled_connection.in_use = 1
+                with self._lock:
+                    self._connections[key] = pooled_connection
+                    self._schedule_eviction()
+
+            return pooled_connection
+
+    #
+    # Release a _PooledConnection returned by acquire(). If it was removed from the pool
+    # while in use, by close() or shutdown(), then only its use count is decremented.
+    #
+    def release(self, pooled_connection):
+        with self._lock:
+            pooled_connection.in_use -= 1
+            pooled_connection.last_used = time.time()
+
+    # Context manager yielding the paramiko.SSHClient of a pooled connection
+    @contextmanager
+    def connection(self, host, user, pw, port=22):
+        pooled_connection = self.acquire(host, user, pw, port)
+        try:
+            yield pooled_connection.client
+        finally:
+            self.release(pooled_connection)
+
+    #
+    # Close the connections that arent in use and have been idle for longer than idle_timeout
+    #
+    def evict_idle(self):
+        now = time.time()
+        idle_connections = []
+        with self._lock:
+            for (key, pooled_connection) in self._connections.items():
+                if pooled_connection.in_use == 0 and now - pooled_connection.last_used > self._idle_timeout:
+                    idle_connections.append(self._connections.pop(key))
+            self._schedule_eviction()
+        for pooled_connection in idle_connections:
+            pooled_connection.client.close()
+
+    # Close the connection to a host, if there is one
+    def close(self, host, user, port=22):
+        self._remove((host, user, port))
+
+    # Close all the connections
+    def shutdown(self):
+        with self._lock:
+            keys = self._connections.keys()
+            if self._evict_timer is not None:
+                self._evict_timer.cancel()
+                self._evict_timer = None
+        for key in keys:
+            self._remove(key)
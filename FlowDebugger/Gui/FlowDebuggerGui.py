@@ -9,16 +9,31 @@ from Tkinter import Tk, Frame
 from Tkconstants import BOTH, BOTTOM, E, LEFT, N, RIGHT, TOP, W, X, YES
 import FlowDebugger.Flows.DumpFlows as DumpFlows
 from FlowDebugger.Flows.FlowEntries import FlowEntryFormatter
-from FlowDebugger.Gui.GuiMisc import Buttons, Checked, LabelBase, LabelEntry, LabelOption, Popup, Radios, ScrolledList
+from FlowDebugger.Flows.FlowEntryDelta import FlowEntryDeltaRefresher
+from FlowDebugger.Flows.FlowShadowing import FlowShadowing, FlowShadowingResult
+from FlowDebugger.Gui.GuiMisc import BackgroundTask, Buttons, Checked, LabelBase, LabelEntry, LabelOption, Popup, Radios, VirtualList
+from FlowDebugger.Gui.MonitorGui import MonitorGui
 from FlowDebugger.Gui.TraceGui import TraceGui
 from FlowDebugger.Gui.SshUserPw import SshUserPw
 
 class FlowDebuggerGui(object):
+    # The colors of the flagged shadowed, redundant and undetermined FlowEntries, see Flows.FlowShadowing
+    SHADOWING_COLORS = {FlowShadowingResult.SHADOWED : 'grey', FlowShadowingResult.REDUNDANT : 'blue', FlowShadowingResult.UNDETERMINED : 'orange'}
 
     # flow_entries is an instance of FlowEntries.FlowEntryContainer
-    def __init__(self, switch, table, of_version, check_cookie=False, check_pkts=False, check_duration=False, check_priority=False, check_matched=False, sort_by_priority=False):
+    # If flow_entries is specified, like a snapshot loaded with Flows.FlowSnapshot, its displayed
+    # when the GUI starts instead of dumping the switch, the refresh button dumps the switch
+    # If input_file is specified, the flow entries are read from that saved dump-flows output
+    # instead of dumping the switch, see DumpFlows.dump_flows_file()
+    def __init__(self, switch, table, of_version, check_cookie=False, check_pkts=False, check_duration=False, check_priority=False, check_matched=False, sort_by_priority=False, check_shadowed=False, flow_entries=None, input_file=''):
         self._first_refresh = True
-        self._flow_entries = None
+        self._flow_entries = flow_entries
+        # Consecutive refreshes of the same switch only parse the flows that changed
+        self._refresher = None
+        self._refresher_key = None
+        # The refreshes run on a worker thread, see _refresh_callback_dump()
+        self._refresh_task = None
+        self._dump_progress = None
 
         self._root = Tk()
         self._root.title('Flow Debugger')
@@ -36,6 +51,7 @@ class FlowDebuggerGui(object):
         self._table_label  = LabelEntry(label_entry_frame,  'Table',      table)
         self._filter_label = LabelEntry(label_entry_frame,  'Filter string')
         self._ofver_label  = LabelOption(label_entry_frame, 'OF version', of_version, 'OpenFlow11', 'OpenFlow13')
+        self._file_label   = LabelEntry(label_entry_frame,  'Input file', input_file)
 
         # The info to display
         # TODO move these to a "View" pull-down menu
@@ -46,6 +62,8 @@ class FlowDebuggerGui(object):
         self._check_priority     = Checked(checks_frame, 'show priority',     set_checked=check_priority)
         self._check_cookie       = Checked(checks_frame, 'show cookie',       set_checked=check_cookie)
         self._check_matched_only = Checked(checks_frame, 'show matched only', set_checked=check_matched)
+        self._check_shadowed     = Checked(checks_frame, 'flag shadowed',     set_checked=check_shadowed,
+                                           on_check_callback=self._redisplay_callback, on_uncheck_callback=self._redisplay_callback)
         self._reset_login        = Checked(checks_frame, 'reset login',       set_checked=False)
         self._reset_login.display(False)
 
@@ -61,18 +79,31 @@ class FlowDebuggerGui(object):
         # the buttons
         button_frame = Frame(self._top_frame, padx=5)
         button_frame.pack(side=RIGHT, anchor=E)
-        buttons_dict = OrderedDict([('refresh', self._refresh_callback), ('trace', self._trace_callback), ('quit', self._root.quit)])
+        buttons_dict = OrderedDict([('refresh', self._refresh_callback), ('cancel', self._cancel_callback), ('trace', self._trace_callback),
+                                    ('monitor', self._monitor_callback), ('quit', self._quit_callback)])
         Buttons(button_frame, buttons_dict)
 
+        # The refresh progress
+        status_frame = Frame(self._root)
+        status_frame.pack(side=TOP, fill=X, padx=10)
+        self._status_label = LabelBase(status_frame, '', width=100)
+
         # The scrollable list
         list_frame = Frame(self._root)
         list_frame.pack(side=BOTTOM, expand=YES, fill=BOTH)
-        self._list = ScrolledList(list_frame)
+        # The FlowEntry rows are only formatted when theyre scrolled to, see _format_entry()
+        self._list = VirtualList(list_frame, row_formatter=self._format_entry)
         # keep the index of each FlowEntry to be able to highlight the tracing later
         self._list_entry_indices = {}
+        # The formatter and the shadowing kinds of the displayed FlowEntries, see _display_flow_entries()
+        self._list_formatter = FlowEntryFormatter()
+        self._list_kinds_byEntry = {}
 
         # Create the Trace GUI window, but only show it when the trace button is pressed
-        self._trace_gui = TraceGui(self._trace_results_callback)
+        self._trace_gui = TraceGui(self._trace_results_callback, busy_callback=self._is_refreshing)
+
+        # Create the Monitor GUI window, but only show it when the monitor button is pressed
+        self._monitor_gui = MonitorGui()
 
         # Create the User/Pw GUI window
         self._user_gui = SshUserPw(self._refresh_callback_user_pw)
@@ -81,11 +112,29 @@ class FlowDebuggerGui(object):
 
     # This is a blocking call
     def run(self):
-        self._refresh_callback()
+        if self._flow_entries is not None:
+            self._display_flow_entries()
+        else:
+            self._refresh_callback()
         self._root.mainloop() # blocking call
+        # Close the pooled SSH connections used for remote refreshes
+        DumpFlows.shutdown()
 
     # This function is called when the "refresh" button is pressed on the main GUI window
     def _refresh_callback(self):
+        if self._is_refreshing():
+            Popup('A refresh is already running')
+            return
+        # The trace reads the FlowEntries that the refresh would change
+        if self._trace_gui.running:
+            Popup('Cant refresh while tracing')
+            return
+
+        # The saved dump-flows output doesnt need a switch or a login
+        if self._file_label.entry_text:
+            self._refresh_callback_dump()
+            return
+
         # We cant do anything if the switch name is empty
         if not self._switch_label.entry_text:
             # TODO consider adding functionality to list all availale switches
@@ -114,58 +163,152 @@ class FlowDebuggerGui(object):
 
     # This function is only called by either _refresh_callback() or _refresh_callback_user_pw()
     def _refresh_callback_dump(self):
-        self._list.clear()
-        self._list_entry_indices.clear()
+        input_file = self._file_label.entry_text
+        if input_file:
+            refresher_key = (input_file,)
+        else:
+            refresher_key = (self._host_label.entry_text, self._switch_label.entry_text, self._table_label.entry_text, self._ofver_label.entry_text)
+        if self._refresher is None or self._refresher_key != refresher_key:
+            self._refresher = FlowEntryDeltaRefresher()
+            self._refresher_key = refresher_key
+
+        #
+        # Dump the flows on a worker thread, so the window keeps repainting and the refresh can
+        # be cancelled. The progress is posted to the task every DumpFlowsProgress.CALLBACK_LINES
+        # lines, and the refresher only changes the FlowEntries once the dump has succeeded.
+        refresher = self._refresher
+        progress = DumpFlows.DumpFlowsProgress(callback=lambda dump_progress: task.post(str(dump_progress)))
+        if input_file:
+            refresh_func = lambda: DumpFlows.refresh_flows_file(refresher, input_file, progress)
+        else:
+            dump_args = dict(switch=self._switch_label.entry_text,
+                             table=self._table_label.entry_text,
+                             host=self._host_label.entry_text,
+                             user=self._user_gui.username,
+                             pw=self._user_gui.password,
+                             of_version=self._ofver_label.entry_text)
+            refresh_func = lambda: DumpFlows.refresh_flows(refresher, progress=progress, **dump_args)
+
+        task = BackgroundTask(self._root, refresh_func, item_callback=self._refresh_progress_callback, done_callback=self._refresh_done_callback)
+        self._refresh_task = task
+        self._dump_progress = progress
+        self._status_label.label_text = 'Refreshing...'
+        task.start()
+
+    # Called on the main thread with the DumpFlows.DumpFlowsProgress string posted by the refresh
+    def _refresh_progress_callback(self, progress_str):
+        self._status_label.label_text = 'Refreshing: %s' % progress_str
 
-        
-        try:
-            self._flow_entries = DumpFlows.dump_flows(switch=self._switch_label.entry_text,
-                                                      table=self._table_label.entry_text,
-                                                      host=self._host_label.entry_text,
-                                                      user=self._user_gui.username,
-                                                      pw=self._user_gui.password,
-                                                      of_version=self._ofver_label.entry_text)
-        except Exception as e:
-            Popup('Caught an exception trying to dump flows:\n[%s]'%e)
+    # Called on the main thread with the FlowEntryDelta returned by the refresh when its done
+    def _refresh_done_callback(self, delta, error):
+        if error is not None:
+            self._status_label.label_text = ''
+            Popup('Caught an exception trying to dump flows:\n[%s]'%error)
             return
 
+        # The FlowEntries werent changed, keep displaying them
+        if self._dump_progress.cancelled:
+            self._status_label.label_text = 'Refresh cancelled: %s' % self._dump_progress
+            return
+
+        # If the command failed, display an empty list, as with DumpFlows.dump_flows()
+        if delta is None:
+            self._refresher.reset()
+            self._status_label.label_text = 'Refresh failed: %s' % self._dump_progress
+        else:
+            self._status_label.label_text = 'Refreshed: %s, %s' % (self._dump_progress, delta)
+        self._flow_entries = self._refresher.flow_entries
+        self._display_flow_entries()
+
+    # True while a refresh runs on its worker thread, the FlowEntries cant be displayed or traced until its done
+    def _is_refreshing(self):
+        return self._refresh_task is not None and self._refresh_task.running
+
+    # This function is called when the "cancel" button is pressed, it stops the dump of a running refresh
+    def _cancel_callback(self):
+        if self._is_refreshing():
+            self._dump_progress.cancel()
+            self._status_label.label_text = 'Cancelling...'
+
+    def _quit_callback(self):
+        self._cancel_callback()
+        self._root.quit()
+
+    def _display_flow_entries(self):
+        self._list.clear()
+        self._list_entry_indices.clear()
+        self._list_kinds_byEntry = {}
+
         flow_entry_formatter = FlowEntryFormatter()
         flow_entry_formatter.show_cookie        =  self._check_cookie.checked
         flow_entry_formatter.show_duration      =  self._check_duration.checked
         flow_entry_formatter.show_priority      =  self._check_priority.checked
         flow_entry_formatter.show_packets_bytes =  self._check_pkts.checked
+        self._list_formatter = flow_entry_formatter
 
         # First display the total number of entries
         self._list.append_list_entry('Total Flow entries: %d' % (len(self._flow_entries)), fg='red')
 
+        # The shadowed, redundant and undetermined FlowEntries are flagged with a prefix and a color
+        shadowing = FlowShadowing(self._flow_entries) if self._check_shadowed.checked else None
+
         for table in self._flow_entries.iter_tables():
             num_table_entries = self._flow_entries.num_table_entries(table)
+            table_str = 'Table[%d] %d entr%s' % (table, num_table_entries, 'y' if num_table_entries==1 else 'ies')
+            if shadowing is not None:
+                kinds_byEntry = dict((result.flow_entry, result.kind) for result in shadowing.analyze_table(table))
+                kinds = kinds_byEntry.values()
+                table_str += ', %d shadowed, %d redundant, %d undetermined' % (kinds.count(FlowShadowingResult.SHADOWED),
+                                                                             kinds.count(FlowShadowingResult.REDUNDANT),
+                                                                             kinds.count(FlowShadowingResult.UNDETERMINED))
+                self._list_kinds_byEntry.update(kinds_byEntry)
             self._list.append_list_entry('')
-            self._list.append_list_entry('Table[%d] %d entr%s' % (table, num_table_entries, 'y' if num_table_entries==1 else 'ies'), fg='red')
-            if self._radio_sort.radio_value == 'priority':
-                for (__, entry_list) in self._flow_entries.iter_table_priority_entries(table):
-                    for entry in entry_list:
-                        self._append_entry(flow_entry_formatter, entry)
-            else:
-                for entry in self._flow_entries.iter_table_entries(table):
-                    self._append_entry(flow_entry_formatter, entry)
+            self._list.append_list_entry(table_str, fg='red')
+            for entry in self._flow_entries.get_table_view(table,
+                                                            by_priority=(self._radio_sort.radio_value == 'priority'),
+                                                            matched_only=self._check_matched_only.checked):
+                self._append_entry(entry)
 
-    def _append_entry(self, formatter, entry):
-        if self._check_matched_only.checked and entry.n_packets_ == 0:
-            return
-
-        flow_str = formatter.print_flow_entry(entry)
+    #
+    # Append a FlowEntry row to the list, its only formatted here if there is a filter string,
+    # else when its displayed. The shadowed and redundant entries are colored.
+    #
+    def _append_entry(self, entry):
         if self._filter_label.entry_text:
-            if self._filter_label.entry_text not in flow_str:
+            if self._filter_label.entry_text not in self._format_entry(entry):
                 return
 
-        self._list_entry_indices[entry] = self._list.append_list_entry(flow_str)
+        kind = self._list_kinds_byEntry.get(entry)
+        self._list_entry_indices[entry] = self._list.append_list_entry(entry, fg=FlowDebuggerGui.SHADOWING_COLORS.get(kind))
+
+    # Return the text of a FlowEntry row, prefixed with its FlowShadowingResult kind if its flagged
+    def _format_entry(self, entry):
+        flow_str = self._list_formatter.print_flow_entry(entry)
+        kind = self._list_kinds_byEntry.get(entry)
+        if kind:
+            flow_str = '%s: %s' % (kind.upper(), flow_str)
+        return flow_str
+
+    # This function is called when the "flag shadowed" check is changed
+    def _redisplay_callback(self):
+        # The trace reads the FlowEntries that the display would analyze
+        if self._trace_gui.running:
+            Popup('Cant redisplay while tracing')
+            self._check_shadowed.checked = not self._check_shadowed.checked
+            return
+        # A running refresh displays the FlowEntries when its done
+        if self._flow_entries is not None and not self._is_refreshing():
+            self._display_flow_entries()
 
     def _trace_callback(self):
         if not self._flow_entries or not self._flow_entries:
             Popup('No FlowEntries to Trace')
             return
 
+        if self._is_refreshing():
+            Popup('Cant trace while refreshing')
+            return
+
         if self._filter_label.entry_text:
             Popup('Cant trace when a filter string is specified')
             return
@@ -174,12 +317,34 @@ class FlowDebuggerGui(object):
         self._trace_gui.display()
 
 
+    def _monitor_callback(self):
+        if not self._switch_label.entry_text:
+            Popup('Nothing to monitor\n\'Switch\' is empty')
+            return
+
+        if self._host_label.entry_text != 'localhost' and not self._user_pass_stored:
+            Popup('Refresh first, to login to %s' % self._host_label.entry_text)
+            return
+
+        self._monitor_gui.display(dict(of_version=self._ofver_label.entry_text,
+                                       switch=self._switch_label.entry_text,
+                                       host=self._host_label.entry_text,
+                                       table=self._table_label.entry_text,
+                                       user=self._user_gui.username,
+                                       pw=self._user_gui.password))
+
     # matched_flow_entries will be a dictionary of matched flow_entry to (next_table, drop, output, next_input_matches) 
-    # The tuple indicates the results: next_input_matches will be a list of FlowEntryMatch objects which will
+    # The tuple indicates the results: next_input_matches will be a PacketHeader of FlowEntryMatch objects which will
     # show which flow entries were matched and how the packet was changed by the corresponding actions
     def _trace_results_callback(self, matched_flow_entries):
-        # TODO need to iterate all entries and un-highlight them in case trace was called multiple times without haveing done a refresh 
+        # Un-highlight the entries of a previous trace
+        self._list.clear_highlights()
+        indices = []
         for (matched_flow_entry, __) in matched_flow_entries.iteritems():
             index = self._list_entry_indices.get(matched_flow_entry)
             if index is not None:
                 self._list.highlight_entry(index, bg='grey')
+                indices.append(index)
+        # Only the visible rows are in the list, scroll to the first matched entry
+        if indices:
+            self._list.see(min(indices))
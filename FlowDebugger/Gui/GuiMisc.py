@@ -7,6 +7,8 @@ Miscellaneous GUI classes used by the FlowDebuggerGui
 
 '''
 
+import threading
+from Queue import Queue, Empty
 from Tkinter import Button, Checkbutton, Entry, Frame, IntVar, Label, Listbox, OptionMenu, Radiobutton, Scrollbar, StringVar
 from Tkconstants import BOTH, BOTTOM, E, END, LEFT, NO, RIGHT, SUNKEN, TOP, W, X, Y, YES
 import tkMessageBox
@@ -196,6 +198,227 @@ class ScrolledList(object):
     def highlight_entry(self, entry_index, bg):
         self._list.itemconfig(index=entry_index, bg=bg)
 
+#
+# A scrolled list for many rows, like all the FlowEntries of a switch: only the visible rows,
+# plus MARGIN_ROWS above and below them, are inserted in the Tk Listbox, the other rows are
+# inserted when the list is scrolled to them. The rows are strings, or objects formatted by
+# row_formatter only when theyre displayed, so adding a row is just appending a reference.
+# The Listbox scrolls itself within its rows with the mouse wheel and the keys, and the rows
+# are replaced around the visible ones when it gets near the first or last one. The vertical
+# scrollbar is for all the rows.
+# It has the same methods as ScrolledList, the indices are the row indices in the whole list.
+#
+class VirtualList(object):
+    # The number of rows kept in the Listbox above and below the visible rows
+    MARGIN_ROWS = 100
+
+    # row_formatter returns the text of the rows that arent strings
+    def __init__(self, parent_frame, row_formatter=str):
+        self._row_formatter = row_formatter
+        self._rows = []           # list of the row strings, or the objects to format
+        self._fg_byIndex = {}     # dictionary {row index : foreground color}
+        self._bg_byIndex = {}     # dictionary {row index : background color}
+        self._top = 0             # the index of the first visible row
+        self._num_visible = 1     # the number of visible rows, updated when the Listbox scrolls
+        self._window = (0, 0)     # the (first, last + 1) indices of the rows in the Listbox
+        self._render_pending = False
+
+        self._vsbar = Scrollbar(parent_frame)
+        self._hsbar = Scrollbar(parent_frame, orient='horizontal')
+        self._list = Listbox(parent_frame, relief=SUNKEN, font=('courier', 12))
+
+        self._vsbar.config(command=self._on_scrollbar, relief=SUNKEN)
+        self._hsbar.config(command=self._list.xview, relief=SUNKEN)
+        self._list.config(yscrollcommand=self._on_list_yscroll, relief=SUNKEN)
+        self._list.config(xscrollcommand=self._hsbar.set)
+        self._list.bind('<Configure>', lambda event: self._schedule_render())
+
+        self._vsbar.pack(side=RIGHT, fill=Y)
+        self._hsbar.pack(side=BOTTOM, fill=X)
+        self._list.pack(side=LEFT, expand=YES, fill=BOTH)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def clear(self):
+        self._list.delete(0, END)
+        self._rows = []
+        self._fg_byIndex.clear()
+        self._bg_byIndex.clear()
+        self._top = 0
+        self._window = (0, 0)
+        self._schedule_render()
+
+    # row is a string, or an object formatted by row_formatter, return its index
+    def append_list_entry(self, row, fg=None):
+        index = len(self._rows)
+        self._rows.append(row)
+        if fg:
+            self._fg_byIndex[index] = fg
+        # The rows are inserted in the Listbox when Tk is idle, once for all the rows appended
+        self._schedule_render()
+        return index
+
+    def highlight_entry(self, entry_index, bg):
+        self._bg_byIndex[entry_index] = bg
+        (first, last) = self._window
+        if first <= entry_index < last:
+            self._list.itemconfig(index=entry_index - first, bg=bg)
+
+    def clear_highlights(self):
+        (first, last) = self._window
+        bg = self._list.cget('bg')
+        for index in self._bg_byIndex:
+            if first <= index < last:
+                self._list.itemconfig(index=index - first, bg=bg)
+        self._bg_byIndex.clear()
+
+    # Scroll the list so the row is visible, if its not
+    def see(self, entry_index):
+        if not self._top <= entry_index < self._top + self._num_visible:
+            self._scroll_to(entry_index - self._num_visible / 2)
+
+    def _get_row_text(self, index):
+        row = self._rows[index]
+        return row if isinstance(row, basestring) else self._row_formatter(row)
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self._list.after_idle(self._render)
+
+    #
+    # Internal method to replace the rows in the Listbox with the visible rows
+    # and the margins, and scroll the Listbox to the first visible row
+    #
+    def _render(self):
+        self._render_pending = False
+        num_rows = len(self._rows)
+        self._top = max(0, min(self._top, num_rows - self._num_visible))
+        first = max(0, self._top - VirtualList.MARGIN_ROWS)
+        last = min(num_rows, self._top + self._num_visible + VirtualList.MARGIN_ROWS)
+
+        self._list.delete(0, END)
+        if last > first:
+            self._list.insert(END, *[self._get_row_text(index) for index in xrange(first, last)])
+        for index in xrange(first, last):
+            fg = self._fg_byIndex.get(index)
+            bg = self._bg_byIndex.get(index)
+            if fg:
+                self._list.itemconfig(index - first, fg=fg)
+            if bg:
+                self._list.itemconfig(index - first, bg=bg)
+        self._window = (first, last)
+        self._list.yview(self._top - first)
+        self._set_scrollbar()
+
+    def _set_scrollbar(self):
+        num_rows = len(self._rows)
+        if num_rows:
+            self._vsbar.set(float(self._top) / num_rows, float(min(num_rows, self._top + self._num_visible)) / num_rows)
+        else:
+            self._vsbar.set(0.0, 1.0)
+
+    # Internal method to scroll to the top row, the rows are only replaced if its outside of the Listbox rows
+    def _scroll_to(self, top):
+        self._top = max(0, min(top, len(self._rows) - self._num_visible))
+        (first, last) = self._window
+        if first <= self._top and self._top + self._num_visible <= last:
+            self._list.yview(self._top - first)
+        else:
+            self._render()
+
+    # Called by the vertical scrollbar with: moveto fraction, or scroll N units or pages
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * len(self._rows)))
+        elif args[0] == 'scroll':
+            step = self._num_visible if args[2] == 'pages' else 1
+            self._scroll_to(self._top + int(args[1]) * step)
+
+    #
+    # Called by the Listbox when it scrolls, with the fractions of its rows that are visible,
+    # the rows are replaced when the visible rows get near the first or last Listbox row
+    #
+    def _on_list_yscroll(self, first_fraction, last_fraction):
+        (first, last) = self._window
+        num_window_rows = last - first
+        if not num_window_rows:
+            return
+        self._top = first + int(round(float(first_fraction) * num_window_rows))
+        self._num_visible = max(1, int(round((float(last_fraction) - float(first_fraction)) * num_window_rows)))
+        self._set_scrollbar()
+        if (first > 0 and self._top - first < VirtualList.MARGIN_ROWS / 2) or \
+           (last < len(self._rows) and last - (self._top + self._num_visible) < VirtualList.MARGIN_ROWS / 2):
+            self._schedule_render()
+
+#
+# Runs a function on a worker thread, so the Tk main loop keeps repainting the windows and
+# handling the buttons while it runs. Tk can only be called from the main thread, so the
+# worker hands its items and its result to the main thread through a Queue, which is polled
+# with after() every POLL_MS milliseconds.
+#   task_func     - called without arguments on the worker thread, it can call post() to
+#                   hand items, like progress counters, to item_callback
+#   item_callback - called on the main thread with each posted item, in order
+#   done_callback - called on the main thread as done_callback(result, error), after the
+#                   posted items, when task_func returns its result or raises error
+# Usage:
+#    task = BackgroundTask(root, long_func, item_callback=show_progress, done_callback=show_result)
+#    task.start()
+#
+class BackgroundTask(object):
+    POLL_MS = 100
+    _DONE = object()  # The Queue item before the (result, error) of task_func
+
+    def __init__(self, widget, task_func, item_callback=None, done_callback=None):
+        self._widget = widget
+        self._task_func = task_func
+        self._item_callback = item_callback
+        self._done_callback = done_callback
+        self._queue = Queue()
+        self._running = False
+
+    def start(self):
+        self._running = True
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+        self._widget.after(BackgroundTask.POLL_MS, self._poll)
+
+    # True until the done_callback has been called
+    def is_running(self):
+        return self._running
+    running = property(fget=is_running)
+
+    # Hand an item to the item_callback, this can be called from any thread
+    def post(self, item):
+        self._queue.put(item)
+
+    def _run(self):
+        try:
+            (result, error) = (self._task_func(), None)
+        except Exception as e:
+            (result, error) = (None, e)
+        self._queue.put(BackgroundTask._DONE)
+        self._queue.put((result, error))
+
+    # Called on the main thread by after(), until the task is done
+    def _poll(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                break
+            if item is BackgroundTask._DONE:
+                (result, error) = self._queue.get()
+                self._running = False
+                if self._done_callback:
+                    self._done_callback(result, error)
+                return
+            if self._item_callback:
+                self._item_callback(item)
+        self._widget.after(BackgroundTask.POLL_MS, self._poll)
+
 class Popup(object):
     def __init__(self, popup_text):
         tkMessageBox.showinfo("Info", popup_text)
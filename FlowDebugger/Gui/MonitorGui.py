@@ -0,0 +1,130 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+'''
+
+import time
+from collections import OrderedDict
+from Tkinter import Frame, Toplevel
+from Tkconstants import BOTH, BOTTOM, LEFT, RIGHT, TOP, W, X, YES
+from FlowDebugger.Flows.FlowEntries import FlowEntryFormatter
+from FlowDebugger.Flows.FlowMonitor import FlowMonitor, FlowRateMonitor
+from FlowDebugger.Gui.GuiMisc import BackgroundTask, Buttons, LabelBase, LabelEntry, Popup, Radios, ScrolledList
+
+#
+# Window that polls a switch and displays the hottest flows, meaning the flows
+# with the highest packet or byte rates, see Flows.FlowMonitor. Each poll dumps
+# the flows on a worker thread, and the next one is scheduled when its done.
+#
+class MonitorGui(object):
+
+    def __init__(self):
+        self._flow_monitor = None
+        self._dump_args = None
+        self._after_id = None
+
+        self._root = Toplevel()
+        self._root.title('FlowEntry Monitor')
+        self._root.minsize(width=900, height=400)
+        self._root.protocol('WM_DELETE_WINDOW', self._close_callback)
+
+        self._top_frame = Frame(self._root)
+        self._top_frame.pack(side=TOP, fill=X, padx=10, pady=10)
+
+        # The text labels
+        label_entry_frame = Frame(self._top_frame)
+        label_entry_frame.pack(side=LEFT, anchor=W, padx=5)
+        self._interval_label = LabelEntry(label_entry_frame, 'Interval (s)', '2')
+        self._top_label      = LabelEntry(label_entry_frame, 'Top flows',    '10')
+
+        by_frame = Frame(self._top_frame)
+        by_frame.pack(side=LEFT, anchor=W, padx=5)
+        LabelBase(by_frame, 'Rank flows', width=12)
+        self._radio_by = Radios(by_frame, FlowRateMonitor.BY_VALUES, text_prefix='by ', text_suffix='/sec')
+
+        # the buttons
+        button_frame = Frame(self._top_frame, padx=5)
+        button_frame.pack(side=RIGHT)
+        buttons_dict = OrderedDict([('start', self._start_callback), ('stop', self._stop_callback), ('close', self._close_callback)])
+        Buttons(button_frame, buttons_dict)
+
+        # The scrollable list
+        list_frame = Frame(self._root)
+        list_frame.pack(side=BOTTOM, expand=YES, fill=BOTH)
+        self._list = ScrolledList(list_frame)
+
+        # Hide this window until its needed
+        self._root.withdraw()
+
+    #
+    # Display the window, dump_args is a dictionary with the DumpFlows.dump_flows()
+    # of_version, switch, host, table, user and pw arguments
+    #
+    def display(self, dump_args):
+        if dump_args != self._dump_args:
+            self._stop_callback()
+            self._dump_args = dump_args
+            self._list.clear()
+            self._list.append_list_entry('Press start to monitor switch %s on %s' % (dump_args['switch'], dump_args['host']))
+        self._root.update()
+        self._root.deiconify()
+
+    def _start_callback(self):
+        try:
+            interval = float(self._interval_label.entry_text)
+            top_n = int(self._top_label.entry_text)
+        except ValueError:
+            Popup('The Interval and Top flows must be numbers')
+            return
+
+        self._stop_callback()
+        self._interval_ms = max(100, int(interval * 1000))
+        self._flow_monitor = FlowMonitor(top_n=top_n, by=self._radio_by.radio_value, **self._dump_args)
+        self._poll()
+
+    def _stop_callback(self):
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+        # A running poll cant be interrupted, its result is ignored, see _poll_done_callback()
+        self._flow_monitor = None
+
+    def _close_callback(self):
+        self._stop_callback()
+        self._root.withdraw()
+
+    def _poll(self):
+        self._after_id = None
+        flow_monitor = self._flow_monitor
+        task = BackgroundTask(self._root, flow_monitor.poll,
+                              done_callback=lambda delta, error: self._poll_done_callback(flow_monitor, delta, error))
+        task.start()
+
+    # Called on the main thread with the result of FlowMonitor.poll() when its done
+    def _poll_done_callback(self, flow_monitor, delta, error):
+        # The monitoring was stopped or restarted while it was running
+        if flow_monitor is not self._flow_monitor:
+            return
+        if error is not None:
+            Popup('Caught an exception trying to dump flows:\n[%s]' % error)
+            return
+
+        if delta is not None:
+            self._display_top_flows()
+        self._after_id = self._root.after(self._interval_ms, self._poll)
+
+    def _display_top_flows(self):
+        rate_monitor = self._flow_monitor.rate_monitor
+        flow_entry_formatter = FlowEntryFormatter()
+        flow_entry_formatter.show_priority = True
+
+        self._list.clear()
+        if rate_monitor.num_samples < 2:
+            self._list.append_list_entry('Monitoring %d Flow entries' % len(self._flow_monitor.flow_entries), fg='red')
+            return
+
+        self._list.append_list_entry('%s Top %d Flow entries by %s/sec' % (time.strftime('%H:%M:%S'), rate_monitor.top_n, self._radio_by.radio_value), fg='red')
+        for (entry, packets_per_sec, bytes_per_sec) in rate_monitor.get_top_flows():
+            self._list.append_list_entry('%12.1f pkts/s %14.1f bytes/s  Table[%d] %s' % (
+                packets_per_sec, bytes_per_sec, entry.table_, flow_entry_formatter.print_flow_entry(entry)))
@@ -7,15 +7,19 @@ Created on Nov 26, 2014
 from collections import OrderedDict
 from Tkinter import Frame, Toplevel
 from Tkconstants import BOTH, BOTTOM, LEFT, S, TOP, W, X, YES
-from FlowDebugger.Gui.GuiMisc import Buttons, LabelEntry, LabelOption, Popup, ScrolledList
+from FlowDebugger.Gui.GuiMisc import BackgroundTask, Buttons, LabelBase, LabelEntry, LabelOption, Popup, ScrolledList
 from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
 from FlowDebugger.Flows.FlowTracer import FlowTracer
 
 class TraceGui(object):
 
-    def __init__(self, trace_complete_callback=None):
+    # busy_callback returns True when the FlowEntries cant be traced, like while theyre being refreshed
+    def __init__(self, trace_complete_callback=None, busy_callback=None):
         self._trace_results_callback = trace_complete_callback
+        self._busy_callback = busy_callback
         self._flow_entries_container = None
+        # The trace runs on a worker thread, see _trace_callback()
+        self._trace_task = None
 
         self._root = Toplevel()
         self._root.title('FlowEntry Trace')
@@ -59,6 +63,8 @@ class TraceGui(object):
         self._radio_trace_display = Radios(check_frame, radio_vals)
         '''
 
+        self._status_label = LabelBase(self._top_frame, '', width=30)
+
         # the buttons
         button_frame = Frame(self._top_frame, pady=5)
         button_frame.pack(side=BOTTOM, anchor=S)
@@ -88,6 +94,13 @@ class TraceGui(object):
 
 
     def _trace_callback(self):
+        if self._busy_callback and self._busy_callback():
+            Popup('Cant trace while the FlowEntries are being refreshed')
+            return
+        if self.running:
+            Popup('A trace is already running')
+            return
+
         #
         # Get the input specified in the Trace input window
         input_match_obj_list = []
@@ -98,10 +111,19 @@ class TraceGui(object):
                 input_match_obj_list.append(match_object)
 
         #
-        # Do the tracing
+        # Do the tracing on a worker thread, so the windows keep repainting
         flow_tracer = FlowTracer(self._flow_entries_container, input_match_obj_list)
-        # returns a dictionary of MatchedFlowEntry to (next_table, drop, output, next_input_matches)
-        matched_flow_entries = flow_tracer.trace()
+        # trace() returns a dictionary of MatchedFlowEntry to (next_table, drop, output, next_input_matches)
+        self._trace_task = BackgroundTask(self._root, flow_tracer.trace, done_callback=self._trace_done_callback)
+        self._status_label.label_text = 'Tracing...'
+        self._trace_task.start()
+
+    # Called on the main thread with the results of FlowTracer.trace() when its done
+    def _trace_done_callback(self, matched_flow_entries, error):
+        self._status_label.label_text = ''
+        if error is not None:
+            Popup('Caught an exception trying to trace:\n[%s]' % error)
+            return
 
         #
         # Open the self._trace_result window to display the results
@@ -128,6 +150,10 @@ class TraceGui(object):
                 else:              next_action = 'Goto Table %s' % results[0]
             self._trace_results_list.append_list_entry('        Resulting Action: [%s]' % next_action);
 
+        # The table lookups are cached by the container, for all the traces until the next refresh
+        self._trace_results_list.append_list_entry('')
+        self._trace_results_list.append_list_entry('Lookup cache: %s' % self._flow_entries_container.get_lookup_cache())
+
         # Now display the window
         self._trace_result.update()
         self._trace_result.deiconify()
@@ -152,6 +178,11 @@ class TraceGui(object):
         else:
             self._root.withdraw()
 
+    # True while a trace runs on its worker thread
+    def is_running(self):
+        return self._trace_task is not None and self._trace_task.running
+    running = property(fget=is_running)
+
     def set_flow_entries_container(self, fe_container):
         self._flow_entries_container = fe_container
 
@@ -0,0 +1,72 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Micro-benchmark of FlowEntryMatches.match() throughput, comparing the precompiled
+field tables (see FlowEntryFields.py) with the previous inspect based implementation.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_match [num_calls]
+'''
+
+import inspect
+import sys
+import timeit
+
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+
+#
+# The FlowEntryMatches.match() implementation before the field tables were added,
+# the __slots__ member descriptors are skipped since they arent properties
+#
+def _inspect_match(match_lhs, match_rhs):
+    if type(match_lhs) != type(match_rhs):
+        return False
+
+    attributes = inspect.getmembers(type(match_lhs), lambda a : not(inspect.isroutine(a)) and inspect.isdatadescriptor(a))
+    for attr in attributes:
+        if not(attr[0].startswith('__') and attr[0].endswith('__')) and getattr(attr[1], 'fget', None):
+            if not hasattr(match_rhs, attr[0]):
+                return False
+            if attr[1].fget(match_lhs) != attr[1].fget(match_rhs):
+                return False
+    return True
+
+def _match_pairs():
+    # (key, lhs value, rhs value) for each of the FlowEntryMatch* classes, half of them matching
+    match_values = [('in_port', '2', '2'), ('in_port', '2', '3'),
+                    ('dl_src', '00:11:22:33:44:55', '00:11:22:33:44:55'), ('dl_type', 'IP', 'ARP'),
+                    ('nw_src', '10.0.0.1', '10.0.0.1'), ('nw_proto', 'TCP', 'UDP'),
+                    ('tp_src', '8080', '8080'), ('tp_dst', '80', '443')]
+    return [(FlowEntryFactory.get_match_object(key, lhs), FlowEntryFactory.get_match_object(key, rhs))
+            for (key, lhs, rhs) in match_values]
+
+def main():
+    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    pairs = _match_pairs()
+    num_loops = max(1, num_calls / len(pairs))
+
+    def run_inspect():
+        for (lhs, rhs) in pairs:
+            _inspect_match(lhs, rhs)
+
+    def run_field_table():
+        for (lhs, rhs) in pairs:
+            lhs.match(rhs)
+
+    # Both implementations must agree
+    for (lhs, rhs) in pairs:
+        assert _inspect_match(lhs, rhs) == lhs.match(rhs)
+
+    results = []
+    for (name, func) in [('inspect (before)', run_inspect), ('field table (after)', run_field_table)]:
+        seconds = min(timeit.repeat(func, number=num_loops, repeat=3))
+        calls_per_sec = num_loops * len(pairs) / seconds
+        results.append(calls_per_sec)
+        print '%-20s %10d match() calls in %.3fs: %12.0f calls/sec' % (name, num_loops * len(pairs), seconds, calls_per_sec)
+
+    print 'Speedup: %.1fx' % (results[1] / results[0])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Measure the memory used per parsed FlowEntry, including its match and
+action strings and objects, on a synthetic dump.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_memory [num_flows]
+'''
+
+import gc
+import sys
+
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from bench.flow_generator import generate_flow_lines
+
+#
+# Return the size in bytes of all the objects reachable from obj_list, counting
+# each object once. Classes, functions and modules arent counted.
+#
+def deep_sizeof(obj_list):
+    seen = set()
+    total = 0
+    pending = list(obj_list)
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, type) or callable(obj) or type(obj).__name__ == 'module':
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
+
+def main():
+    num_flows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    flow_entries = [FlowEntryFactory.parse_entry(line) for line in generate_flow_lines(num_flows)]
+    total = deep_sizeof(flow_entries)
+    print '%d FlowEntries: %d bytes, %d bytes per flow' % (num_flows, total, total / num_flows)
+
+if __name__ == '__main__':
+    main()
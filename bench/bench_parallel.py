@@ -0,0 +1,64 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Benchmark of the multi-process parsing of very large dumps, see Flows.FlowEntryParallel.
+Compares the serial parse with the parallel parse, and measures the part of the parallel
+parse that stays in the main process: unpickling the compact chunks and creating the
+FlowEntry objects. That part limits the speedup, however many cores there are.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_parallel [num_lines] [processes]
+'''
+
+import sys
+import time
+
+import FlowDebugger.Flows.DumpFlows as DumpFlows
+import FlowDebugger.Flows.FlowEntryParallel as FlowEntryParallel
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from bench.flow_generator import generate_flow_lines
+
+# The dump-flows lines, with the return_code set by DumpFlows
+class _Lines(list):
+    return_code = 0
+
+def _time_fill(lines, processes):
+    FlowEntryFactory.clear_caches()
+    flow_entries = FlowEntryContainer()
+    start = time.time()
+    DumpFlows._fill_flow_entries(lines, flow_entries, processes=processes)
+    return (time.time() - start, flow_entries)
+
+def main():
+    num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    lines = _Lines(generate_flow_lines(num_lines))
+
+    (serial_seconds, serial_entries) = _time_fill(lines, 1)
+    print '%-28s %8d lines in %6.2fs: %10.0f lines/sec' % ('serial', len(lines), serial_seconds, len(lines) / serial_seconds)
+
+    (parallel_seconds, parallel_entries) = _time_fill(lines, processes)
+    print '%-28s %8d lines in %6.2fs: %10.0f lines/sec' % ('parallel, %d processes' % processes, len(lines), parallel_seconds, len(lines) / parallel_seconds)
+    assert [(fe.table_, fe.priority_, fe.n_bytes_, fe.match_str_list_, fe.action_str_list_) for fe in serial_entries.flow_entries] == \
+           [(fe.table_, fe.priority_, fe.n_bytes_, fe.match_str_list_, fe.action_str_list_) for fe in parallel_entries.flow_entries]
+
+    # The main process part of the parallel parse, the worker processes return the chunks pickled
+    FlowEntryFactory.clear_caches()
+    pickled_chunks = [FlowEntryParallel._parse_chunk(chunk) for chunk in DumpFlows._iter_chunks(iter(lines), DumpFlows.PARALLEL_CHUNK_LINES)]
+    FlowEntryFactory.clear_caches()
+    flow_entries = FlowEntryContainer()
+    start = time.time()
+    for pickled_chunk in pickled_chunks:
+        for flow_entry in FlowEntryParallel._get_chunk_entries(pickled_chunk):
+            flow_entries.add_flow_entry(flow_entry)
+    merge_seconds = time.time() - start
+    print '%-28s %8d lines in %6.2fs, %.1f%% of the serial parse, %.1f MB pickled' % (
+        'main process share', len(lines), merge_seconds, merge_seconds * 100 / serial_seconds,
+        sum(len(pickled_chunk) for pickled_chunk in pickled_chunks) / 1e6)
+    print 'Maximum speedup: %.1fx' % (serial_seconds / merge_seconds)
+
+if __name__ == '__main__':
+    main()
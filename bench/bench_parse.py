@@ -0,0 +1,86 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Benchmark of FlowEntryFactory.parse_entry_header() throughput, comparing the single-pass
+key/value tokenizer with the previous positional split parser, and the tokenizer on
+lines with the header fields and actions that the positional parser cant handle.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_parse [num_lines]
+'''
+
+import sys
+import time
+
+from FlowDebugger.Flows.FlowEntries import FlowEntry
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from bench.flow_generator import generate_flow_lines
+
+def _legacy_parse_item(item_key, item_str):
+    value = item_str
+    if len(item_key) > 0:
+        value = item_str.partition(item_key)[2]
+
+    return value.rstrip(',')
+
+#
+# The FlowEntryFactory.parse_entry_header() implementation before the tokenizer was added,
+# it expects the fields in a fixed position, and fails with idle_age and the like
+#
+def _legacy_parse_entry_header(line):
+    str_list = line.split(' ')
+
+    flow_entry = FlowEntry()
+    flow_entry.cookie_    =  _legacy_parse_item(FlowEntryFactory.COOKIE_STR,        str_list[0])
+    flow_entry.duration_  =  _legacy_parse_item(FlowEntryFactory.DURATION_STR,      str_list[1])
+    flow_entry.table_     =  int(_legacy_parse_item(FlowEntryFactory.TABLE_STR,     str_list[2]))
+    flow_entry.n_packets_ =  int(_legacy_parse_item(FlowEntryFactory.NPACKETS_STR,  str_list[3]))
+    flow_entry.n_bytes_   =  int(_legacy_parse_item(FlowEntryFactory.NBYTES_STR,    str_list[4]))
+
+    next_index = 5
+    if len(str_list) == 8:
+        flow_entry.send_flow_rem_ = True
+        next_index = 6
+
+    match_str_list  =  _legacy_parse_item('', str_list[next_index]).split(',')
+    action_str_list =  _legacy_parse_item(FlowEntryFactory.ACTIONS_STR, str_list[next_index+1]).split(',')
+    if match_str_list[0].startswith('priority='):
+        flow_entry.priority_  =  int(match_str_list[0].split('=')[1])
+        match_str_list.pop(0)
+
+    flow_entry.match_str_list_  =  tuple(match_str_list)
+    flow_entry.action_str_list_ =  tuple(action_str_list)
+
+    return flow_entry
+
+def _time_parse(name, parse_func, lines):
+    start = time.time()
+    for line in lines:
+        parse_func(line)
+    seconds = time.time() - start
+    print '%-32s %8d lines in %6.2fs: %10.0f lines/sec' % (name, len(lines), seconds, len(lines) / seconds)
+    return seconds
+
+def main():
+    num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lines = list(generate_flow_lines(num_lines))
+
+    # Both implementations must agree on the lines without the newer header fields
+    for line in lines[:1000]:
+        (legacy, header) = (_legacy_parse_entry_header(line), FlowEntryFactory.parse_entry_header(line))
+        assert (legacy.table_, legacy.priority_, legacy.n_bytes_, legacy.match_str_list_, legacy.action_str_list_) == \
+               (header.table_, header.priority_, header.n_bytes_, header.match_str_list_, header.action_str_list_)
+
+    legacy_seconds = _time_parse('positional header (before)', _legacy_parse_entry_header, lines)
+    header_seconds = _time_parse('tokenizer header (after)', FlowEntryFactory.parse_entry_header, lines)
+    print 'Speedup: %.2fx' % (legacy_seconds / header_seconds)
+
+    lines = list(generate_flow_lines(num_lines, modern=True))
+    _time_parse('tokenizer header, newer fields', FlowEntryFactory.parse_entry_header, lines)
+    FlowEntryFactory.clear_caches()
+    _time_parse('tokenizer entry, newer fields', FlowEntryFactory.parse_entry, lines)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Benchmark of the prefix tries on a routing-style table, see Flows.FlowPrefixTrie.
+Compares the classifier projection of packets when it walks the nw_dst trie with when
+it masks the packet address with each prefix length of the table, and measures the
+lookups and the "which flows cover this prefix" queries.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_prefix [num_routes] [num_packets]
+'''
+
+import random
+import sys
+import time
+
+from FlowDebugger.Flows.FlowClassifier import FlowTableClassifier
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from bench.flow_generator import generate_route_lines
+
+def _time(name, num_ops, func):
+    start = time.time()
+    result = func()
+    elapsed = time.time() - start
+    print '%-28s %8.4fs %12.0f ops/sec' % (name, elapsed, num_ops / max(elapsed, 1e-9))
+    return result
+
+def main():
+    num_routes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    num_packets = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    # All the prefix lengths from /8 to /32, so the nw_dst trie is used
+    flow_entries = [FlowEntryFactory.parse_entry(line) for line in generate_route_lines(num_routes, prefix_lens=range(8, 33))]
+    classifier = _time('build classifier', num_routes, lambda: FlowTableClassifier(flow_entries))
+    trie = classifier.get_prefix_trie('nw_dst')
+    print '%d routes, %d prefixes, %d prefix lengths, %d groups' % (num_routes, len(trie), len(trie.prefix_lens), len(classifier))
+
+    min_lens = FlowTableClassifier.PREFIX_TRIE_MIN_LENS
+    FlowTableClassifier.PREFIX_TRIE_MIN_LENS = sys.maxint
+    masks_classifier = FlowTableClassifier(flow_entries)
+    FlowTableClassifier.PREFIX_TRIE_MIN_LENS = min_lens
+
+    rand = random.Random(0)
+    packets = [{'dl_type' : 0x0800, 'nw_dst' : 10 << 24 | rand.randint(0, 0xffffff)} for __ in xrange(num_packets)]
+    masks_projections = _time('projection, all masks', num_packets,
+                              lambda: [masks_classifier.get_projection(packet) for packet in packets])
+    trie_projections = _time('projection, trie', num_packets,
+                             lambda: [classifier.get_projection(packet) for packet in packets])
+    print 'same projections: %s' % (masks_projections == trie_projections)
+
+    _time('lookup', num_packets,
+          lambda: [classifier.lookup_projection(classifier.get_projection(packet)) for packet in packets])
+    queries = ['10.%d.%d.0/24' % ((packet['nw_dst'] >> 16) & 0xff, (packet['nw_dst'] >> 8) & 0xff) for packet in packets]
+    _time('covering /24 queries', num_packets,
+          lambda: [classifier.get_covering_entries('nw_dst', query) for query in queries])
+
+if __name__ == '__main__':
+    main()
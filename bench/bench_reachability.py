@@ -0,0 +1,67 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Benchmark of the header space reachability analysis, see Flows.FlowReachability.
+Analyzes where all the packets, and the packets of each of a few input ports, go
+through a generated multi-table pipeline, and compares it with tracing one packet.
+Then analyzes a routing-style table of num_flows prefixes, where all the flows
+intersect all the packets.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_reachability [num_flows] [num_tables]
+'''
+
+import sys
+import time
+
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from FlowDebugger.Flows.FlowReachability import FlowReachability
+from FlowDebugger.Flows.FlowTracer import FlowTracer
+from FlowDebugger.Flows.HeaderSpace import HeaderSpace
+from bench.flow_generator import generate_flow_lines, generate_route_lines
+
+def _time(name, func):
+    start = time.time()
+    result = func()
+    print '%-28s %8.4fs' % (name, time.time() - start)
+    return result
+
+def _print_results(results):
+    num_terms = sum(len(result.header_space) for result in results)
+    num_subtracted = sum(len(subtracted) for result in results for (__, subtracted) in result.header_space.get_terms())
+    print '    %d outcomes, %d terms, %d subtracted cubes' % (len(results), num_terms, num_subtracted)
+
+def _parse_flows(lines):
+    flow_entries = FlowEntryContainer()
+    for line in lines:
+        flow_entries.add_flow_entry(FlowEntryFactory.parse_entry(line))
+    return flow_entries
+
+def main():
+    num_flows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    num_tables = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    flow_entries = _parse_flows(generate_flow_lines(num_flows, num_tables=num_tables, num_values=64))
+    print '%d flows in %d tables' % (len(flow_entries), num_tables)
+
+    # The tables are indexed the first time theyre analyzed
+    reachability = FlowReachability(flow_entries)
+    _print_results(_time('analyze all packets', lambda: reachability.analyze(HeaderSpace.all_packets())))
+    _print_results(_time('analyze all packets again', lambda: reachability.analyze(HeaderSpace.all_packets())))
+    for in_port in (1, 2, 3):
+        space = HeaderSpace.from_match_objects(FlowEntryFactory.parse_match_list('in_port=%d' % in_port))
+        _print_results(_time('analyze in_port=%d' % in_port, lambda: reachability.analyze(space)))
+
+    match_object_list = FlowEntryFactory.parse_match_list('in_port=1,tcp,tp_dst=80')
+    _time('trace one packet', lambda: FlowTracer(flow_entries, match_object_list).trace())
+
+    route_entries = _parse_flows(generate_route_lines(num_flows))
+    print '%d routes' % len(route_entries)
+    _print_results(_time('analyze all packets', lambda: FlowReachability(route_entries).analyze(HeaderSpace.all_packets())))
+    space = HeaderSpace.from_match_objects(FlowEntryFactory.parse_match_list('ip,nw_dst=10.0.0.0/9'))
+    _print_results(_time('analyze nw_dst=10.0.0.0/9', lambda: FlowReachability(route_entries).analyze(space)))
+
+if __name__ == '__main__':
+    main()
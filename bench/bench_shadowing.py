@@ -0,0 +1,73 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Benchmark of the shadowed and redundant flow entry detection, see Flows.FlowShadowing,
+on a generated multi-table pipeline and on a routing-style table. Then checks that
+the analysis of a single table scales about linearly: it fails if doubling the number
+of flows more than about doubles the time.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_shadowing [num_flows]
+'''
+
+import sys
+import time
+
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from FlowDebugger.Flows.FlowShadowing import FlowShadowing, FlowShadowingResult
+from bench.flow_generator import generate_flow_lines, generate_route_lines
+
+# Doubling the number of flows should about double the analysis time, the scaling check fails above this ratio
+MAX_DOUBLING_RATIO = 2.5
+# The number of runs of each size in the scaling check, the best is kept
+SCALING_REPEAT = 3
+
+def _parse_flows(lines):
+    flow_entries = FlowEntryContainer()
+    for line in lines:
+        flow_entries.add_flow_entry(FlowEntryFactory.parse_entry(line))
+    return flow_entries
+
+def _analyze(name, lines):
+    flow_entries = _parse_flows(lines)
+    start = time.time()
+    results_byTable = FlowShadowing(flow_entries).analyze()
+    elapsed = time.time() - start
+    results = [result for table_results in results_byTable.itervalues() for result in table_results]
+    num_kinds = dict((kind, len([result for result in results if result.kind == kind]))
+                     for kind in (FlowShadowingResult.SHADOWED, FlowShadowingResult.REDUNDANT, FlowShadowingResult.UNDETERMINED))
+    print '%-28s %8.4fs %6d flows, %6d shadowed, %6d redundant, %6d undetermined' % (
+            name, elapsed, len(flow_entries), num_kinds[FlowShadowingResult.SHADOWED],
+            num_kinds[FlowShadowingResult.REDUNDANT], num_kinds[FlowShadowingResult.UNDETERMINED])
+
+#
+# Time the analysis of a single table of num_flows / 2 and num_flows flows, and fail if
+# doubling the number of flows more than about doubles the time, see MAX_DOUBLING_RATIO
+#
+def _check_scaling(num_flows):
+    seconds = []
+    for size in (num_flows / 2, num_flows):
+        flow_entries = _parse_flows(generate_flow_lines(size, num_tables=1))
+        best = None
+        for __ in xrange(SCALING_REPEAT):
+            start = time.time()
+            FlowShadowing(flow_entries).analyze()
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        seconds.append(best)
+    ratio = seconds[1] / max(seconds[0], 1e-9)
+    print '%-28s %8.4fs %6d flows, %8.4fs %6d flows: %.2fx' % ('single table scaling', seconds[0], num_flows / 2, seconds[1], num_flows, ratio)
+    assert ratio <= MAX_DOUBLING_RATIO, 'Doubling the flows multiplied the time by %.2f, more than %.2f' % (ratio, MAX_DOUBLING_RATIO)
+
+def main():
+    num_flows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    _analyze('pipeline, 4 tables', generate_flow_lines(num_flows, num_tables=4, num_values=64))
+    _analyze('single table', generate_flow_lines(num_flows, num_tables=1))
+    _analyze('routes', generate_route_lines(num_flows))
+    _check_scaling(num_flows)
+
+if __name__ == '__main__':
+    main()
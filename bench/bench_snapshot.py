@@ -0,0 +1,59 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Benchmark of the binary flow snapshots, see Flows.FlowSnapshot. Compares parsing the
+dump-flows text with opening a snapshot of the same flows, and measures the lazy decoding.
+
+Usage, from the top level directory:
+    $ python -m bench.bench_snapshot [num_flows] [snapshot file]
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+import FlowDebugger.Flows.DumpFlows as DumpFlows
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from FlowDebugger.Flows.FlowSnapshot import FlowSnapshot
+from bench.flow_generator import generate_flow_lines
+
+def _time(name, func):
+    start = time.time()
+    result = func()
+    print '%-28s %8.4fs' % (name, time.time() - start)
+    return result
+
+def main():
+    num_flows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    file_name = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), 'bench_snapshot.fsnap')
+    lines = list(generate_flow_lines(num_flows))
+    text_size = sum(len(line) + 1 for line in lines)
+
+    def parse():
+        flow_entries = FlowEntryContainer()
+        for flow_entry in DumpFlows.iter_flow_entries(lines):
+            flow_entries.add_flow_entry(flow_entry)
+        return flow_entries
+    flow_entries = _time('parse text', parse)
+
+    _time('save snapshot', lambda: FlowSnapshot.save(flow_entries, file_name))
+    flow_entries.reset()
+    print 'text %.1f MB, snapshot %.1f MB, %.1f bytes/flow' % (
+        text_size / 1e6, os.path.getsize(file_name) / 1e6, os.path.getsize(file_name) / float(num_flows))
+
+    FlowEntryFactory.clear_caches()
+    snapshot = _time('open snapshot', lambda: FlowSnapshot.load(file_name))
+    _time('table totals', snapshot.get_table_totals)
+    _time('top 10 entries', lambda: snapshot.get_top_entries(10))
+    table = next(snapshot.iter_tables())
+    _time('decode table %d (%d flows)' % (table, snapshot.num_table_entries(table)), lambda: snapshot.get_table_view(table))
+    _time('decode all', lambda: snapshot.flow_entries)
+    snapshot.close()
+    os.remove(file_name)
+
+if __name__ == '__main__':
+    main()
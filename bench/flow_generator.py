@@ -0,0 +1,159 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Synthetic "ovs-ofctl dump-flows" output generator, used by the benchmarks
+'''
+
+import random
+
+#
+# The probability of each match field and action in a flow entry, the defaults of the
+# generate_flow_lines() match_mix and action_mix arguments. The ip probability is for
+# one of ip, tcp or udp, and the nw_src, nw_dst and tp_dst probabilities are when its set.
+# The output probability is for the flows that dont go to the next table, else drop.
+#
+MATCH_MIX = {'in_port' : 0.5, 'dl_src' : 0.3, 'ip' : 0.7, 'nw_src' : 0.6, 'nw_dst' : 0.4, 'tp_dst' : 0.5, 'metadata' : 0.2}
+ACTION_MIX = {'mod_dl_src' : 0.2, 'set_field' : 0.1, 'write_metadata' : 0.2, 'goto_table' : 0.6, 'output' : 0.9}
+
+#
+# The MAC and IP addresses are random, or if num_values isnt 0, taken from num_values
+# addresses, as in a real dump where the same hosts appear in many flows
+#
+def _mac(rand, num_values=0):
+    if num_values:
+        value = rand.randint(0, num_values - 1)
+        return '00:00:%02x:%02x:%02x:%02x' % ((value >> 24) & 0xff, (value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff)
+    return ':'.join('%02x' % rand.randint(0, 255) for __ in range(6))
+
+def _ip(rand, num_values=0):
+    if num_values:
+        value = rand.randint(0, num_values - 1)
+        return '10.%d.%d.%d' % ((value >> 16) & 0xff, (value >> 8) & 0xff, (value & 0xff) or 1)
+    return '10.%d.%d.%d' % (rand.randint(0, 255), rand.randint(0, 255), rand.randint(1, 254))
+
+#
+# Return a list of match strings for one flow entry
+#
+def _flow_matches(rand, match_mix=MATCH_MIX, num_values=0):
+    matches = []
+    if rand.random() < match_mix.get('in_port', 0):
+        matches.append('in_port=%d' % rand.randint(1, 48))
+    if rand.random() < match_mix.get('dl_src', 0):
+        matches.append('dl_src=%s' % _mac(rand, num_values))
+    if rand.random() < match_mix.get('ip', 0):
+        matches.append(rand.choice(['ip', 'tcp', 'udp']))
+        if rand.random() < match_mix.get('nw_src', 0):
+            matches.append('nw_src=%s' % _ip(rand, num_values))
+        if rand.random() < match_mix.get('nw_dst', 0):
+            matches.append('nw_dst=%s' % _ip(rand, num_values))
+        if matches[-1] != 'ip' and rand.random() < match_mix.get('tp_dst', 0):
+            matches.append('tp_dst=%d' % rand.randint(1, 65535))
+    if rand.random() < match_mix.get('metadata', 0):
+        matches.append('metadata=0x%x/0xfff' % rand.randint(0, 0xfff))
+    return matches
+
+#
+# Return a list of action strings for one flow entry in the specified table
+#
+def _flow_actions(rand, table, num_tables, modern=False, action_mix=ACTION_MIX, num_values=0):
+    actions = []
+    if modern and rand.random() < 0.2:
+        actions.append('ct(commit,zone=%d,exec(set_field:%d->ct_mark))' % (rand.randint(1, 16), rand.randint(1, 255)))
+    if rand.random() < action_mix.get('mod_dl_src', 0):
+        actions.append('mod_dl_src:%s' % _mac(rand, num_values))
+    if rand.random() < action_mix.get('set_field', 0):
+        actions.append('set_field:%d->tcp_src' % rand.randint(1, 65535))
+    if rand.random() < action_mix.get('write_metadata', 0):
+        actions.append('write_metadata:0x%x/0xfff' % rand.randint(0, 0xfff))
+    if modern and table + 1 < num_tables and rand.random() < 0.3:
+        actions.append('resubmit(,%d)' % (table + 1))
+    elif table + 1 < num_tables and rand.random() < action_mix.get('goto_table', 0):
+        actions.append('goto_table:%d' % (table + 1))
+    elif modern and rand.random() < 0.1:
+        actions.append(rand.choice(['NORMAL', 'CONTROLLER:65535', 'controller(reason=no_match,max_len=128)']))
+    elif rand.random() < action_mix.get('output', 0):
+        actions.append('output:%d' % rand.randint(1, 48))
+    else:
+        actions.append('drop')
+    return actions
+
+#
+# Return the optional flags and header fields, output by newer versions of
+# ovs-ofctl between the counters and the match. As in ovs-ofctl, the flags
+# come first and are followed by a space instead of ", "
+#
+def _flow_header_fields(rand):
+    fields = ''
+    if rand.random() < 0.05:
+        fields += 'send_flow_rem '
+    if rand.random() < 0.3:
+        fields += 'idle_timeout=%d, ' % rand.choice([10, 60, 300])
+    if rand.random() < 0.1:
+        fields += 'hard_timeout=%d, ' % rand.choice([60, 3600])
+    if rand.random() < 0.05:
+        fields += 'importance=%d, ' % rand.randint(1, 10)
+    fields += 'idle_age=%d, ' % rand.randint(0, 3600)
+    return fields
+
+#
+# Generator that yields num_flows "ovs-ofctl dump-flows" output lines,
+# spread over num_tables tables. The same arguments always yield the same lines.
+#   modern         - if True, the lines also have the idle_age and timeout header fields,
+#                    and actions with parenthesis like resubmit(,N) and ct(...)
+#   num_priorities - if not 0, the priorities are spread over this many values per table,
+#                    else theyre random, so there are few flows per priority
+#   num_values     - if not 0, the MAC and IP addresses are taken from this many values,
+#                    so the same match strings are repeated, else theyre mostly unique
+#   match_mix      - a dictionary with the probability of each match field, see MATCH_MIX
+#   action_mix     - a dictionary with the probability of each action, see ACTION_MIX
+#   catch_alls     - if True, the first flow of each table without any match fields is kept
+#                    as its table-miss flow, with priority 0. The flows without any match
+#                    fields would otherwise be random priority catch-alls, which hide all the
+#                    lower priority flows of their table, so they get an in_port match instead.
+#
+def generate_flow_lines(num_flows, num_tables=10, seed=0, modern=False, num_priorities=0, num_values=0, match_mix=None, action_mix=None,
+                        catch_alls=False):
+    rand = random.Random(seed)
+    match_mix = MATCH_MIX if match_mix is None else match_mix
+    action_mix = ACTION_MIX if action_mix is None else action_mix
+    priority_step = 65536 / num_priorities if num_priorities else 0
+    catch_all_tables = set()
+    for __ in xrange(num_flows):
+        table = rand.randint(0, num_tables - 1)
+        n_packets = rand.choice([0, 0, rand.randint(1, 1000000)])
+        header = 'cookie=0x%x, duration=%.3fs, table=%d, n_packets=%d, n_bytes=%d, %s' % (
+                rand.randint(0, 0xffff), rand.uniform(0, 100000), table, n_packets, n_packets * rand.randint(60, 1500),
+                _flow_header_fields(rand) if modern else '')
+        priority = rand.randint(0, num_priorities - 1) * priority_step if num_priorities else rand.randint(0, 65535)
+        matches = _flow_matches(rand, match_mix, num_values)
+        if not matches:
+            if catch_alls and table not in catch_all_tables:
+                catch_all_tables.add(table)
+                priority = 0
+            else:
+                matches = ['in_port=%d' % rand.randint(1, 48)]
+        yield '%spriority=%d%s actions=%s' % (header, priority, ''.join(',' + m for m in matches),
+                ','.join(_flow_actions(rand, table, num_tables, modern, action_mix, num_values)))
+
+#
+# Generator that yields num_routes routing-style "ovs-ofctl dump-flows" output lines in
+# table 0: ip,nw_dst=10.x.y.z/len flows with distinct prefixes, the prefix length is taken
+# from prefix_lens, and the priority is the prefix length, as an OpenFlow router would
+# program them. There must be enough prefixes of those lengths in 10.0.0.0/8.
+# The same arguments always yield the same lines.
+#
+def generate_route_lines(num_routes, prefix_lens=(8, 16, 20, 22, 24, 24, 24, 24, 28, 32), seed=0):
+    rand = random.Random(seed)
+    prefixes = set()
+    while len(prefixes) < num_routes:
+        prefix_len = rand.choice(prefix_lens)
+        address = (10 << 24 | rand.randint(0, 0xffffff)) & ((0xffffffff << (32 - prefix_len)) & 0xffffffff)
+        if (address, prefix_len) in prefixes:
+            continue
+        prefixes.add((address, prefix_len))
+        yield 'cookie=0x0, duration=%.3fs, table=0, n_packets=0, n_bytes=0, priority=%d,ip,nw_dst=%d.%d.%d.%d/%d actions=output:%d' % (
+                rand.uniform(0, 100000), prefix_len,
+                address >> 24, (address >> 16) & 0xff, (address >> 8) & 0xff, address & 0xff, prefix_len,
+                rand.randint(1, 48))
@@ -0,0 +1,182 @@
+'''
+Created on Oct 18, 2026
+
+@author: Brady Johnson
+
+Repeatable benchmark suite of the main flow operations, on flows from bench.flow_generator:
+    parse_entry  - FlowEntryFactory.parse_entry() of each dump-flows line
+    build        - adding the parsed FlowEntry objects to a FlowEntryContainer
+    iterate      - iterating the container by table and priority
+    print        - FlowEntryFormatter.print_flow_entry() of each entry
+    trace        - FlowTracer.trace() of packets built from the table 0 flow matches
+    trace_batch  - FlowTracer.trace_batch() of the same packets
+    trace_warm   - FlowTracer.trace() of the same packets, with the lookup cache already
+                   filled by a previous run, the other traces start with an empty one
+Each benchmark is run --repeat times and the best time is kept. The throughput is printed,
+and compared with the baseline file if it was saved with the same flow options. A baseline
+is only meaningful on the machine it was saved on, so none is included, save one first.
+
+Usage, from the top level directory:
+    $ python -m bench.run_benchmarks --flows 100000 --tables 10
+    $ python -m bench.run_benchmarks --save-baseline /tmp/baseline.json
+    $ python -m bench.run_benchmarks --baseline /tmp/baseline.json
+'''
+
+import json
+import optparse
+import random
+import sys
+import time
+
+from FlowDebugger.Flows.FlowEntries import FlowEntryContainer, FlowEntryFormatter
+from FlowDebugger.Flows.FlowEntryFactory import FlowEntryFactory
+from FlowDebugger.Flows.FlowTracer import FlowTracer
+from bench.flow_generator import generate_flow_lines
+
+BENCHMARKS = ['parse_entry', 'build', 'iterate', 'print', 'trace', 'trace_batch', 'trace_warm']
+
+#
+# Return the best time of calling func() num_repeat times, setup() is called before
+# each call and isnt timed, it returns the arguments of func()
+#
+def _best_time(num_repeat, setup, func):
+    best = None
+    for __ in xrange(num_repeat):
+        args = setup()
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+#
+# Return a list of trace input match object lists, from the matches of random table 0 flows,
+# so most of the packets are matched in table 0, and go on to the next tables
+#
+def _trace_inputs(flow_entries, num_traces, seed):
+    rand = random.Random(seed)
+    table_entries = list(flow_entries.iter_table_entries(0))
+    if not table_entries:
+        return []
+    return [list(rand.choice(table_entries).match_object_list_) for __ in xrange(num_traces)]
+
+#
+# Run all the benchmarks, and return a dictionary {benchmark name : (num operations, best seconds)},
+# and the 'lookup_cache' statistics of a trace run with an empty cache
+#
+def run_benchmarks(options):
+    lines = list(generate_flow_lines(options.flows, num_tables=options.tables, seed=options.seed, modern=options.modern,
+                                     num_priorities=options.priorities, num_values=options.values))
+    results = {}
+
+    # Each run starts with empty caches, else only the first run would parse anything
+    def no_caches():
+        FlowEntryFactory.clear_caches()
+        return ()
+    def parse_all():
+        for line in lines:
+            FlowEntryFactory.parse_entry(line)
+    results['parse_entry'] = (len(lines), _best_time(options.repeat, no_caches, parse_all))
+
+    parsed_entries = [FlowEntryFactory.parse_entry(line) for line in lines]
+    def build(flow_entries):
+        for flow_entry in parsed_entries:
+            flow_entries.add_flow_entry(flow_entry)
+    results['build'] = (len(lines), _best_time(options.repeat, lambda: (FlowEntryContainer(),), build))
+
+    flow_entries = FlowEntryContainer()
+    build(flow_entries)
+    def iterate():
+        for table in flow_entries.iter_tables():
+            for __ in flow_entries.iter_table_priority_entries(table):
+                pass
+    # The first iteration sorts the tables, the following ones are timed
+    iterate()
+    results['iterate'] = (len(lines), _best_time(options.repeat, lambda: (), iterate))
+
+    formatter = FlowEntryFormatter(verbose=True)
+    def print_all():
+        for flow_entry in parsed_entries:
+            formatter.print_flow_entry(flow_entry)
+    results['print'] = (len(lines), _best_time(options.repeat, lambda: (), print_all))
+
+    trace_inputs = _trace_inputs(flow_entries, options.traces, options.seed)
+    def trace_all():
+        for input_match_object_list in trace_inputs:
+            FlowTracer(flow_entries, input_match_object_list).trace()
+    lookup_cache = flow_entries.get_lookup_cache()
+    def no_lookup_cache():
+        lookup_cache.reset()
+        return ()
+    # The first trace builds the table classifiers, the following ones are timed
+    trace_all()
+    results['trace'] = (len(trace_inputs), _best_time(options.repeat, no_lookup_cache, trace_all))
+    results['lookup_cache'] = str(lookup_cache)
+    results['trace_batch'] = (len(trace_inputs), _best_time(options.repeat, no_lookup_cache, lambda: FlowTracer(flow_entries).trace_batch(trace_inputs)))
+    # The cache is filled by the trace_batch run
+    results['trace_warm'] = (len(trace_inputs), _best_time(options.repeat, lambda: (), trace_all))
+
+    return results
+
+#
+# The flow options that must be the same to compare with a baseline
+#
+def _flow_options(options):
+    return {'flows' : options.flows, 'tables' : options.tables, 'seed' : options.seed, 'modern' : options.modern,
+            'priorities' : options.priorities, 'values' : options.values, 'traces' : options.traces}
+
+def _load_baseline(file_name, options):
+    try:
+        with open(file_name) as baseline_file:
+            baseline = json.load(baseline_file)
+    except (IOError, ValueError) as e:
+        print 'Cant load the baseline %s: %s' % (file_name, e)
+        return None
+
+    if baseline.get('options') != _flow_options(options):
+        print 'The baseline %s was saved with different flow options: %s' % (file_name, baseline.get('options'))
+        return None
+    return baseline['results']
+
+def _save_baseline(file_name, options, results):
+    with open(file_name, 'w') as baseline_file:
+        json.dump({'options' : _flow_options(options),
+                   'results' : dict((name, results[name][0] / max(results[name][1], 1e-9)) for name in BENCHMARKS)},
+                  baseline_file, indent=2, separators=(',', ': '), sort_keys=True)
+    print 'Baseline saved to %s' % file_name
+
+def main():
+    parser = optparse.OptionParser(usage='python -m bench.run_benchmarks [options]')
+    parser.add_option('--flows', type='int', default=100000, help='Number of generated flows, default: %default')
+    parser.add_option('--tables', type='int', default=10, help='Number of tables, default: %default')
+    parser.add_option('--priorities', type='int', default=0, help='Number of priorities per table, default: random')
+    parser.add_option('--values', type='int', default=0, help='Number of MAC and IP addresses, default: random')
+    parser.add_option('--modern', action='store_true', default=False, help='Generate the header fields and actions of recent OVS versions')
+    parser.add_option('--seed', type='int', default=0, help='Random seed of the generated flows, default: %default')
+    parser.add_option('--traces', type='int', default=1000, help='Number of traced packets, default: %default')
+    parser.add_option('--repeat', type='int', default=3, help='Number of runs of each benchmark, the best is kept, default: %default')
+    parser.add_option('--baseline', metavar='FILE', help='Compare the results with this baseline file')
+    parser.add_option('--save-baseline', metavar='FILE', help='Save the results to this baseline file')
+    (options, args) = parser.parse_args()
+    if args or options.flows < 1 or options.tables < 1 or options.repeat < 1:
+        parser.print_help()
+        sys.exit(1)
+
+    baseline = _load_baseline(options.baseline, options) if options.baseline else None
+    results = run_benchmarks(options)
+
+    print '%-12s %10s %10s %14s %10s' % ('benchmark', 'ops', 'seconds', 'ops/sec', 'baseline')
+    for name in BENCHMARKS:
+        (num_ops, seconds) = results[name]
+        ops_per_sec = num_ops / seconds if seconds else float('inf')
+        ratio = '%9.2fx' % (ops_per_sec / baseline[name]) if baseline and name in baseline else ''
+        print '%-12s %10d %10.4f %14.0f %10s' % (name, num_ops, seconds, ops_per_sec, ratio)
+
+    print 'Lookup cache: %s' % results['lookup_cache']
+
+    if options.save_baseline:
+        _save_baseline(options.save_baseline, options, results)
+
+if __name__ == '__main__':
+    main()